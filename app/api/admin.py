@@ -0,0 +1,118 @@
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.core.faults import FaultRule, FaultTarget, faults
+from app.core.loop_monitor import loop_monitor
+from app.middleware.tracing import TracedRoute
+from app.services.memory_service import NotTracingError, memory_service
+
+router = APIRouter(route_class=TracedRoute)
+
+
+def _require_fault_injection():
+    if not faults.enabled:
+        raise HTTPException(status_code=403, detail="Fault injection is disabled")
+
+
+def _require_memory_profiling():
+    if not memory_service.enabled:
+        raise HTTPException(status_code=403, detail="Memory profiling is disabled")
+
+
+@router.get("/admin/faults")
+def list_faults():
+    """Fault rules currently applied to dependency calls"""
+    return {"enabled": faults.enabled, "faults": faults.active()}
+
+
+@router.put("/admin/faults/{target}")
+def set_fault(target: FaultTarget, rule: FaultRule):
+    """Apply `rule` to every call to `target`, replacing any earlier rule"""
+    _require_fault_injection()
+    faults.set(target, rule)
+    return {"target": target.value, **rule.model_dump()}
+
+
+@router.delete("/admin/faults/{target}", status_code=204)
+def clear_fault(target: FaultTarget):
+    """Stop injecting faults into calls to `target`"""
+    faults.clear(target)
+
+
+@router.delete("/admin/faults", status_code=204)
+def clear_faults():
+    """Stop injecting faults everywhere"""
+    faults.clear()
+
+
+@router.get("/admin/loop/stalls")
+def loop_stalls():
+    """Recent stacks caught blocking the event loop, newest last"""
+    if not loop_monitor.serve_stacks:
+        raise HTTPException(
+            status_code=403, detail="Serving stall stacks is disabled"
+        )
+    return {
+        "threshold_seconds": loop_monitor.block_threshold,
+        "stalls": list(loop_monitor.captures),
+    }
+
+
+@router.get("/admin/memory")
+def memory_status():
+    """Whether allocations are being traced, and the snapshots held"""
+    return memory_service.status()
+
+
+@router.post("/admin/memory/tracing")
+def start_memory_tracing(frames: int = Query(1, ge=1, le=50)):
+    """Start tracing allocations (slows every allocation down while on)"""
+    _require_memory_profiling()
+    memory_service.start_tracing(frames)
+    return memory_service.status()
+
+
+@router.delete("/admin/memory/tracing", status_code=204)
+def stop_memory_tracing():
+    """Stop tracing allocations; snapshots are kept"""
+    memory_service.stop_tracing()
+
+
+@router.post("/admin/memory/snapshots")
+def take_memory_snapshot():
+    """Snapshot the traced allocations"""
+    _require_memory_profiling()
+    try:
+        return memory_service.take_snapshot()
+    except NotTracingError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/admin/memory/snapshots/{snapshot_id}")
+def memory_snapshot_top(
+    snapshot_id: int,
+    group_by: Literal["filename", "lineno"] = "lineno",
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Top allocators in a snapshot, by file or by line"""
+    _require_memory_profiling()
+    try:
+        return memory_service.top(snapshot_id, group_by, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+
+@router.get("/admin/memory/snapshots/{snapshot_id}/diff/{base_id}")
+def memory_snapshot_diff(
+    snapshot_id: int,
+    base_id: int,
+    group_by: Literal["filename", "lineno"] = "lineno",
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Allocators that grew or shrank most since the `base_id` snapshot"""
+    _require_memory_profiling()
+    try:
+        return memory_service.diff(snapshot_id, base_id, group_by, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.middleware.tracing import TracedRoute
+from app.services.audit_service import audit_service
+
+router = APIRouter(route_class=TracedRoute)
+
+
+def _require_table():
+    if not audit_service.table:
+        raise HTTPException(status_code=503, detail="Audit trail unavailable")
+
+
+@router.get("/audit")
+def query_audit(
+    action: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """Query audit records in a time range (defaults to the last 24 hours)"""
+    _require_table()
+    try:
+        return audit_service.query(
+            action=action, start=start, end=end, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/audit/export")
+def export_audit(
+    action: str | None = None,
+    segments: int = Query(4, ge=1, le=32),
+):
+    """Stream every audit record as NDJSON using a parallel scan"""
+    _require_table()
+
+    def lines():
+        for item in audit_service.export(total_segments=segments, action=action):
+            yield json.dumps(item, default=_json_default) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _json_default(value):
+    # DynamoDB returns every number as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
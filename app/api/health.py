@@ -1,48 +1,47 @@
-import time
-
-from fastapi import APIRouter, Depends
-from fastapi.responses import Response
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
-from sqlalchemy import text
-from sqlalchemy.orm import Session
 
-from app.db.database import get_db
+from app.core.threadpool import ops_pool
+from app.services.health_service import health_service
+from app.services.slo_service import slo_service
 
 router = APIRouter()
 
 
 @router.get("/health")
-def health_check(db: Session = Depends(get_db)):
-    """Comprehensive health check"""
-    health_status = {"status": "healthy", "timestamp": time.time(), "checks": {}}
-
-    # check db
-    try:
-        db.execute(text("SELECT 1"))
-        health_status["checks"]["database"] = "healthy"
-    except Exception as e:
-        health_status["status"] = "unhealthy"
-        health_status["checks"]["database"] = f"unhealthy: {str(e)}"
-
-    return health_status
+async def health_check():
+    """Comprehensive health check, served from the background probes"""
+    return health_service.snapshot()
 
 
 @router.get("/health/live")
-def liveness():
+async def liveness():
     """Simple liveness check"""
     return {"status": "alive"}
 
 
 @router.get("/health/ready")
-def readiness(db: Session = Depends(get_db)):
+async def readiness():
     """Readiness check - are we ready for traffic?"""
-    try:
-        db.execute(text("SELECT 1"))
-        return {"status": "ready"}
-    except Exception:
-        return {"status": "not ready"}, 503
+    snapshot = health_service.snapshot()
+    if health_service.is_ready():
+        return {"status": "ready", "checks": snapshot["checks"]}
+    return JSONResponse(
+        status_code=503, content={"status": "not ready", "checks": snapshot["checks"]}
+    )
+
+
+# /slo and /metrics run on their own threads, so a backlog of student
+# requests can't starve them
+@router.get("/slo")
+@ops_pool.handler
+def slo_status():
+    """SLIs, burn rates and remaining error budget per SLO"""
+    return slo_service.status()
 
 
 @router.get("/metrics")
+@ops_pool.handler
 def metrics():
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
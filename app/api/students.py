@@ -1,18 +1,31 @@
-import uuid
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.core.ids import new_student_id
 from app.core.metrics import students_created_total
+from app.core.threadpool import worker_pool
 from app.db.database import get_db
+from app.middleware.rate_limiter import client_identifier
+from app.middleware.tracing import TracedRoute
 from app.models.student import Student
 from app.services.audit_service import audit_service
 from app.services.external_service import external_grade_service
+from app.services.idempotency_service import (
+    IdempotencyInProgress,
+    IdempotencyKeyReused,
+    idempotency_service,
+)
 from app.services.sqs_service import sqs_service
+from app.services.write_coalescer import student_writer
 
-router = APIRouter()
+settings = get_settings()
+
+router = APIRouter(route_class=TracedRoute)
 
 
 # Pydantic models
@@ -31,9 +44,66 @@ class StudentResponse(BaseModel):
     created_at: datetime
 
 
+class GradesBatchRequest(BaseModel):
+    student_ids: list[str] = Field(
+        ..., min_length=1, max_length=settings.grades_batch_max_size
+    )
+
+
 @router.post("/students", response_model=StudentResponse)
-async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
-    """Create a new student"""
+async def create_student(
+    student: StudentCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=255),
+):
+    """Create a new student
+
+    Retries sending the same Idempotency-Key get the first response back
+    (marked Idempotent-Replayed) instead of creating another student.
+    """
+    if not idempotency_key:
+        return await _create_student(student, db)
+
+    try:
+        claim = await idempotency_service.claim(
+            "POST /students",
+            idempotency_key,
+            student.model_dump(),
+            client=client_identifier(request),
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    except IdempotencyInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+
+    if claim.replay:
+        return JSONResponse(
+            content=claim.response["body"],
+            status_code=claim.response["status_code"],
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        db_student = await _create_student(student, db)
+    except Exception:
+        await idempotency_service.release(claim)
+        raise
+
+    body = StudentResponse.model_validate(db_student, from_attributes=True)
+    body = body.model_dump(mode="json")
+    await idempotency_service.complete(claim, 200, body)
+    return body
+
+
+async def _create_student(student: StudentCreate, db: Session) -> Student:
     # logger.info(
     #     "Admin creating student",
     #     extra={"admin": current_user["username"]}
@@ -43,22 +113,28 @@ async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
     #     # Send welcome email
     #     await send_welcome_email(student)
 
-    db_student = Student(
-        student_id=f"STU-{uuid.uuid4().hex[:8].upper()}",
-        first_name=student.first_name,
-        last_name=student.last_name,
-        grade=student.grade,
-    )
-
-    db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
+    values = {
+        # time-ordered, so the unique index is appended to, not split
+        "student_id": new_student_id(),
+        "first_name": student.first_name,
+        "last_name": student.last_name,
+        "grade": student.grade,
+    }
+
+    if settings.student_write_coalescing:
+        # shares one INSERT ... RETURNING and commit with concurrent creates
+        db_student = Student(**await student_writer.insert(values))
+    else:
+        db_student = Student(**values)
+        db.add(db_student)
+        db.commit()
+        db.refresh(db_student)
 
     # update metrics
     students_created_total.inc()
 
     # send event (don't fail if SQS is down)
-    sqs_service.send_event(
+    await sqs_service.send_event_async(
         "student_created",
         {
             "student_id": db_student.student_id,
@@ -76,14 +152,30 @@ async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/students", response_model=list[StudentResponse])
-async def list_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@worker_pool.handler
+def list_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """List all students"""
     # logger.info("User listing students", extra={"user": current_user["username"]})
     students = db.query(Student).offset(skip).limit(limit).all()
     return students
 
 
+@router.post("/students/grades/batch")
+async def get_grades_batch(request: GradesBatchRequest):
+    """Get grades for many students, fanning out with bounded concurrency"""
+    results = await external_grade_service.get_grades_batch(
+        request.student_ids, max_concurrency=settings.grades_batch_concurrency
+    )
+
+    summary: dict[str, int] = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+    return {"results": results, "summary": summary}
+
+
 @router.get("/students/{student_id}", response_model=StudentResponse)
+@worker_pool.handler
 def get_student(student_id: str, db: Session = Depends(get_db)):
     """Get a specific student"""
     student = db.query(Student).filter(Student.student_id == student_id).first()
@@ -93,9 +185,9 @@ def get_student(student_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/students/{student_id}/grades")
-def get_student_grades(student_id: str):
+async def get_student_grades(student_id: str):
     """Get grades from external service with circuit breaker"""
-    return external_grade_service.get_grades(student_id)
+    return await external_grade_service.get_grades(student_id)
 
 
 # @router.get("/api/v1/features")
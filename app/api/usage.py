@@ -0,0 +1,29 @@
+from datetime import date, datetime, timezone
+
+import redis
+from fastapi import APIRouter, HTTPException, Query
+
+from app.middleware.tracing import TracedRoute
+from app.services.metering_service import metering_service
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/usage/top")
+def top_talkers(limit: int = Query(10, ge=1, le=100), day: date | None = None):
+    """Clients sending the most requests on a UTC day (defaults to today)
+
+    Counts are flushed in batches, so the last few seconds may be missing.
+    """
+    if metering_service.redis_client is None:
+        raise HTTPException(status_code=503, detail="Usage metering unavailable")
+
+    day_key = (day or datetime.now(timezone.utc).date()).isoformat()
+    try:
+        return {
+            "day": day_key,
+            "distinct_clients": metering_service.distinct_clients(day_key),
+            "clients": metering_service.top_talkers(limit, day_key),
+        }
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Usage metering unavailable")
@@ -0,0 +1,39 @@
+import threading
+
+import boto3
+
+from app.core.config import get_settings
+from app.core.faults import faults
+
+settings = get_settings()
+
+# LocalStack accepts any credentials
+LOCALSTACK = {
+    "region_name": "us-east-1",
+    "aws_access_key_id": "test",
+    "aws_secret_access_key": "test",
+}
+
+# Clients come from boto3's default session, which caches the service models
+# botocore loads, so only the first client per service pays for parsing them.
+# Creating clients from one session in several threads at once isn't safe,
+# and services are initialised concurrently at startup, hence the lock.
+_lock = threading.Lock()
+
+
+def client(service: str, **kwargs):
+    with _lock:
+        return faults.instrument_boto(
+            boto3.client(
+                service, endpoint_url=settings.aws_endpoint_url, **LOCALSTACK, **kwargs
+            )
+        )
+
+
+def resource(service: str, **kwargs):
+    with _lock:
+        service_resource = boto3.resource(
+            service, endpoint_url=settings.aws_endpoint_url, **LOCALSTACK, **kwargs
+        )
+        faults.instrument_boto(service_resource.meta.client)
+        return service_resource
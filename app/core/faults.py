@@ -0,0 +1,242 @@
+"""Runtime fault injection for dependency calls
+
+Rules are set per dependency through the admin API (app/api/admin.py) and
+apply to every call made to it: added latency (fixed, or log-normal when a
+p99 is given), errors and timeouts, raised as the exception the real client
+library would raise so breakers, retries and fallbacks react as they would
+to a real outage. An injected timeout hangs for as long as the instrumented
+client's own timeout (its socket or read timeout), as a real one would, so
+breaker and limiter measurements under faults match a real outage.
+
+Hooks are installed only with FAULT_INJECTION_ENABLED=true; otherwise the
+instrument_* methods leave their argument untouched and nothing is paid per
+call.
+"""
+import asyncio
+import math
+import random
+import time
+from enum import Enum
+
+import redis
+from botocore.exceptions import EndpointConnectionError, ReadTimeoutError
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import get_settings
+from app.core.metrics import faults_injected_total
+
+settings = get_settings()
+
+# z-score of the 99th percentile of a normal distribution
+_Z_99 = 2.3263
+
+# how long a timed-out call hangs when neither the rule nor the client sets it
+DEFAULT_TIMEOUT = 5.0
+
+
+class FaultTarget(str, Enum):
+    db = "db"
+    redis = "redis"
+    sqs = "sqs"
+    dynamodb = "dynamodb"
+    grade_service = "grade_service"
+
+
+class FaultRule(BaseModel):
+    """Faults for one dependency; rates are per call"""
+
+    latency_ms: float = Field(0, ge=0)  # median added latency
+    p99_latency_ms: float | None = Field(None, ge=0)  # log-normal tail if set
+    error_rate: float = Field(0, ge=0, le=1)
+    timeout_rate: float = Field(0, ge=0, le=1)
+    # how long a timed-out call hangs: the client's own timeout by default,
+    # and never longer than it
+    timeout_seconds: float | None = Field(None, gt=0)
+    duration_seconds: float | None = Field(None, gt=0)  # then the rule lifts
+
+    @model_validator(mode="after")
+    def _check(self):
+        if self.error_rate + self.timeout_rate > 1:
+            raise ValueError("error_rate + timeout_rate must not exceed 1")
+        if self.p99_latency_ms is not None and not (
+            0 < self.latency_ms <= self.p99_latency_ms
+        ):
+            raise ValueError("p99_latency_ms needs 0 < latency_ms <= p99_latency_ms")
+        return self
+
+    def hang_seconds(self, client_timeout: float | None = None) -> float:
+        """How long a timed-out call hangs, given the client's own timeout"""
+        limits = [t for t in (self.timeout_seconds, client_timeout) if t]
+        return min(limits) if limits else DEFAULT_TIMEOUT
+
+    def sample_latency(self, client_timeout: float | None = None) -> float:
+        """Added latency in seconds, capped at `hang_seconds`"""
+        if self.p99_latency_ms is None or self.p99_latency_ms == self.latency_ms:
+            latency = self.latency_ms
+        else:
+            sigma = math.log(self.p99_latency_ms / self.latency_ms) / _Z_99
+            latency = random.lognormvariate(math.log(self.latency_ms), sigma)
+        return min(latency / 1000, self.hang_seconds(client_timeout))
+
+
+class FaultInjector:
+    """Holds the active rules and applies them to dependency calls"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._rules: dict[FaultTarget, tuple[FaultRule, float | None]] = {}
+        self._redis_classes: dict[type, type] = {}
+
+    def set(self, target: FaultTarget, rule: FaultRule):
+        expires_at = (
+            time.monotonic() + rule.duration_seconds
+            if rule.duration_seconds
+            else None
+        )
+        self._rules[target] = (rule, expires_at)
+
+    def clear(self, target: FaultTarget | None = None):
+        if target is None:
+            self._rules = {}
+        else:
+            self._rules.pop(target, None)
+
+    def active(self) -> dict:
+        """Current rules, with the seconds left on temporary ones"""
+        now = time.monotonic()
+        rules = {}
+        for target, (rule, expires_at) in list(self._rules.items()):
+            if expires_at is not None and expires_at <= now:
+                continue
+            rules[target.value] = {
+                **rule.model_dump(),
+                "remaining_seconds": (
+                    round(expires_at - now, 1) if expires_at is not None else None
+                ),
+            }
+        return rules
+
+    def _draw(
+        self, target: FaultTarget, client_timeout: float | None
+    ) -> tuple[float, str | None]:
+        """(seconds to delay the call, "error" / "timeout" / None)"""
+        entry = self._rules.get(target)
+        if entry is None:
+            return 0.0, None
+        rule, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self._rules.pop(target, None)
+            return 0.0, None
+
+        roll = random.random()
+        if roll < rule.timeout_rate:
+            delay, fault = rule.hang_seconds(client_timeout), "timeout"
+        else:
+            delay = rule.sample_latency(client_timeout)
+            fault = "error" if roll < rule.timeout_rate + rule.error_rate else None
+        if fault or delay:
+            faults_injected_total.labels(
+                target=target.value, fault=fault or "latency"
+            ).inc()
+        return delay, fault
+
+    def check(
+        self, target: FaultTarget, client_timeout: float | None = None
+    ) -> str | None:
+        """Delay a blocking call as the rule says; returns the fault to raise
+
+        `client_timeout` is the instrumented client's own timeout: no delay
+        is longer. The delay blocks the calling thread, like the real slow
+        call it stands in for.
+        """
+        delay, fault = self._draw(target, client_timeout)
+        if delay:
+            time.sleep(delay)
+        return fault
+
+    async def check_async(
+        self, target: FaultTarget, client_timeout: float | None = None
+    ) -> str | None:
+        delay, fault = self._draw(target, client_timeout)
+        if delay:
+            await asyncio.sleep(delay)
+        return fault
+
+    def instrument_engine(self, engine):
+        """Apply `db` rules to every SQL statement run on `engine`"""
+        if not self.enabled:
+            return engine
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            fault = self.check(FaultTarget.db)
+            if fault == "timeout":
+                raise OperationalError(
+                    statement,
+                    parameters,
+                    Exception("canceling statement due to statement timeout"),
+                )
+            if fault == "error":
+                raise OperationalError(
+                    statement, parameters, Exception("injected fault")
+                )
+
+        return engine
+
+    def instrument_redis(self, client: redis.Redis) -> redis.Redis:
+        """Apply `redis` rules to every command `client` sends, pipelines too
+
+        Call before the client is first used: connections already in its
+        pool are not affected.
+        """
+        if not self.enabled:
+            return client
+        pool = client.connection_pool
+        if pool.connection_class not in self._redis_classes.values():
+            pool.connection_class = self._redis_class(pool.connection_class)
+        return client
+
+    def _redis_class(self, base: type) -> type:
+        if base not in self._redis_classes:
+            injector = self
+
+            class FaultyConnection(base):
+                def send_packed_command(self, command, check_health=True):
+                    fault = injector.check(FaultTarget.redis, self.socket_timeout)
+                    if fault == "timeout":
+                        raise redis.TimeoutError("Timeout reading from socket")
+                    if fault == "error":
+                        raise redis.ConnectionError("Injected fault")
+                    super().send_packed_command(command, check_health)
+
+            self._redis_classes[base] = FaultyConnection
+        return self._redis_classes[base]
+
+    def instrument_boto(self, client):
+        """Apply `sqs` / `dynamodb` rules to every request `client` sends
+
+        Faults surface as connection errors, which botocore retries like
+        real ones.
+        """
+        if not self.enabled:
+            return client
+        try:
+            target = FaultTarget(client.meta.service_model.service_name)
+        except ValueError:
+            return client
+        read_timeout = client.meta.config.read_timeout
+
+        def before_send(request, **kwargs):
+            fault = self.check(target, read_timeout)
+            if fault == "timeout":
+                raise ReadTimeoutError(endpoint_url=request.url)
+            if fault == "error":
+                raise EndpointConnectionError(endpoint_url=request.url)
+
+        client.meta.events.register("before-send", before_send)
+        return client
+
+
+faults = FaultInjector(enabled=settings.fault_injection_enabled)
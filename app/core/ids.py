@@ -0,0 +1,71 @@
+"""Time-ordered identifiers (ULID layout)
+
+128 bits: a 48-bit millisecond Unix timestamp followed by 80 random bits,
+written as 26 Crockford base32 characters. IDs generated later sort later
+(as text, too), so B-tree indexes on them grow at the right edge instead
+of splitting pages all over the tree. Within one process IDs are strictly
+increasing even inside a millisecond or if the clock steps back.
+"""
+import os
+import threading
+import time
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+# every pair of characters, so each lookup encodes 10 bits
+_PAIRS = [a + b for a in CROCKFORD for b in CROCKFORD]
+_DECODE = {c: i for i, c in enumerate(CROCKFORD)}
+
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+STUDENT_ID_PREFIX = "STU-"
+
+
+class ULIDGenerator:
+    """Monotonic ULID source; safe to share between threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self) -> str:
+        ms = time.time_ns() // 1_000_000
+        with self._lock:
+            if ms > self._last_ms:
+                entropy = int.from_bytes(os.urandom(10), "big")
+            else:
+                # same millisecond (or the clock went back): count up from
+                # the last ID so ordering holds
+                ms, entropy = self._last_ms, self._last_random + 1
+                if entropy > _RANDOM_MAX:
+                    ms, entropy = ms + 1, 0
+            self._last_ms, self._last_random = ms, entropy
+        return encode((ms << _RANDOM_BITS) | entropy)
+
+
+def encode(value: int) -> str:
+    """128-bit integer as 26 Crockford base32 characters"""
+    # 130 bits (two leading zero bits) in 13 groups of 10
+    return "".join([_PAIRS[(value >> shift) & 1023] for shift in range(120, -1, -10)])
+
+
+def decode(text: str) -> int:
+    value = 0
+    for char in text.upper():
+        value = (value << 5) | _DECODE[char]
+    return value
+
+
+def timestamp_ms(ulid: str) -> int:
+    """Unix time in milliseconds at which `ulid` was generated"""
+    return decode(ulid[:10])
+
+
+_generator = ULIDGenerator()
+
+
+def new_student_id() -> str:
+    """`STU-` plus a ULID, e.g. STU-01J9Z3K5V8Q4T6W2X7Y0A1B2C3"""
+    return STUDENT_ID_PREFIX + _generator.new()
@@ -0,0 +1,150 @@
+"""Event loop lag and blocking-call detection
+
+A task on the loop wakes every `interval` and records how late it woke
+(scheduling lag) in a histogram. A watchdog thread checks that task's
+heartbeat; when the loop has not come back for `block_threshold`, whatever
+is running on it is blocking - typically a synchronous DB, Redis or AWS
+call inside an async handler or middleware. The watchdog then grabs the
+loop thread's stack, attributes it to the route whose handler is on that
+stack, counts it, and (at most once per `capture_interval` per route) logs
+the stack and keeps it. With `serve_stacks` the kept stacks are also served
+at GET /api/v1/admin/loop/stalls; they show code paths, so that is off by
+default.
+"""
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+from app.core.config import get_settings
+from app.core.metrics import event_loop_blocks_total, event_loop_lag_seconds
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+UNKNOWN_ROUTE = "unknown"  # blocked outside any handler, e.g. in middleware
+
+
+class LoopMonitor:
+    """Samples the running event loop's lag and catches what blocks it"""
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        block_threshold: float = 0.1,
+        capture_interval: float = 60.0,
+        max_captures: int = 20,
+        serve_stacks: bool = False,
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.capture_interval = capture_interval
+        self.serve_stacks = serve_stacks
+        self.captures: deque[dict] = deque(maxlen=max_captures)
+        self._routes: dict = {}  # handler code object -> route template
+        self._last_capture: dict[str, float] = {}
+        self._beat = 0.0
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self, routes=()):
+        """Start sampling the running loop - call on app startup
+
+        `routes` (the app's routes) lets blocked stacks be attributed to the
+        handler they were called from.
+        """
+        self._routes = {
+            inspect.unwrap(route.endpoint).__code__: route.path
+            for route in routes
+            if hasattr(route, "endpoint")
+        }
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._stop.clear()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _sample(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self._beat - self.interval
+            event_loop_lag_seconds.observe(max(lag, 0.0))
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.block_threshold / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            # one report per stall: the heartbeat moves on once it ends
+            if blocked >= self.block_threshold and beat != reported:
+                reported = beat
+                self._on_block(blocked)
+
+    def _on_block(self, blocked: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        route = self._route_of(frame)
+        event_loop_blocks_total.labels(route=route).inc()
+
+        now = time.monotonic()
+        last = self._last_capture.get(route)
+        if last is not None and now - last < self.capture_interval:
+            return
+        self._last_capture[route] = now
+
+        stack = traceback.format_stack(frame)
+        self.captures.append(
+            {
+                "time": datetime.now(timezone.utc).isoformat(),
+                "route": route,
+                "blocked_seconds": round(blocked, 3),
+                "stack": stack,
+            }
+        )
+        logger.warning(
+            "Event loop blocked for at least %.0fms in %s",
+            blocked * 1000,
+            route,
+            extra={"route": route, "stack": "".join(stack)},
+        )
+
+    def _route_of(self, frame) -> str:
+        while frame is not None:
+            route = self._routes.get(frame.f_code)
+            if route is not None:
+                return route
+            frame = frame.f_back
+        return UNKNOWN_ROUTE
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval,
+    block_threshold=settings.loop_block_threshold,
+    capture_interval=settings.loop_capture_interval,
+    serve_stacks=settings.loop_stalls_api_enabled,
+)
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 # basic metrics
 http_requests_total = Counter(
@@ -15,4 +15,287 @@ http_request_duration = Histogram(
 students_created_total = Counter(
     'students_created_total',
     'Total students created'
-)
\ No newline at end of file
+)
+
+# group-committed inserts
+db_write_batch_size = Histogram(
+    'db_write_batch_size',
+    'Rows per coalesced insert batch',
+    buckets=[1, 2, 5, 10, 20, 50, 100, 200]
+)
+
+db_write_batches_total = Counter(
+    'db_write_batches_total',
+    'Coalesced insert batches (split: retried row by row after a failure)',
+    ["result"]
+)
+
+# audit trail
+audit_records_dropped_total = Counter(
+    'audit_records_dropped_total',
+    'Audit records dropped before reaching DynamoDB',
+    ["reason"]
+)
+
+audit_batch_writes_total = Counter(
+    'audit_batch_writes_total',
+    'DynamoDB batch write requests issued by the audit writer',
+    ["status"]
+)
+
+audit_queue_depth = Gauge(
+    'audit_queue_depth',
+    'Audit records waiting to be written'
+)
+
+# local disk spool for outages
+spool_records_written_total = Counter(
+    'spool_records_written_total',
+    'Records written to a local spool while a dependency was unavailable',
+    ["spool"]
+)
+
+spool_records_replayed_total = Counter(
+    'spool_records_replayed_total',
+    'Spooled records successfully replayed to their dependency',
+    ["spool"]
+)
+
+spool_records_dropped_total = Counter(
+    'spool_records_dropped_total',
+    'Records the spool could not keep',
+    ["spool", "reason"]
+)
+
+spool_bytes = Gauge(
+    'spool_bytes',
+    'Size of the spool file on disk',
+    ["spool"]
+)
+
+# circuit breakers
+circuit_breaker_state = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state (0=closed, 1=half-open, 2=open)',
+    ["name"]
+)
+
+circuit_breaker_calls_total = Counter(
+    'circuit_breaker_calls_total',
+    'Calls made through a circuit breaker',
+    ["name", "outcome"]
+)
+
+circuit_breaker_rejections_total = Counter(
+    'circuit_breaker_rejections_total',
+    'Calls rejected without reaching the dependency',
+    ["name"]
+)
+
+circuit_breaker_sync_errors_total = Counter(
+    'circuit_breaker_sync_errors_total',
+    'Failed reads/writes of shared circuit breaker state in Redis',
+    ["name"]
+)
+
+# external grade service
+grades_cache_lookups_total = Counter(
+    'grades_cache_lookups_total',
+    'Grades lookups by how they were served',
+    ["result"]
+)
+
+grades_upstream_requests_total = Counter(
+    'grades_upstream_requests_total',
+    'HTTP requests to the external grade service',
+    ["outcome"]
+)
+
+grades_coalesced_total = Counter(
+    'grades_coalesced_total',
+    'Grades lookups that waited on an in-flight upstream call'
+)
+
+# dependency health
+dependency_up = Gauge(
+    'dependency_up',
+    'Whether the last health probe of a dependency succeeded',
+    ["dependency"]
+)
+
+dependency_check_latency_seconds = Gauge(
+    'dependency_check_latency_seconds',
+    'Latency of the last health probe of a dependency',
+    ["dependency"]
+)
+
+# SLOs
+slo_sli = Gauge(
+    'slo_sli',
+    'Share of good requests over a rolling window',
+    ["slo", "window"]
+)
+
+slo_burn_rate = Gauge(
+    'slo_burn_rate',
+    'Error budget burn rate over a rolling window (1 = exactly on budget)',
+    ["slo", "window"]
+)
+
+slo_error_budget_remaining = Gauge(
+    'slo_error_budget_remaining',
+    'Share of the error budget left over the longest SLO window',
+    ["slo"]
+)
+
+slo_latency_quantile_seconds = Gauge(
+    'slo_latency_quantile_seconds',
+    'Request latency quantiles over the last 5 minutes',
+    ["quantile"]
+)
+
+# adaptive concurrency limit
+concurrency_limit = Gauge(
+    'concurrency_limit',
+    'Current adaptive limit on in-flight requests'
+)
+
+concurrency_in_flight = Gauge(
+    'concurrency_in_flight',
+    'Requests currently being processed under the concurrency limit'
+)
+
+concurrency_shed_total = Counter(
+    'concurrency_shed_total',
+    'Requests rejected with 503 because the concurrency limit was reached'
+)
+
+# two-tier cache
+cache_hits_total = Counter(
+    'cache_hits_total',
+    'Cache hits per tier',
+    ["tier"]
+)
+
+cache_misses_total = Counter(
+    'cache_misses_total',
+    'Cache misses per tier',
+    ["tier"]
+)
+
+cache_evictions_total = Counter(
+    'cache_evictions_total',
+    'Cache entries removed before being read, per tier',
+    ["tier", "reason"]
+)
+
+cache_errors_total = Counter(
+    'cache_errors_total',
+    'Redis and serialisation errors in the cache service (treated as misses)',
+    ["operation"]
+)
+
+# idempotency keys
+idempotency_requests_total = Counter(
+    'idempotency_requests_total',
+    'Requests carrying an Idempotency-Key, by outcome',
+    ["result"]
+)
+
+# usage metering
+metering_flushes_total = Counter(
+    'metering_flushes_total',
+    'Batched flushes of usage counters to Redis',
+    ["status"]
+)
+
+metering_overflow_total = Counter(
+    'metering_overflow_total',
+    'Requests metered under the overflow client because too many were seen'
+)
+
+# startup
+startup_phase_seconds = Gauge(
+    'startup_phase_seconds',
+    'Time spent in each startup phase of this process',
+    ["phase"]
+)
+
+# logging pipeline
+log_records_dropped_total = Counter(
+    'log_records_dropped_total',
+    'Log records discarded by sampling, rate caps or a full queue',
+    ["logger", "reason"]
+)
+
+# tracing
+traces_total = Counter(
+    'traces_total',
+    'Finished request traces by sampling decision',
+    ["decision"]
+)
+
+traces_dropped_total = Counter(
+    'traces_dropped_total',
+    'Sampled traces lost before reaching the export file',
+    ["reason"]
+)
+
+trace_export_batches_total = Counter(
+    'trace_export_batches_total',
+    'Batches of traces written by the exporter',
+    ["status"]
+)
+
+# fault injection
+faults_injected_total = Counter(
+    'faults_injected_total',
+    'Faults injected into dependency calls',
+    ["target", "fault"]
+)
+
+# worker threadpools
+threadpool_size = Gauge(
+    'threadpool_size',
+    'Threads a worker pool may run at once',
+    ["pool"]
+)
+
+threadpool_busy_threads = Gauge(
+    'threadpool_busy_threads',
+    'Worker pool threads currently running a call',
+    ["pool"]
+)
+
+threadpool_queued_calls = Gauge(
+    'threadpool_queued_calls',
+    'Calls waiting for a free worker pool thread',
+    ["pool"]
+)
+
+threadpool_queue_wait_seconds = Histogram(
+    'threadpool_queue_wait_seconds',
+    'Time calls waited for a worker pool thread',
+    ["pool"],
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+)
+
+# event loop
+event_loop_lag_seconds = Histogram(
+    'event_loop_lag_seconds',
+    'How late the event loop ran a sleeping task',
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+)
+
+event_loop_blocks_total = Counter(
+    'event_loop_blocks_total',
+    'Times a callback blocked the event loop past the threshold',
+    ["route"]
+)
+
+# memory
+memory_live_objects = Gauge(
+    'memory_live_objects',
+    'Entries held by in-process structures that grow with traffic',
+    ["structure"]
+)
@@ -0,0 +1,101 @@
+"""Worker threads for blocking handlers
+
+FastAPI runs plain `def` handlers and dependencies on AnyIO's default
+limiter, 40 threads unless resized. When the database slows down every
+thread ends up blocked on it and further requests queue for one without
+showing up anywhere. `worker_pool` sizes that default limiter from
+settings; `ops_pool` is a separate limiter for health and metrics handlers
+so they still answer while student traffic holds every worker.
+
+Both export their size, busy threads, calls waiting for a thread and how
+long those calls waited.
+"""
+import asyncio
+import functools
+import time
+
+import anyio
+import anyio.to_thread
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    threadpool_busy_threads,
+    threadpool_queue_wait_seconds,
+    threadpool_queued_calls,
+    threadpool_size,
+)
+
+settings = get_settings()
+
+
+class ThreadPool:
+    """A named AnyIO capacity limiter with Prometheus metrics
+
+    `default=True` adopts (and resizes) AnyIO's default limiter, which
+    FastAPI's own threadpool calls share, instead of creating a new one.
+    """
+
+    def __init__(self, name: str, size: int, default: bool = False):
+        self.name = name
+        self.size = size
+        self.default = default
+        self._limiter: anyio.CapacityLimiter | None = None
+        self._loop = None
+        self._queued = threadpool_queued_calls.labels(pool=name)
+        self._wait = threadpool_queue_wait_seconds.labels(pool=name)
+
+    def initialise(self):
+        """Size the pool and export its gauges - call on app startup, in the loop"""
+        self._get_limiter()
+        threadpool_size.labels(pool=self.name).set_function(lambda: self.size)
+        threadpool_busy_threads.labels(pool=self.name).set_function(
+            lambda: self._limiter.borrowed_tokens if self._limiter else 0
+        )
+
+    def _get_limiter(self) -> anyio.CapacityLimiter:
+        # a limiter is bound to the event loop that first used it
+        loop = asyncio.get_running_loop()
+        if self._limiter is None or self._loop is not loop:
+            if self.default:
+                limiter = anyio.to_thread.current_default_thread_limiter()
+                limiter.total_tokens = self.size
+            else:
+                limiter = anyio.CapacityLimiter(self.size)
+            self._limiter, self._loop = limiter, loop
+        return self._limiter
+
+    async def run(self, func, *args):
+        """Call func(*args) on a pool thread, once one is free"""
+        queued_at = time.perf_counter()
+        started = False
+
+        def timed():
+            nonlocal started
+            started = True
+            self._queued.dec()
+            self._wait.observe(time.perf_counter() - queued_at)
+            return func(*args)
+
+        self._queued.inc()
+        try:
+            return await anyio.to_thread.run_sync(timed, limiter=self._get_limiter())
+        finally:
+            if not started:  # cancelled while waiting for a thread
+                self._queued.dec()
+
+    def handler(self, func):
+        """Decorator running a plain `def` route handler on this pool
+
+        Goes under the router decorator; FastAPI still reads parameters and
+        the response model from the wrapped function's signature.
+        """
+
+        @functools.wraps(func)
+        async def run_handler(*args, **kwargs):
+            return await self.run(functools.partial(func, *args, **kwargs))
+
+        return run_handler
+
+
+worker_pool = ThreadPool("worker", settings.threadpool_size, default=True)
+ops_pool = ThreadPool("ops", settings.threadpool_ops_size)
@@ -0,0 +1,350 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from sqlalchemy import event
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    trace_export_batches_total,
+    traces_dropped_total,
+    traces_total,
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# set for the duration of a request; read by anything that emits an event
+correlation_id_var: ContextVar[str | None] = ContextVar("correlation_id", default=None)
+
+_trace_var: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+_parent_var: ContextVar[int | None] = ContextVar("span_parent", default=None)
+
+# incoming IDs end up in logs, queue messages and audit records
+_VALID_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class Span:
+    """One timed operation within a trace; times are relative to its start"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "duration", "attributes")
+
+    def __init__(self, name: str, span_id: int, parent_id: int | None, start: float):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = start
+        self.duration: float | None = None
+        self.attributes: dict[str, Any] = {}
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": (
+                round(self.duration * 1000, 3) if self.duration is not None else None
+            ),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans recorded for one request
+
+    Spans are kept whether or not the trace was head-sampled so a slow
+    request can still be exported in full once it finishes; `max_spans`
+    bounds what a pathological request can hold on to.
+    """
+
+    def __init__(self, correlation_id: str, sampled: bool, max_spans: int = 256):
+        self.correlation_id = correlation_id
+        self.sampled = sampled
+        self.max_spans = max_spans
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans: list[Span] = []
+        self.spans_dropped = 0
+        self._next_id = 0
+        self._lock = threading.Lock()  # spans also arrive from worker threads
+
+    def start_span(self, name: str, parent_id: int | None) -> Span | None:
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.spans_dropped += 1
+                return None
+            self._next_id += 1
+            span = Span(name, self._next_id, parent_id, time.perf_counter())
+            self.spans.append(span)
+            return span
+
+    def to_dict(self, duration: float, attributes: dict[str, Any]) -> dict:
+        return {
+            "correlation_id": self.correlation_id,
+            "timestamp": self.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "head_sampled": self.sampled,
+            **attributes,
+            "spans": [span.to_dict(self.start) for span in self.spans],
+            "spans_dropped": self.spans_dropped,
+        }
+
+
+class span:
+    """Time a block as a span of the current trace
+
+        with span("sqs.send_message", queue="student-events"):
+            ...
+
+    Outside a request (no current trace) this does nothing. Exceptions are
+    recorded on the span and re-raised.
+    """
+
+    __slots__ = ("name", "attributes", "_span", "_token")
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._span: Span | None = None
+        self._token = None
+
+    def __enter__(self) -> Span | None:
+        trace = _trace_var.get()
+        if trace is None:
+            return None
+        self._span = trace.start_span(self.name, _parent_var.get())
+        if self._span is not None:
+            self._span.attributes.update(self.attributes)
+            self._token = _parent_var.set(self._span.span_id)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is None:
+            return
+        self._span.duration = time.perf_counter() - self._span.start
+        if exc_type is not None:
+            self._span.attributes["error"] = exc_type.__name__
+        _parent_var.reset(self._token)
+
+
+def traced(name: str | None = None) -> Callable:
+    """Decorator recording each call of a plain or async function as a span"""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_trace() -> Trace | None:
+    return _trace_var.get()
+
+
+def instrument_engine(engine):
+    """Record every SQL statement run on `engine` as a `db.query` span"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._trace_span = span("db.query", statement=statement.split(None, 1)[0])
+        context._trace_span.__enter__()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        context._trace_span.__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(exception_context):
+        context = exception_context.execution_context
+        trace_span = getattr(context, "_trace_span", None)
+        if trace_span is not None:
+            error = type(exception_context.original_exception)
+            trace_span.__exit__(error, None, None)
+
+
+class TraceExporter:
+    """Appends finished traces to a JSON lines file from a background thread
+
+    Traces are queued without blocking the request; the writer takes up to
+    `batch_size` at a time (or whatever arrived within `flush_interval`)
+    and writes them with a single flush. Traces arriving while the queue is
+    full are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        queue_size: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    def start(self):
+        if self._worker and self._worker.is_alive():
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._stop.clear()
+        self._worker = threading.Thread(
+            target=self._run, name="trace-exporter", daemon=True
+        )
+        self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the writer after exporting whatever is still queued"""
+        if not self._worker:
+            return
+        self._stop.set()
+        self._worker.join(timeout)
+        self._worker = None
+
+    def export(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            traces_dropped_total.labels(reason="queue_full").inc()
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> list[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[dict]):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        try:
+            with open(self.path, "a") as f:
+                f.write(lines)
+            trace_export_batches_total.labels(status="success").inc()
+        except OSError as e:
+            trace_export_batches_total.labels(status="error").inc()
+            traces_dropped_total.labels(reason="write_error").inc(len(batch))
+            logger.warning("Failed to export %d traces: %s", len(batch), e)
+
+
+class Tracer:
+    """Starts a trace per request and decides which ones to export
+
+    Head sampling keeps `sample_rate` of requests regardless of outcome;
+    tail sampling additionally keeps every request slower than
+    `slow_threshold` seconds or answered with a 5xx, which are the ones
+    worth reading.
+    """
+
+    def __init__(
+        self,
+        exporter: TraceExporter | None = None,
+        sample_rate: float = 0.01,
+        slow_threshold: float = 0.3,
+        max_spans: int = 256,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.max_spans = max_spans
+
+    def initialise(self):
+        """Start the export thread - call on app startup"""
+        if self.exporter:
+            self.exporter.start()
+
+    def shutdown(self):
+        if self.exporter:
+            self.exporter.stop()
+
+    def start_trace(self, correlation_id: str | None = None) -> tuple[Trace, list]:
+        """Make a new trace current; returns it with the tokens for `end_trace`
+
+        A well-formed incoming `correlation_id` is kept so the request can be
+        followed across services; anything else is replaced.
+        """
+        if not correlation_id or not _VALID_ID.match(correlation_id):
+            correlation_id = uuid.uuid4().hex
+        trace = Trace(
+            correlation_id,
+            sampled=random.random() < self.sample_rate,
+            max_spans=self.max_spans,
+        )
+        tokens = [
+            correlation_id_var.set(correlation_id),
+            _trace_var.set(trace),
+            _parent_var.set(None),
+        ]
+        return trace, tokens
+
+    def end_trace(self, trace: Trace, tokens: list, status_code: int, **attributes):
+        """Restore the previous context and export the trace if it is kept"""
+        duration = time.perf_counter() - trace.start
+        for var, token in zip((correlation_id_var, _trace_var, _parent_var), tokens):
+            var.reset(token)
+
+        if trace.sampled:
+            decision = "head"
+        elif duration >= self.slow_threshold or status_code >= 500:
+            decision = "tail"
+        else:
+            decision = "dropped"
+        traces_total.labels(decision=decision).inc()
+
+        if decision != "dropped" and self.exporter:
+            attributes.update(status_code=status_code, sampled=decision)
+            self.exporter.export(trace.to_dict(duration, attributes))
+
+
+tracer = Tracer(
+    exporter=TraceExporter(
+        settings.tracing_export_path,
+        queue_size=settings.tracing_queue_size,
+        batch_size=settings.tracing_export_batch_size,
+        flush_interval=settings.tracing_export_interval,
+    ),
+    sample_rate=settings.tracing_sample_rate,
+    slow_threshold=settings.tracing_slow_threshold,
+    max_spans=settings.tracing_max_spans,
+)
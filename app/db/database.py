@@ -3,10 +3,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.tracing import instrument_engine
 
 settings = get_settings()
 
 engine = create_engine(settings.database_url)
+instrument_engine(engine)
+faults.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
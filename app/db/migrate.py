@@ -0,0 +1,58 @@
+"""Create the database schema: python -m app.db.migrate
+
+Run once per deploy (or set DB_CREATE_SCHEMA=true for local development)
+rather than on every application boot.
+
+    python -m app.db.migrate --reindex-student-ids
+
+rebuilds the student_id index once after switching to time-ordered IDs
+(see reindex_student_ids).
+"""
+import argparse
+
+from sqlalchemy import func, select, text
+
+from app.db.database import engine
+from app.models.student import Base, Student
+
+STUDENT_ID_INDEX = "ix_students_student_id"
+
+
+def create_schema():
+    Base.metadata.create_all(bind=engine)
+
+
+def reindex_student_ids():
+    """Rebuild the student_id index without blocking writes (PostgreSQL)
+
+    Years of random `STU-xxxxxxxx` inserts leave the index bloated with
+    half-full pages; a rebuild packs it, and time-ordered IDs then only
+    ever append. Existing IDs are kept as they are: they appear in SQS
+    events, the audit trail and the grade service, and both formats are
+    valid `student_id`s (legacy ones are 12 characters, new ones 30).
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"REINDEX INDEX CONCURRENTLY {STUDENT_ID_INDEX}"))
+        else:
+            conn.execute(text(f"REINDEX {STUDENT_ID_INDEX}"))
+
+
+def count_legacy_student_ids() -> int:
+    """Rows still carrying a random (pre ULID) student ID"""
+    legacy = func.length(Student.student_id) == 12
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(legacy)).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reindex-student-ids", action="store_true")
+    args = parser.parse_args()
+
+    create_schema()
+    print("Database schema created")
+    if args.reindex_student_ids:
+        print(f"{count_legacy_student_ids()} rows keep legacy student IDs")
+        reindex_student_ids()
+        print(f"Rebuilt {STUDENT_ID_INDEX}")
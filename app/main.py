@@ -6,24 +6,51 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.api import health, students
+from app.api import admin, audit, health, students, usage
 from app.core.config import get_settings
-from app.core.metrics import http_request_duration, http_requests_total
+from app.core.logging import setup_logging
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import (
+    http_request_duration,
+    http_requests_total,
+    startup_phase_seconds,
+)
 from app.core.rate_limits import RateLimits
-from app.db.database import engine
-from app.middleware.rate_limiter import RateLimitMiddleware
-from app.models.student import Base
+from app.core.threadpool import ops_pool, worker_pool
+from app.core.tracing import tracer
+from app.db.migrate import create_schema
+from app.middleware.concurrency_limiter import (
+    ConcurrencyLimitMiddleware,
+    GradientLimit,
+)
+from app.middleware.rate_limiter import (
+    RateLimitMiddleware,
+    client_identifier,
+    get_shared_redis,
+)
+from app.middleware.tracing import TracingMiddleware
 from app.services.audit_service import audit_service
 from app.services.cache_service import cache_service
+from app.services.external_service import external_grade_service
+from app.services.health_service import health_service
+from app.services.idempotency_service import idempotency_service
+from app.services.memory_service import memory_service
+from app.services.metering_service import metering_service
 from app.services.slo_service import slo_service
 from app.services.sqs_service import sqs_service
-
-# Logging setup
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from app.services.write_coalescer import student_writer
 
 settings = get_settings()
 
+# Logging setup: JSON lines written from a background thread
+setup_logging(
+    level=settings.log_level,
+    queue_size=settings.log_queue_size,
+    sample_rates=settings.log_sample_rates,
+    rate_limits=settings.log_rate_limits,
+)
+logger = logging.getLogger(__name__)
+
 # global flag for shutdown
 shutdown_event = asyncio.Event()
 
@@ -37,39 +64,92 @@ signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 
-async def periodic_slo_calculation():
-    """Calculate SLOs every minute"""
-    while True:
-        try:
-            await slo_service.calculate_slis()
-            logger.info("SLO metrics updated")
-        except Exception as e:
-            logger.error(f"Failed to calculate SLOs: {e}")
+# probes and scrapes would drown out real traffic in the SLIs
+SLO_EXCLUDED_PATHS = {"/health", "/health/live", "/health/ready", "/metrics"}
+
 
-        await asyncio.sleep(60)  # Every minute
+def _content_length(raw_headers: list[tuple[bytes, bytes]]) -> int:
+    """Body size from raw ASGI headers (0 if unknown, e.g. streaming)"""
+    for name, value in raw_headers:
+        if name == b"content-length":
+            return int(value)
+    return 0
+
+
+async def _timed(timings: dict[str, float], phase: str, step):
+    start = time.perf_counter()
+    try:
+        await step
+    finally:
+        timings[phase] = time.perf_counter() - start
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # startup
     logger.info(f"Starting {settings.app_name} in {settings.environment} mode")
-
-    # create db tables
-    Base.metadata.create_all(bind=engine)
-
-    # initialise services
-    sqs_service.initialise()
-    audit_service.initialise()
-    cache_service.initialise()
-
-    logger.info("Database tables created")
-
-    slo_task = asyncio.create_task(periodic_slo_calculation())
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+
+    # before anything borrows a thread: the default pool is resized in place
+    worker_pool.initialise()
+    ops_pool.initialise()
+
+    # independent services connect concurrently in worker threads; each
+    # degrades on its own if its dependency is down, so waits don't add up
+    steps = {
+        "sqs": sqs_service.initialise,
+        "audit": audit_service.initialise,
+        "cache": cache_service.initialise,
+        "idempotency": idempotency_service.initialise,
+        "rate_limiter": get_shared_redis,
+        "tracing": tracer.initialise,
+    }
+    if settings.metering_enabled:
+        steps["metering"] = metering_service.initialise
+    # schema changes belong to the deploy (python -m app.db.migrate)
+    if settings.db_create_schema:
+        steps["schema"] = create_schema
+    await asyncio.gather(
+        *(
+            _timed(timings, phase, asyncio.to_thread(step))
+            for phase, step in steps.items()
+        )
+    )
+
+    if settings.metering_enabled:
+        metering_service.start()
+    if settings.loop_monitor_enabled:
+        loop_monitor.start(app.routes)
+
+    # probe dependencies in the background; health endpoints serve the cache
+    await _timed(timings, "health", health_service.start())
+
+    # SLIs are updated per request; the gauges are computed at scrape time
+    slo_service.register_metrics()
+    memory_service.register_metrics()
+
+    timings["total"] = time.perf_counter() - started
+    for phase, seconds in timings.items():
+        startup_phase_seconds.labels(phase=phase).set(seconds)
+    report = ", ".join(f"{phase}={s * 1000:.0f}ms" for phase, s in timings.items())
+    logger.info(f"Startup complete: {report}")
 
     yield
 
     # shutdown
-    slo_task.cancel()
+    await loop_monitor.stop()
+    await health_service.stop()
+    await student_writer.drain()
+
+    # drain buffered audit records and sync spools before the process exits
+    await asyncio.to_thread(audit_service.shutdown)
+    await asyncio.to_thread(sqs_service.shutdown)
+    cache_service.shutdown()
+    await metering_service.stop()
+    await external_grade_service.close()
+    await asyncio.to_thread(tracer.shutdown)
+
     logger.info("Shutting down gracefully")
 
 
@@ -96,6 +176,18 @@ class ConfiguredRateLimitMiddleware(RateLimitMiddleware):
 
 app.add_middleware(ConfiguredRateLimitMiddleware, default_limit=RateLimits.DEFAULT)
 
+# Added after the rate limiter so it runs before it: shed overload before any
+# per-client work (or Redis round trip) is done
+if settings.concurrency_limit_enabled:
+    app.add_middleware(
+        ConcurrencyLimitMiddleware,
+        limit=GradientLimit(
+            initial_limit=settings.concurrency_limit_initial,
+            min_limit=settings.concurrency_limit_min,
+            max_limit=settings.concurrency_limit_max,
+        ),
+    )
+
 # Simple rate limiting for testing
 # request_counts = {}
 
@@ -119,6 +211,9 @@ app.add_middleware(ConfiguredRateLimitMiddleware, default_limit=RateLimits.DEFAU
 # api handlers
 app.include_router(health.router, tags=["health"])
 app.include_router(students.router, prefix="/api/v1", tags=["students"])
+app.include_router(audit.router, prefix="/api/v1", tags=["audit"])
+app.include_router(usage.router, prefix="/api/v1", tags=["usage"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
 
 
 @app.get("/")
@@ -142,4 +237,23 @@ async def add_metrics(request, call_next):
 
     http_request_duration.observe(duration)
 
+    if request.url.path not in SLO_EXCLUDED_PATHS:
+        slo_service.record(duration, response.status_code)
+        if settings.metering_enabled:
+            # route templates, not raw paths, so IDs don't explode the keys
+            route = request.scope.get("route")
+            metering_service.record(
+                client_identifier(request),
+                route.path if route else "unmatched",
+                _content_length(request.scope["headers"]),
+                _content_length(response.raw_headers),
+                duration,
+            )
+
     return response
+
+
+# Added last so it is the outermost middleware and every other one runs
+# inside the request's trace
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
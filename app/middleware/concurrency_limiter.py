@@ -0,0 +1,123 @@
+import math
+import time
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.metrics import (
+    concurrency_in_flight,
+    concurrency_limit,
+    concurrency_shed_total,
+)
+
+
+class GradientLimit:
+    """Concurrency limit tuned from observed latency (gradient algorithm).
+
+    A slow-moving average of request latency stands in for the no-load
+    latency. While recent latency stays close to it the limit grows by a
+    small queue allowance; as latency rises above it the limit shrinks in
+    proportion. Failed requests back the limit off multiplicatively. The
+    limit only grows while it is actually being used, so an idle service
+    doesn't drift to `max_limit`.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 5,
+        max_limit: int = 500,
+        smoothing: float = 0.2,
+        tolerance: float = 1.5,
+        long_window: int = 600,
+        backoff_ratio: float = 0.9,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self._long_decay = 2 / (long_window + 1)
+        self._short_decay = 2 / (10 + 1)
+        self.long_rtt: float | None = None
+        self.short_rtt: float | None = None
+
+    def on_sample(self, rtt: float, in_flight: int, dropped: bool = False) -> int:
+        if dropped:
+            self._set(self.limit * self.backoff_ratio)
+            return int(self.limit)
+
+        if self.long_rtt is None:
+            self.long_rtt = self.short_rtt = rtt
+        else:
+            self.long_rtt += (rtt - self.long_rtt) * self._long_decay
+            self.short_rtt += (rtt - self.short_rtt) * self._short_decay
+
+        # after a long overload the baseline has crept up; pull it back so
+        # the limit can recover once latency does
+        if self.long_rtt > 2 * self.short_rtt:
+            self.long_rtt *= 0.95
+
+        if in_flight < self.limit / 2:
+            return int(self.limit)  # not using the limit; no evidence to grow
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        self._set(self.limit * (1 - self.smoothing) + new_limit * self.smoothing)
+        return int(self.limit)
+
+    def _set(self, limit: float):
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        concurrency_limit.set(int(self.limit))
+
+
+class ConcurrencyLimitMiddleware(BaseHTTPMiddleware):
+    """Shed requests beyond the adaptive in-flight limit with a fast 503
+
+    Paths in `exempt_paths` (liveness and scrapes) bypass the limiter so
+    the process is never killed or blinded for being busy.
+    """
+
+    def __init__(
+        self,
+        app,
+        limit: GradientLimit | None = None,
+        exempt_paths: set[str] | None = None,
+        retry_after: int = 1,
+    ):
+        super().__init__(app)
+        self.limit = limit or GradientLimit()
+        self.exempt_paths = (
+            exempt_paths if exempt_paths is not None else {"/health/live", "/metrics"}
+        )
+        self.retry_after = retry_after
+        self.in_flight = 0
+        concurrency_limit.set(int(self.limit.limit))
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in self.exempt_paths:
+            return await call_next(request)
+
+        if self.in_flight >= int(self.limit.limit):
+            concurrency_shed_total.inc()
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Server overloaded", "retry_after": self.retry_after},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self.in_flight += 1
+        concurrency_in_flight.set(self.in_flight)
+        start = time.perf_counter()
+        dropped = True
+        try:
+            response = await call_next(request)
+            dropped = response.status_code >= 500
+            return response
+        finally:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            concurrency_in_flight.set(self.in_flight)
+            self.limit.on_sample(time.perf_counter() - start, in_flight, dropped)
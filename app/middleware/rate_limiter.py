@@ -1,5 +1,7 @@
 import hashlib
 import json
+import logging
+import threading
 import time
 
 import redis
@@ -7,6 +9,13 @@ from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.tracing import span
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
 
 class RateLimitExceeded(HTTPException):
     def __init__(self, retry_after: int):
@@ -17,6 +26,93 @@ class RateLimitExceeded(HTTPException):
         )
 
 
+# a failed connection is retried after RETRY_MIN seconds, doubling to RETRY_MAX
+RETRY_MIN = 1.0
+RETRY_MAX = 30.0
+
+_shared_redis: redis.Redis | None = None
+_next_attempt = 0.0  # monotonic; no connection attempts before this
+_retry_delay = RETRY_MIN
+_connecting = False
+_shared_redis_lock = threading.Lock()
+
+
+def get_shared_redis(wait: bool = True) -> redis.Redis | None:
+    """One Redis connection pool for every limiter
+
+    Returns None while Redis is unreachable, in which case limiters fall back
+    to in-memory buckets. Failed connections are retried with a backoff, so
+    a Redis that comes up after the app is picked up. With `wait=False` (the
+    request path) a due attempt runs in a background thread instead.
+    """
+    global _connecting
+    if _shared_redis is not None or time.monotonic() < _next_attempt:
+        return _shared_redis
+    with _shared_redis_lock:
+        if _connecting:
+            return _shared_redis
+        _connecting = True
+
+    if wait:
+        _connect()
+    else:
+        threading.Thread(
+            target=_connect, name="rate-limiter-redis", daemon=True
+        ).start()
+    return _shared_redis
+
+
+def _connect():
+    global _shared_redis, _next_attempt, _retry_delay, _connecting
+    try:
+        client = redis.Redis(
+            connection_pool=redis.ConnectionPool.from_url(
+                settings.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=1,
+                socket_timeout=1,
+            )
+        )
+        faults.instrument_redis(client)
+        client.ping()
+        _shared_redis = client
+        _retry_delay = RETRY_MIN
+        logger.info("Rate limiter initialised with Redis")
+    except Exception as e:
+        logger.warning(
+            "Rate limiter Redis connection failed, retrying in %.0fs: %s",
+            _retry_delay,
+            e,
+        )
+        _next_attempt = time.monotonic() + _retry_delay
+        _retry_delay = min(_retry_delay * 2, RETRY_MAX)
+    finally:
+        with _shared_redis_lock:
+            _connecting = False
+
+
+def client_identifier(request: Request) -> str:
+    """Identify the caller by IP, plus a token hash if authenticated
+
+    Shared by rate limiting and usage metering so both see the same clients.
+    Reads the raw ASGI headers: building `request.headers` decodes every
+    header, which costs more than the rest of this function.
+    """
+    # Get IP address
+    ip = request.scope["client"][0]
+
+    # If authenticated, include user ID
+    for name, value in request.scope["headers"]:
+        if name == b"authorization":
+            if value.startswith(b"Bearer "):
+                # Hash token to use as identifier (don't decode JWT here)
+                token_hash = hashlib.md5(value).hexdigest()[:8]
+                return f"{ip}:{token_hash}"
+            break
+
+    return ip
+
+
 class RateLimiter:
     """Token bucket rate limiter with Redis backend"""
 
@@ -30,20 +126,14 @@ class RateLimiter:
         self.per = per
         self.burst = burst or rate  # Allow burst equal to rate by default
         self.redis_client: redis.Redis | None = None
+        self._memory_store = {}
+        self._initialised = False
 
-    def initialise(self):
-        """initialise Redis connection"""
-        try:
-            self.redis_client = redis.Redis(
-                host="redis", port=6379, decode_responses=True
-            )
-            self.redis_client.ping()
-            print("Rate limiter initialised with Redis")
-        except Exception as e:
-            print(f"Rate limiter Redis init failed: {e}")
-            # Fall back to in-memory if Redis is down
-            self.redis_client = None
-            self._memory_store = {}
+    def initialise(self, wait: bool = True):
+        """initialise Redis connection (shared by all limiters)"""
+        # Fall back to in-memory if Redis is down
+        self.redis_client = get_shared_redis(wait=wait)
+        self._initialised = True
 
     def _get_key(self, identifier: str, endpoint: str) -> str:
         """Generate Redis key for rate limit bucket"""
@@ -57,10 +147,10 @@ class RateLimiter:
                 if data:
                     return json.loads(data)
             except Exception as e:
-                print(f"Redis error: {e}")
+                logger.warning("Redis error: %s", e)
         else:
             # In-memory fallback
-            if hasattr(self, "_memory_store") and key in self._memory_store:
+            if key in self._memory_store:
                 return self._memory_store[key]
 
         # Initiase new bucket - ALWAYS return a dict
@@ -82,7 +172,14 @@ class RateLimiter:
         Check if request is within rate limit
         Returns: (allowed: bool, retry_after: int)
         """
-        print(f"Rate limit check for {identifier} on {endpoint}")  # Debug
+        logger.debug("Rate limit check for %s on %s", identifier, endpoint)
+
+        if not self._initialised:
+            # never connect on the request path; the lifespan connects
+            self.initialise(wait=False)
+        elif self.redis_client is None:
+            # Redis was down; switch over once a background retry connects
+            self.redis_client = get_shared_redis(wait=False)
 
         key = self._get_key(identifier, endpoint)
         bucket = self._get_bucket(key)
@@ -117,28 +214,16 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         self.default_limit = default_limit
         self.endpoint_limits = {}
-
-        # initialise rate limiter
-        self.default_limit.initialise()
+        # limiters connect to Redis on first use (or when startup warms the
+        # shared client), so building the middleware stack stays cheap
 
     def add_endpoint_limit(self, path: str, limiter: RateLimiter):
         """Add specific rate limit for an endpoint"""
-        limiter.initialise()
         self.endpoint_limits[path] = limiter
 
     def _get_identifier(self, request: Request) -> str:
         """Get identifier for rate limiting (IP + User if authenticated)"""
-        # Get IP address
-        ip = request.client.host
-
-        # If authenticated, include user ID
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            # Hash token to use as identifier (don't decode JWT here)
-            token_hash = hashlib.md5(auth_header.encode()).hexdigest()[:8]
-            return f"{ip}:{token_hash}"
-
-        return ip
+        return client_identifier(request)
 
     def _get_limiter_for_path(self, path: str) -> RateLimiter:
         """Get appropriate rate limiter for path"""
@@ -155,7 +240,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
     async def dispatch(self, request: Request, call_next):
         # Skip rate limiting for health checks and metrics
-        print(f"Rate limiter called for: {request.url.path}")  # Add this
+        logger.debug("Rate limiter called for: %s", request.url.path)
 
         if request.url.path in ["/health", "/health/live", "/health/ready", "/metrics"]:
             return await call_next(request)
@@ -163,7 +248,10 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         identifier = self._get_identifier(request)
         limiter = self._get_limiter_for_path(request.url.path)
 
-        allowed, retry_after = limiter.check_rate_limit(identifier, request.url.path)
+        with span("rate_limit.check"):
+            allowed, retry_after = limiter.check_rate_limit(
+                identifier, request.url.path
+            )
 
         if not allowed:
             return JSONResponse(
@@ -0,0 +1,54 @@
+from fastapi import Request
+from fastapi.routing import APIRoute
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.tracing import Tracer, span, tracer
+
+CORRELATION_HEADER = "X-Correlation-ID"
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """Run each request under a trace and echo its correlation ID back
+
+    Add it last so it wraps every other middleware: the `request` span
+    then covers all of them, with the handler span nested inside.
+    """
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        super().__init__(app)
+        self.tracer = tracer
+
+    async def dispatch(self, request: Request, call_next):
+        trace, tokens = self.tracer.start_trace(
+            request.headers.get(CORRELATION_HEADER)
+        )
+        status_code = 500
+        try:
+            with span("request"):
+                response = await call_next(request)
+            status_code = response.status_code
+            response.headers[CORRELATION_HEADER] = trace.correlation_id
+            return response
+        finally:
+            self.tracer.end_trace(
+                trace,
+                tokens,
+                status_code,
+                method=request.method,
+                path=request.url.path,
+            )
+
+
+class TracedRoute(APIRoute):
+    """Route class recording the handler (dependencies and serialisation
+    included) as a span named after the route"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        name = f"handler {self.path}"
+
+        async def traced_handler(request: Request):
+            with span(name):
+                return await handler(request)
+
+        return traced_handler
@@ -1,46 +1,462 @@
+import base64
+import json
+import logging
+import queue
+import threading
+import time
 import uuid
-from datetime import datetime
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
 
-import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+
+from app.core import aws
+from app.core.config import get_settings
+from app.core.metrics import (
+    audit_batch_writes_total,
+    audit_queue_depth,
+    audit_records_dropped_total,
+)
+from app.core.tracing import correlation_id_var, span
+from app.services.shared_circuit_breaker import create_circuit_breaker
+from app.services.spool import DiskSpool, SpoolReplayer
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "sre-playground-audit"
+
+# Secondary indexes, kept in step with infrastructure/terraform/main.tf
+ACTION_INDEX = "action-timestamp-index"
+DAY_INDEX = "day-timestamp-index"
+
+# DynamoDB caps BatchWriteItem at 25 put/delete requests
+BATCH_SIZE = 25
 
 
 class AuditService:
-    def __init__(self):
+    """Audit trail writer.
+
+    `log_action` only enqueues the record; a background worker drains the
+    queue into DynamoDB with BatchWriteItem so requests never wait on it.
+    Batches DynamoDB won't take (errors, open circuit) go to the local spool
+    and are replayed once it recovers.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 10000,
+        full_policy: str = "drop",
+        enqueue_timeout: float = 0.05,
+        flush_interval: float = 1.0,
+        max_retries: int = 5,
+        spool: DiskSpool | None = None,
+        replay_interval: float = 5.0,
+        replay_batch_size: int = 100,
+    ):
+        if full_policy not in ("drop", "block"):
+            raise ValueError(f"Unknown audit queue policy: {full_policy}")
+
         self.dynamodb = None
         self.table = None
+        self.full_policy = full_policy
+        self.enqueue_timeout = enqueue_timeout
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+
+        self.circuit_breaker = create_circuit_breaker(
+            "audit", failure_threshold=3, timeout=30
+        )
+        self.spool = spool
+        self.replayer = (
+            SpoolReplayer(
+                spool,
+                self._replay_batch,
+                batch_size=replay_batch_size,
+                interval=replay_interval,
+            )
+            if spool
+            else None
+        )
 
     def initialise(self):
-        """Initialise DynamoDB client"""
+        """Initialise DynamoDB client and start the writer thread"""
         try:
-            self.dynamodb = boto3.resource(
+            self.dynamodb = aws.resource(
                 "dynamodb",
-                endpoint_url="http://localstack:4566",
-                region_name="us-east-1",
-                aws_access_key_id="test",
-                aws_secret_access_key="test",
+                config=Config(connect_timeout=2, read_timeout=5),
             )
-            self.table = self.dynamodb.Table("sre-playground-audit")
-            print("Audit Service initialised")
+            self.table = self.dynamodb.Table(TABLE_NAME)
+            self._start_worker()
+            if self.replayer:
+                self.replayer.start()
+            logger.info("Audit Service initialised")
         except Exception as e:
-            print(f"Failed to initialise Audit Service: {e}")
+            logger.error("Failed to initialise Audit Service: %s", e)
 
     def log_action(self, action: str, details: dict[str, Any]):
-        """Log an action to audit trail"""
+        """Queue an action for the audit trail"""
         if not self.table:
             return
 
+        timestamp = datetime.utcnow().isoformat()
+        item = {
+            "id": str(uuid.uuid4()),
+            "timestamp": timestamp,
+            # day bucket lets time-range queries avoid a full scan
+            "day": timestamp[:10],
+            "action": action,
+            "details": details,
+        }
+        correlation_id = correlation_id_var.get()
+        if correlation_id:
+            item["correlation_id"] = correlation_id
+
+        try:
+            with span("audit.enqueue", action=action):
+                if self.full_policy == "block":
+                    self._queue.put(item, timeout=self.enqueue_timeout)
+                else:
+                    self._queue.put_nowait(item)
+        except queue.Full:
+            audit_records_dropped_total.labels(reason="queue_full").inc()
+            return
+
+        audit_queue_depth.set(self._queue.qsize())
+
+    def create_table(self):
+        """Create the audit table and its indexes (LocalStack and tests only)
+
+        Terraform owns the table everywhere else; keep the two definitions in
+        sync.
+        """
+        index_projection = {"ProjectionType": "ALL"}
+        self.table = self.dynamodb.create_table(
+            TableName=TABLE_NAME,
+            BillingMode="PAY_PER_REQUEST",
+            KeySchema=[
+                {"AttributeName": "id", "KeyType": "HASH"},
+                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "id", "AttributeType": "S"},
+                {"AttributeName": "timestamp", "AttributeType": "S"},
+                {"AttributeName": "action", "AttributeType": "S"},
+                {"AttributeName": "day", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": ACTION_INDEX,
+                    "KeySchema": [
+                        {"AttributeName": "action", "KeyType": "HASH"},
+                        {"AttributeName": "timestamp", "KeyType": "RANGE"},
+                    ],
+                    "Projection": index_projection,
+                },
+                {
+                    "IndexName": DAY_INDEX,
+                    "KeySchema": [
+                        {"AttributeName": "day", "KeyType": "HASH"},
+                        {"AttributeName": "timestamp", "KeyType": "RANGE"},
+                    ],
+                    "Projection": index_projection,
+                },
+            ],
+        )
+        return self.table
+
+    def query(
+        self,
+        action: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        limit: int = 100,
+        cursor: str | None = None,
+    ) -> dict[str, Any]:
+        """Time-range query over the audit trail, oldest first
+
+        With `action` this reads a single partition of the action index.
+        Without it, the range is walked one day partition at a time, so both
+        paths stay index queries. Pass the returned `next_cursor` back in to
+        fetch the following page.
+        """
+        end = _to_utc(end) if end else datetime.utcnow()
+        start = _to_utc(start) if start else end - timedelta(days=1)
+        if start > end:
+            raise ValueError("start must be before end")
+
+        time_range = Key("timestamp").between(start.isoformat(), end.isoformat())
+        if action:
+            index, attribute, values = ACTION_INDEX, "action", [action]
+        else:
+            index, attribute, values = DAY_INDEX, "day", _days(start, end)
+        partitions = [(index, Key(attribute).eq(value)) for value in values]
+
+        position, last_key = 0, None
+        if cursor:
+            position, last_key = _decode_cursor(cursor, attribute)
+            # a start key from another query would fail in DynamoDB instead
+            if last_key and (
+                position >= len(values)
+                or last_key[attribute] != values[position]
+                or not start.isoformat() <= last_key["timestamp"] <= end.isoformat()
+            ):
+                raise ValueError("Invalid cursor")
+
+        items: list[dict] = []
+
+        while position < len(partitions) and len(items) < limit:
+            index, partition_key = partitions[position]
+            params = {
+                "IndexName": index,
+                "KeyConditionExpression": partition_key & time_range,
+                "Limit": limit - len(items),
+            }
+            if last_key:
+                params["ExclusiveStartKey"] = last_key
+
+            response = self.table.query(**params)
+            items.extend(response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+
+            if not last_key:
+                position += 1
+
+        next_cursor = None
+        if position < len(partitions):
+            next_cursor = _encode_cursor({"partition": position, "key": last_key})
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    def export(
+        self, total_segments: int = 4, action: str | None = None
+    ) -> Iterator[dict]:
+        """Stream the whole table using a parallel segmented scan
+
+        Each segment is scanned by its own thread; pages are handed over
+        through a small bounded queue so memory stays flat however large the
+        table is. Items arrive in no particular order.
+        """
+        pages: queue.Queue = queue.Queue(maxsize=total_segments * 2)
+        stop = threading.Event()
+        done = object()
+
+        def scan_segment(segment: int):
+            params: dict[str, Any] = {
+                "Segment": segment,
+                "TotalSegments": total_segments,
+            }
+            if action:
+                params["FilterExpression"] = Attr("action").eq(action)
+
+            try:
+                while not stop.is_set():
+                    response = self.table.scan(**params)
+                    _put_unless_stopped(pages, response.get("Items", []), stop)
+
+                    last_key = response.get("LastEvaluatedKey")
+                    if not last_key:
+                        break
+                    params["ExclusiveStartKey"] = last_key
+            except Exception as e:
+                _put_unless_stopped(pages, e, stop)
+            finally:
+                _put_unless_stopped(pages, done, stop)
+
+        executor = ThreadPoolExecutor(
+            max_workers=total_segments, thread_name_prefix="audit-export"
+        )
         try:
-            self.table.put_item(
-                Item={
-                    "id": str(uuid.uuid4()),
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "action": action,
-                    "details": details,
-                }
+            for segment in range(total_segments):
+                executor.submit(scan_segment, segment)
+
+            remaining = total_segments
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield from page
+        finally:
+            # also reached when the consumer stops early, e.g. a client
+            # disconnecting mid-export
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def flush(self):
+        """Block until every queued record has been written or dropped"""
+        if self._worker and self._worker.is_alive():
+            self._queue.join()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the writer, draining whatever is still queued"""
+        if not self._worker:
+            return
+
+        self._stop.set()
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            logger.warning("Audit writer did not drain within %ss", timeout)
+        self._worker = None
+
+        if self.replayer:
+            self.replayer.stop()
+        if self.spool:
+            self.spool.close()
+
+    def _start_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+
+        self._stop.clear()
+        self._worker = threading.Thread(
+            target=self._run, name="audit-writer", daemon=True
+        )
+        self._worker.start()
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            try:
+                unwritten = self.circuit_breaker.call(self._write_batch, batch)
+            except Exception as e:
+                logger.warning("Failed to log audit: %s", e)
+                unwritten = batch
+
+            try:
+                self._spool_records(unwritten)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                audit_queue_depth.set(self._queue.qsize())
+
+    def _next_batch(self) -> list[dict]:
+        """Wait for the first record, then take up to BATCH_SIZE without waiting"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _write_batch(self, items: list[dict]) -> list[dict]:
+        """BatchWriteItem with exponential backoff on UnprocessedItems
+
+        Returns the items DynamoDB still hadn't accepted after all retries.
+        """
+        requests = [{"PutRequest": {"Item": item}} for item in items]
+        client = self.table.meta.client
+
+        for attempt in range(self.max_retries + 1):
+            response = client.batch_write_item(RequestItems={TABLE_NAME: requests})
+            requests = response.get("UnprocessedItems", {}).get(TABLE_NAME, [])
+
+            if not requests:
+                audit_batch_writes_total.labels(status="success").inc()
+                return []
+
+            audit_batch_writes_total.labels(status="partial").inc()
+            if attempt < self.max_retries:
+                time.sleep(min(0.05 * 2**attempt, 2.0))
+
+        logger.warning("%d audit records left unprocessed", len(requests))
+        return [request["PutRequest"]["Item"] for request in requests]
+
+    def _spool_records(self, items: list[dict]):
+        for item in items:
+            if not (self.spool and self.spool.append(item)):
+                audit_records_dropped_total.labels(reason="write_error").inc()
+
+    def _replay_batch(self, items: list[dict]):
+        """Spool replay sink; puts are keyed by id so re-sends are harmless"""
+        for i in range(0, len(items), BATCH_SIZE):
+            unwritten = self.circuit_breaker.call(
+                self._write_batch, items[i : i + BATCH_SIZE]
             )
-        except Exception as e:
-            print(f"Failed to log audit: {e}")
+            if unwritten:
+                raise Exception(f"{len(unwritten)} audit records still unprocessed")
+
+
+def _to_utc(value: datetime) -> datetime:
+    """Stored timestamps are naive UTC; normalise query bounds to match"""
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _days(start: datetime, end: datetime) -> list[str]:
+    day = start.date()
+    days = []
+    while day <= end.date():
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def _encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def _decode_cursor(cursor: str, attribute: str) -> tuple[int, dict | None]:
+    """Partition position and start key, checked before DynamoDB sees them"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    position, key = state.get("partition", 0), state.get("key")
+    if type(position) is not int or position < 0:
+        raise ValueError("Invalid cursor")
+    if key is not None and (
+        not isinstance(key, dict)
+        or key.keys() != {"id", "timestamp", attribute}
+        or not all(isinstance(value, str) for value in key.values())
+    ):
+        raise ValueError("Invalid cursor")
+    return position, key
+
+
+def _put_unless_stopped(pages: queue.Queue, page, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            pages.put(page, timeout=0.1)
+            return
+        except queue.Full:
+            continue
 
 
-audit_service = AuditService()
+audit_service = AuditService(
+    max_queue_size=settings.audit_queue_size,
+    full_policy=settings.audit_queue_full_policy,
+    enqueue_timeout=settings.audit_enqueue_timeout,
+    flush_interval=settings.audit_flush_interval,
+    max_retries=settings.audit_max_retries,
+    spool=DiskSpool(
+        "audit",
+        settings.spool_dir,
+        max_bytes=settings.spool_max_bytes,
+        fsync_batch=settings.spool_fsync_batch,
+        fsync_interval=settings.spool_fsync_interval,
+    ),
+    replay_interval=settings.spool_replay_interval,
+    replay_batch_size=settings.spool_replay_batch_size,
+)
@@ -0,0 +1,318 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable
+
+import redis
+
+from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.metrics import (
+    cache_errors_total,
+    cache_evictions_total,
+    cache_hits_total,
+    cache_misses_total,
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# stored in place of a value when a loader found nothing
+NEGATIVE = {"__cache_negative__": True}
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Size-bounded LRU with per-entry expiry, safe to share between threads"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Returns the value or _MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                cache_evictions_total.labels(tier="local", reason="expired").inc()
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                cache_evictions_total.labels(tier="local", reason="size").inc()
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheService:
+    """Two-tier cache: an in-process LRU in front of Redis.
+
+    Reads try the local tier, then Redis, and copy Redis hits into the local
+    tier for at most `local_ttl` seconds. Writes and deletes go to both and
+    are announced on a pub/sub channel so other workers drop their local
+    copy; `local_ttl` bounds staleness if an announcement is lost. Default
+    TTLs are jittered so keys written together don't expire together.
+    Redis errors, values that can't be serialised to JSON and corrupt
+    payloads are counted and treated as misses - the cache never fails the
+    caller.
+    """
+
+    def __init__(
+        self,
+        default_ttl: int = 300,
+        local_ttl: float = 5.0,
+        local_max_entries: int = 10000,
+        negative_ttl: int = 30,
+        ttl_jitter: float = 0.1,
+        channel: str = "cache:invalidate",
+        redis_url: str = "redis://redis:6379",
+    ):
+        self.default_ttl = default_ttl
+        self.local_ttl = local_ttl
+        self.negative_ttl = negative_ttl
+        self.ttl_jitter = ttl_jitter
+        self.channel = channel
+        self.redis_url = redis_url
+        self.local = LocalCache(local_max_entries)
+        self.redis_client: redis.Redis | None = None
+        self.origin = uuid.uuid4().hex  # tells our own announcements apart
+        self._pubsub = None
+        self._listener = None
+
+    def initialise(self):
+        """Connect to Redis and subscribe to invalidations - call on app startup"""
+        try:
+            self.redis_client = redis.Redis(
+                connection_pool=redis.ConnectionPool.from_url(
+                    self.redis_url,
+                    decode_responses=True,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+            )
+            faults.instrument_redis(self.redis_client)
+            self._pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self.channel: self._on_invalidation})
+            self._listener = self._pubsub.run_in_thread(
+                sleep_time=1.0,
+                daemon=True,
+                exception_handler=self._on_listener_error,
+            )
+            logger.info("Cache service initialised")
+        except Exception as e:
+            # the local tier keeps working on its own
+            cache_errors_total.labels(operation="initialise").inc()
+            logger.warning("Cache service Redis init failed: %s", e)
+
+    def shutdown(self):
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
+        if self._pubsub:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def get(self, key: str) -> Any:
+        """Cached value, or None on a miss (or a negatively cached key)"""
+        value = self._get_entry(key)
+        if value is _MISSING or value == NEGATIVE:
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: int | None = None):
+        """Store in both tiers; an explicit `ttl` is used exactly as given"""
+        if ttl is None:
+            ttl = self._jittered(self.default_ttl)
+        try:
+            raw = json.dumps(value)
+        except (TypeError, ValueError):
+            # not cacheable; drop any older copy rather than serve it
+            cache_errors_total.labels(operation="serialise").inc()
+            self.delete(key)
+            return
+
+        self.local.set(key, value, min(ttl, self._jittered(self.local_ttl)))
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.setex(key, ttl, raw)
+            self._announce(key)
+        except redis.RedisError:
+            cache_errors_total.labels(operation="set").inc()
+
+    def delete(self, key: str):
+        if self.local.delete(key):
+            cache_evictions_total.labels(tier="local", reason="invalidated").inc()
+        if self.redis_client is None:
+            return
+        try:
+            if self.redis_client.delete(key):
+                cache_evictions_total.labels(tier="redis", reason="invalidated").inc()
+            self._announce(key)
+        except redis.RedisError:
+            cache_errors_total.labels(operation="delete").inc()
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: int | None = None):
+        """Cached value, calling `loader` on a miss
+
+        A loader returning None is cached as a negative entry for
+        `negative_ttl` so lookups of missing records don't keep reaching
+        the database.
+        """
+        value = self._get_entry(key)
+        if value is not _MISSING:
+            return None if value == NEGATIVE else value
+
+        value = loader()
+        self._store_loaded(key, value, ttl)
+        return value
+
+    def cached(
+        self, ttl: int | None = None, key_prefix: str | None = None
+    ) -> Callable:
+        """Decorator caching a function's result by its arguments
+
+        Works on plain and async functions; arguments must have a stable
+        repr. For async functions the Redis lookup runs in a worker thread.
+        """
+
+        def decorator(func: Callable) -> Callable:
+            prefix = key_prefix or f"{func.__module__}.{func.__qualname__}"
+
+            def make_key(args, kwargs) -> str:
+                parts = [repr(a) for a in args]
+                parts += [f"{k}={v!r}" for k, v in sorted(kwargs.items())]
+                return f"cache:{prefix}:{':'.join(parts)}"
+
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    key = make_key(args, kwargs)
+                    value = self._get_local(key)
+                    if value is _MISSING:
+                        value = await asyncio.to_thread(self._get_remote, key)
+                    if value is not _MISSING:
+                        return None if value == NEGATIVE else value
+
+                    value = await func(*args, **kwargs)
+                    await asyncio.to_thread(self._store_loaded, key, value, ttl)
+                    return value
+
+                async_wrapper.invalidate = lambda *a, **kw: self.delete(make_key(a, kw))
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.get_or_load(
+                    make_key(args, kwargs), lambda: func(*args, **kwargs), ttl
+                )
+
+            wrapper.invalidate = lambda *a, **kw: self.delete(make_key(a, kw))
+            return wrapper
+
+        return decorator
+
+    def _get_entry(self, key: str) -> Any:
+        value = self._get_local(key)
+        if value is _MISSING:
+            value = self._get_remote(key)
+        return value
+
+    def _get_local(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is _MISSING:
+            cache_misses_total.labels(tier="local").inc()
+        else:
+            cache_hits_total.labels(tier="local").inc()
+        return value
+
+    def _get_remote(self, key: str) -> Any:
+        """Look up Redis and copy a hit into the local tier"""
+        if self.redis_client is None:
+            return _MISSING
+        try:
+            raw = self.redis_client.get(key)
+        except redis.RedisError:
+            cache_errors_total.labels(operation="get").inc()
+            return _MISSING
+
+        if raw is None:
+            cache_misses_total.labels(tier="redis").inc()
+            return _MISSING
+
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            cache_errors_total.labels(operation="deserialise").inc()
+            return _MISSING
+
+        cache_hits_total.labels(tier="redis").inc()
+        self.local.set(key, value, self._jittered(self.local_ttl))
+        return value
+
+    def _store_loaded(self, key: str, value: Any, ttl: int | None):
+        if value is None:
+            self.set(key, NEGATIVE, self._jittered(self.negative_ttl))
+        else:
+            self.set(key, value, ttl)
+
+    def _jittered(self, ttl: float) -> int | float:
+        spread = ttl * self.ttl_jitter
+        jittered = ttl + random.uniform(-spread, spread)
+        return max(1, round(jittered)) if isinstance(ttl, int) else jittered
+
+    def _announce(self, key: str):
+        self.redis_client.publish(self.channel, f"{self.origin}:{key}")
+
+    def _on_invalidation(self, message: dict):
+        origin, _, key = message["data"].partition(":")
+        if origin == self.origin:
+            return
+        if self.local.delete(key):
+            cache_evictions_total.labels(tier="local", reason="invalidated").inc()
+
+    def _on_listener_error(self, error: Exception, pubsub, thread):
+        # invalidations may have been missed while disconnected; start clean.
+        # The pubsub resubscribes when it reconnects on the next poll.
+        cache_errors_total.labels(operation="subscribe").inc()
+        self.local.clear()
+        time.sleep(1.0)
+
+
+cache_service = CacheService(
+    default_ttl=settings.cache_default_ttl,
+    local_ttl=settings.cache_local_ttl,
+    local_max_entries=settings.cache_local_max_entries,
+    negative_ttl=settings.cache_negative_ttl,
+    ttl_jitter=settings.cache_ttl_jitter,
+    redis_url=settings.redis_url,
+)
@@ -1,6 +1,17 @@
-from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from enum import Enum
 
+from app.core.metrics import (
+    circuit_breaker_calls_total,
+    circuit_breaker_rejections_total,
+    circuit_breaker_state,
+)
+
 
 class CircuitState(Enum):
     CLOSED = "closed"
@@ -8,46 +19,336 @@ class CircuitState(Enum):
     HALF_OPEN = "half_open"
 
 
+# exported as the circuit_breaker_state gauge value
+STATE_VALUES = {
+    CircuitState.CLOSED: 0,
+    CircuitState.HALF_OPEN: 1,
+    CircuitState.OPEN: 2,
+}
+
+
+class CircuitBreakerOpenError(Exception):
+    """Raised instead of calling the dependency while the circuit is open"""
+
+    def __init__(self, name: str, state: CircuitState):
+        super().__init__(f"Circuit breaker {name} is {state.name}")
+        self.name = name
+        self.state = state
+
+
+class CircuitBreakerTimeout(TimeoutError):
+    """The protected call ran past `call_timeout`"""
+
+
+class _CountWindow:
+    """Outcomes of the last `size` calls"""
+
+    def __init__(self, size: int):
+        self._outcomes: deque[bool] = deque(maxlen=size)
+        self._failures = 0
+
+    def record(self, failed: bool):
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._failures -= self._outcomes[0]
+        self._outcomes.append(failed)
+        self._failures += failed
+
+    def totals(self) -> tuple[int, int]:
+        return len(self._outcomes), self._failures
+
+    def reset(self):
+        self._outcomes.clear()
+        self._failures = 0
+
+
+class _TimeWindow:
+    """Outcomes of calls in the last `size` seconds, in per-second buckets"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._calls = [0] * size
+        self._failures = [0] * size
+        self._total_calls = 0
+        self._total_failures = 0
+        self._current = int(time.monotonic())
+
+    def record(self, failed: bool):
+        slot = self._advance()
+        self._calls[slot] += 1
+        self._total_calls += 1
+        if failed:
+            self._failures[slot] += 1
+            self._total_failures += 1
+
+    def totals(self) -> tuple[int, int]:
+        self._advance()
+        return self._total_calls, self._total_failures
+
+    def reset(self):
+        self._calls = [0] * self._size
+        self._failures = [0] * self._size
+        self._total_calls = 0
+        self._total_failures = 0
+
+    def _advance(self) -> int:
+        """Expire buckets that fell out of the window; amortised O(1)"""
+        now = int(time.monotonic())
+        last = min(now, self._current + self._size)
+        for second in range(self._current + 1, last + 1):
+            slot = second % self._size
+            self._total_calls -= self._calls[slot]
+            self._total_failures -= self._failures[slot]
+            self._calls[slot] = 0
+            self._failures[slot] = 0
+        self._current = max(self._current, now)
+        return now % self._size
+
+
 class CircuitBreaker:
-    def __init__(self, name: str, failure_threshold: int = 3, timeout: int = 60):
+    """Thread-safe circuit breaker for sync and async calls.
+
+    The circuit opens after `failure_threshold` consecutive failures or, when
+    `failure_rate_threshold` is set, once the failure rate over the rolling
+    window (the last `window_size` calls, or seconds with
+    `window_type="time"`) reaches it with at least `minimum_calls` recorded.
+    After `timeout` seconds it lets `half_open_max_calls` probes through;
+    they all have to succeed to close it again. Calls running past
+    `call_timeout` are abandoned and count as failures.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        timeout: int = 60,
+        failure_rate_threshold: float | None = None,
+        window_type: str = "count",
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        call_timeout: float | None = None,
+        half_open_max_calls: int = 1,
+    ):
+        if window_type not in ("count", "time"):
+            raise ValueError(f"Unknown window type: {window_type}")
+
         self.name = name
         self.failure_threshold = failure_threshold
         self.timeout = timeout
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.call_timeout = call_timeout
+        self.half_open_max_calls = half_open_max_calls
+
         self.failure_count = 0
-        self.last_failure_time: datetime | None = None
+        self.last_failure_time: float | None = None
         self.state = CircuitState.CLOSED
 
+        self._window = (
+            _CountWindow(window_size)
+            if window_type == "count"
+            else _TimeWindow(window_size)
+        )
+        self._lock = threading.Lock()
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+        circuit_breaker_state.labels(name=name).set(STATE_VALUES[self.state])
+
+    @property
+    def rejecting(self) -> bool:
+        """True while calls would be turned away without reaching the dependency
+
+        Unlike `call`, this doesn't use up a HALF_OPEN probe, so callers can
+        make one decision for a whole batch of calls.
+        """
+        return self.state == CircuitState.OPEN and not self._timeout_elapsed()
+
     def call(self, func, *args, **kwargs):
-        # check if to try
-        if self.state == CircuitState.OPEN:
-            if self._should_attempt_reset():
-                self.state = CircuitState.HALF_OPEN
+        may_probe = self._sync_before_acquire() if self._sync_due() else True
+        self._publish(self._acquire(may_probe))
+
+        try:
+            if self.call_timeout is None:
+                result = func(*args, **kwargs)
             else:
-                raise Exception(f"Circuit breaker {self.name} is OPEN")
+                future = self._get_executor().submit(func, *args, **kwargs)
+                try:
+                    result = future.result(timeout=self.call_timeout)
+                except FutureTimeoutError:
+                    future.cancel()
+                    raise self._timeout_error() from None
+        except CircuitBreakerTimeout:
+            self._publish(self._on_failure("timeout"))
+            raise
+        except Exception:
+            self._publish(self._on_failure())
+            raise
+        except BaseException:
+            self._release()
+            raise
+
+        self._publish(self._on_success())
+        return result
+
+    async def call_async(self, func, *args, **kwargs):
+        """Like `call`, for coroutine functions (sync ones run in a thread)
+
+        Any state sync with other workers (see `_sync_before_acquire` and
+        `_publish`) runs in a thread too, never on the event loop.
+        """
+        may_probe = True
+        if self._sync_due():
+            may_probe = await asyncio.to_thread(self._sync_before_acquire)
+        await self._publish_async(self._acquire(may_probe))
 
-        # try call fucntion
         try:
-            result = func(*args, **kwargs)
-            self._on_success()
-            return result
+            if asyncio.iscoroutinefunction(func):
+                pending = func(*args, **kwargs)
+            else:
+                pending = asyncio.to_thread(func, *args, **kwargs)
+
+            if self.call_timeout is None:
+                result = await pending
+            else:
+                try:
+                    result = await asyncio.wait_for(pending, self.call_timeout)
+                except asyncio.TimeoutError:
+                    raise self._timeout_error() from None
+        except CircuitBreakerTimeout:
+            await self._publish_async(self._on_failure("timeout"))
+            raise
         except Exception:
-            self._on_failure()
+            await self._publish_async(self._on_failure())
+            raise
+        except BaseException:
+            # cancelled: don't count it, but give back a HALF_OPEN probe slot
+            self._release()
             raise
 
-    def _should_attempt_reset(self):
+        await self._publish_async(self._on_success())
+        return result
+
+    def _acquire(self, may_probe: bool = True) -> CircuitState | None:
+        """Admit a call or raise CircuitBreakerOpenError
+
+        `may_probe` is False when an OPEN circuit whose timeout has passed
+        must still not probe (another worker holds the probe). Returns the
+        state the circuit moved to, if it moved.
+        """
+        changed = None
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                if may_probe and self._timeout_elapsed():
+                    self._transition(CircuitState.HALF_OPEN)
+                    changed = CircuitState.HALF_OPEN
+                else:
+                    self._reject()
+
+            if self.state == CircuitState.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self._reject()
+                self._half_open_calls += 1
+        return changed
+
+    def _reject(self):
+        circuit_breaker_rejections_total.labels(name=self.name).inc()
+        raise CircuitBreakerOpenError(self.name, self.state)
+
+    def _release(self):
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN and self._half_open_calls:
+                self._half_open_calls -= 1
+
+    def _sync_due(self) -> bool:
+        """Whether `_sync_before_acquire` has work to do for the next call"""
+        return False
+
+    def _sync_before_acquire(self) -> bool:
+        """Hook for breakers sharing state: runs before admission, unlocked
+
+        Returns `may_probe` for `_acquire`.
+        """
+        return True
+
+    def _publish(self, state: CircuitState | None):
+        """Hook for breakers sharing state: runs after a transition, unlocked"""
+
+    async def _publish_async(self, state: CircuitState | None):
+        # transitions are rare, so the thread hop is only paid on one
+        if state is not None:
+            await asyncio.to_thread(self._publish, state)
+
+    def _timeout_elapsed(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.timeout
+
+    def _on_success(self) -> CircuitState | None:
+        circuit_breaker_calls_total.labels(name=self.name, outcome="success").inc()
+
+        with self._lock:
+            self.failure_count = 0
+            self._window.record(False)
+
+            if self.state == CircuitState.HALF_OPEN:
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CircuitState.CLOSED)
+                    return CircuitState.CLOSED
+        return None
+
+    def _on_failure(self, outcome: str = "failure") -> CircuitState | None:
+        circuit_breaker_calls_total.labels(name=self.name, outcome=outcome).inc()
+
+        with self._lock:
+            self.failure_count += 1
+            self.last_failure_time = time.time()
+            self._window.record(True)
+
+            if self.state == CircuitState.HALF_OPEN or self._should_trip():
+                self._transition(CircuitState.OPEN)
+                return CircuitState.OPEN
+        return None
+
+    def _should_trip(self) -> bool:
+        if self.state != CircuitState.CLOSED:
+            return False
+        if self.failure_count >= self.failure_threshold:
+            return True
+        if self.failure_rate_threshold is None:
+            return False
+
+        calls, failures = self._window.totals()
         return (
-            self.last_failure_time
-            and datetime.now() - self.last_failure_time
-            > timedelta(seconds=self.timeout)
+            calls >= self.minimum_calls
+            and failures / calls >= self.failure_rate_threshold
         )
 
-    def _on_success(self):
-        self.failure_count = 0
-        if self.state == CircuitState.HALF_OPEN:
-            self.state = CircuitState.CLOSED
+    def _transition(self, state: CircuitState):
+        """Change state; caller holds the lock"""
+        self.state = state
+        self._half_open_calls = 0
+        self._half_open_successes = 0
 
-    def _on_failure(self):
-        self.failure_count += 1
-        self.last_failure_time = datetime.now()
-        if self.failure_count >= self.failure_threshold:
-            self.state = CircuitState.OPEN
+        if state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CircuitState.CLOSED:
+            self.failure_count = 0
+            self._window.reset()
+
+        circuit_breaker_state.labels(name=self.name).set(STATE_VALUES[state])
+
+    def _timeout_error(self) -> CircuitBreakerTimeout:
+        return CircuitBreakerTimeout(
+            f"Call through circuit breaker {self.name} timed out "
+            f"after {self.call_timeout}s"
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # created lazily so breakers without a call timeout never spawn threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=16, thread_name_prefix=f"breaker-{self.name}"
+                )
+            return self._executor
@@ -1,19 +1,298 @@
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+from app.core.config import get_settings
+from app.core.faults import FaultTarget, faults
+from app.core.metrics import (
+    grades_cache_lookups_total,
+    grades_coalesced_total,
+    grades_upstream_requests_total,
+)
+from app.core.tracing import span
 from app.services.circuit_breaker import CircuitBreaker
+from app.services.shared_circuit_breaker import create_circuit_breaker
+
+settings = get_settings()
+
+
+class GradeServiceError(Exception):
+    """The grade service answered with a retryable error"""
+
+
+class GradesCache:
+    """Size-bounded, in-process cache of grades per student.
+
+    Entries are fresh for `fresh_ttl` seconds and servable (while a refresh
+    runs) for `stale_ttl`. Older entries are kept until evicted so there is
+    always a last known answer when the grade service is down.
+    """
+
+    def __init__(
+        self, fresh_ttl: float = 30, stale_ttl: float = 300, max_entries: int = 10000
+    ):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[list, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, student_id: str) -> tuple[list, float] | None:
+        """Returns (grades, age in seconds) or None"""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(student_id)
+
+        grades, fetched_at = entry
+        return grades, time.monotonic() - fetched_at
+
+    def set(self, student_id: str, grades: list):
+        with self._lock:
+            self._entries[student_id] = (grades, time.monotonic())
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
 
 class ExternalGradeService:
-    def __init__(self):
-        self.circuit_breaker = CircuitBreaker("grade_service")
+    """Async client for the external grade service.
+
+    One keep-alive connection pool is shared by every request. Failed
+    attempts are retried with full-jitter exponential backoff, each cut off
+    after the connect plus read timeout. The breaker sees each request once,
+    retries included, so a single failing request counts as one failure
+    rather than tripping the circuit on its own.
+    """
+
+    def __init__(
+        self,
+        cache: GradesCache | None = None,
+        base_url: str = "http://localhost:8081",
+        connect_timeout: float = 0.5,
+        read_timeout: float = 2.0,
+        pool_size: int = 100,
+        max_retries: int = 2,
+        backoff_base: float = 0.05,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(
+            total=None, connect=connect_timeout, sock_read=read_timeout
+        )
+        self.attempt_timeout = connect_timeout + read_timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+        self.circuit_breaker = circuit_breaker or CircuitBreaker("grade_service")
+        self.cache = cache if cache is not None else GradesCache()
+
+        self._session: aiohttp.ClientSession | None = None
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._refreshes: set[asyncio.Task] = set()
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_grades(self, student_id: str, allow_fetch: bool = True):
+        """Serve grades from cache where possible
+
+        Fresh entries are returned as is; stale ones are returned while a
+        background refresh runs; on a miss the caller waits for the (single,
+        shared) upstream call. If that fails, the breaker is open or
+        `allow_fetch` is False, the last known grades are served.
+        """
+        cached = self.cache.get(student_id)
 
-    def get_grades(self, student_id: str):
+        if cached:
+            grades, age = cached
+            if age < self.cache.fresh_ttl:
+                grades_cache_lookups_total.labels(result="fresh").inc()
+                return {"grades": grades, "cached": True, "stale": False}
+            if age < self.cache.stale_ttl:
+                grades_cache_lookups_total.labels(result="stale").inc()
+                self._refresh_in_background(student_id)
+                return {"grades": grades, "cached": True, "stale": True}
+
+        if allow_fetch:
+            try:
+                with span("grade_service.fetch"):
+                    grades = await self._fetch(student_id)
+                grades_cache_lookups_total.labels(result="miss").inc()
+                return {"grades": grades, "cached": False, "stale": False}
+            except Exception:
+                pass
+
+        grades_cache_lookups_total.labels(result="fallback").inc()
+        if cached:
+            return {"grades": cached[0], "cached": True, "stale": True}
+        return {
+            "grades": [],
+            "cached": False,
+            "stale": False,
+            "error": "Grade service unavailable",
+        }
+
+    async def get_grades_batch(
+        self, student_ids: list[str], max_concurrency: int = 20
+    ) -> list[dict]:
+        """Look up many students with at most `max_concurrency` upstream calls
+
+        The breaker is consulted once for the whole batch; if it is open no
+        item calls upstream. If it opens part way through, items that haven't
+        started yet are served from cache only instead of queueing behind a
+        failing dependency.
+        """
+        unique_ids = list(dict.fromkeys(student_ids))
+        fetch_allowed = not self.circuit_breaker.rejecting
+        slots = asyncio.Semaphore(max_concurrency)
+
+        async def lookup(student_id: str) -> dict:
+            async with slots:
+                allow_fetch = fetch_allowed and not self.circuit_breaker.rejecting
+                result = await self.get_grades(student_id, allow_fetch=allow_fetch)
+            return {
+                "student_id": student_id,
+                "status": _batch_status(result),
+                "grades": result["grades"],
+            }
+
+        return list(await asyncio.gather(*(lookup(s) for s in unique_ids)))
+
+    async def _fetch(self, student_id: str) -> list:
+        """Fetch and cache, coalescing concurrent calls per student
+
+        The upstream call runs in its own task so a caller that goes away
+        (client disconnect) doesn't cancel it for everyone else waiting.
+        """
+        task = self._inflight.get(student_id)
+        if task is not None:
+            grades_coalesced_total.inc()
+        else:
+            task = asyncio.get_running_loop().create_task(
+                self._fetch_with_retries(student_id)
+            )
+            self._inflight[student_id] = task
+            task.add_done_callback(lambda t: self._fetch_done(student_id, t))
+
+        return await asyncio.shield(task)
+
+    def _fetch_done(self, student_id: str, task: asyncio.Task):
+        self._inflight.pop(student_id, None)
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self.cache.set(student_id, task.result())
+
+    async def _fetch_with_retries(self, student_id: str) -> list:
+        # one breaker outcome per request, not per attempt
+        return await self.circuit_breaker.call_async(self._fetch_attempts, student_id)
+
+    async def _fetch_attempts(self, student_id: str) -> list:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await asyncio.wait_for(
+                    self._fetch_from_external_api(student_id), self.attempt_timeout
+                )
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                # full jitter: spread retries so callers don't move in lockstep
+                await asyncio.sleep(random.uniform(0, self.backoff_base * 2**attempt))
+
+    def _refresh_in_background(self, student_id: str):
+        if student_id in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch(student_id)
+            except Exception:
+                pass  # keep serving the stale entry
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _fetch_from_external_api(self, student_id: str) -> list:
+        url = f"{self.base_url}/grades/{student_id}"
         try:
-            return self.circuit_breaker.call(self._fetch_from_external_api, student_id)
-        except:
-            # return cached/default data
-            return {"grades": [], "cached": True}
-
-    def _fetch_from_external_api(self, student_id: str):
-        # simulate external API call
-        import random
-        if random.random() < 0.3:  # 30% failure rate for demo
-            raise Exception("External API error")
-        return {"grades": ["A", "B+", "A-"], "cached": False}
\ No newline at end of file
+            fault = await faults.check_async(
+                FaultTarget.grade_service, self.timeout.sock_read
+            )
+            if fault == "timeout":
+                raise asyncio.TimeoutError()
+            if fault == "error":
+                raise GradeServiceError("Grade service returned 503 (injected)")
+            async with self._get_session().get(url) as response:
+                if response.status == 404:
+                    grades_upstream_requests_total.labels(outcome="not_found").inc()
+                    return []
+                if response.status >= 500 or response.status == 429:
+                    raise GradeServiceError(
+                        f"Grade service returned {response.status}"
+                    )
+                response.raise_for_status()
+                body = await response.json()
+        except Exception:
+            grades_upstream_requests_total.labels(outcome="error").inc()
+            raise
+
+        grades_upstream_requests_total.labels(outcome="success").inc()
+        return body["grades"]
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # a session is bound to the event loop that created it
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session_loop is not loop
+        ):
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=30
+                ),
+                timeout=self.timeout,
+            )
+            self._session_loop = loop
+        return self._session
+
+
+def _batch_status(result: dict) -> str:
+    if "error" in result:
+        return "unavailable"
+    if result["stale"]:
+        return "stale"
+    return "cached" if result["cached"] else "ok"
+
+
+external_grade_service = ExternalGradeService(
+    GradesCache(
+        fresh_ttl=settings.grades_cache_fresh_ttl,
+        stale_ttl=settings.grades_cache_stale_ttl,
+        max_entries=settings.grades_cache_max_entries,
+    ),
+    base_url=settings.grade_service_url,
+    connect_timeout=settings.grade_service_connect_timeout,
+    read_timeout=settings.grade_service_read_timeout,
+    pool_size=settings.grade_service_pool_size,
+    max_retries=settings.grade_service_max_retries,
+    circuit_breaker=create_circuit_breaker("grade_service"),
+)
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import redis
+from sqlalchemy import text
+
+from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.metrics import dependency_check_latency_seconds, dependency_up
+from app.db import database
+from app.services.audit_service import TABLE_NAME, audit_service
+from app.services.sqs_service import sqs_service
+
+settings = get_settings()
+
+
+@dataclass
+class DependencyCheck:
+    name: str
+    probe: Callable[[], None]  # blocking; raises if the dependency is unhealthy
+    critical: bool = True  # does readiness depend on it?
+    healthy: bool | None = None
+    error: str | None = None
+    latency: float | None = None
+    checked_at: float | None = None
+    pending: asyncio.Future | None = field(default=None, repr=False)
+
+
+class HealthService:
+    """Probes dependencies in the background and serves cached results.
+
+    Every `interval` seconds all checks run concurrently, each in a worker
+    thread with its own `timeout`, so health endpoints answer from memory
+    instead of hitting the database on every probe. A check still running
+    from a previous round (a hung connection) isn't started twice. Readiness
+    only considers critical checks, and treats results older than
+    `max_staleness` as failures.
+    """
+
+    def __init__(
+        self, interval: float = 10.0, timeout: float = 2.0, max_staleness: float = 30.0
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_staleness = max_staleness
+        self.checks: dict[str, DependencyCheck] = {}
+        self._task: asyncio.Task | None = None
+
+    def register(self, name: str, probe: Callable[[], None], critical: bool = True):
+        self.checks[name] = DependencyCheck(name, probe, critical)
+
+    async def start(self):
+        """Run the critical checks, then keep refreshing in the background
+
+        Only the checks readiness depends on hold up startup; the others
+        report "unknown" until their first background round completes.
+        """
+        await self._refresh(c for c in self.checks.values() if c.critical)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def refresh(self):
+        await self._refresh(self.checks.values())
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        checks = {
+            check.name: {
+                "status": _status(check),
+                "critical": check.critical,
+                "latency_ms": (
+                    round(check.latency * 1000, 2)
+                    if check.latency is not None
+                    else None
+                ),
+                "age_seconds": (
+                    round(now - check.checked_at, 2) if check.checked_at else None
+                ),
+                **({"error": check.error} if check.error else {}),
+            }
+            for check in self.checks.values()
+        }
+        if not self.is_ready():
+            status = "unhealthy"
+        elif all(c["status"] == "healthy" for c in checks.values()):
+            status = "healthy"
+        else:
+            # a non-critical dependency is down; we're running without it
+            status = "degraded"
+
+        return {
+            "status": status,
+            "timestamp": now,
+            "checks": checks,
+        }
+
+    def is_ready(self) -> bool:
+        now = time.time()
+        return all(
+            check.healthy
+            and check.checked_at is not None
+            and now - check.checked_at <= self.max_staleness
+            for check in self.checks.values()
+            if check.critical
+        )
+
+    async def _run(self):
+        await self._refresh(c for c in self.checks.values() if not c.critical)
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    async def _refresh(self, checks):
+        await asyncio.gather(*(self._run_check(check) for check in checks))
+
+    async def _run_check(self, check: DependencyCheck):
+        start = time.perf_counter()
+        try:
+            # a probe that timed out may still be stuck in its thread; wait on
+            # it again rather than piling up another one
+            if (
+                check.pending is None
+                or check.pending.done()
+                or check.pending.get_loop() is not asyncio.get_running_loop()
+            ):
+                check.pending = asyncio.ensure_future(asyncio.to_thread(check.probe))
+                check.pending.add_done_callback(_consume_result)
+            await asyncio.wait_for(asyncio.shield(check.pending), self.timeout)
+            check.healthy, check.error = True, None
+        except asyncio.TimeoutError:
+            check.healthy, check.error = False, f"timed out after {self.timeout}s"
+        except Exception as e:
+            check.healthy, check.error = False, str(e)
+
+        check.latency = time.perf_counter() - start
+        check.checked_at = time.time()
+        dependency_up.labels(dependency=check.name).set(1 if check.healthy else 0)
+        dependency_check_latency_seconds.labels(dependency=check.name).set(
+            check.latency
+        )
+
+
+def _consume_result(future: asyncio.Future):
+    # results of abandoned probes would otherwise be logged as never retrieved
+    if not future.cancelled():
+        future.exception()
+
+
+def _status(check: DependencyCheck) -> str:
+    if check.healthy is None:
+        return "unknown"
+    return "healthy" if check.healthy else "unhealthy"
+
+
+_redis_client: redis.Redis | None = None
+
+
+def check_database():
+    # looked up at call time so tests can swap the session factory
+    db = database.SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+
+def check_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            settings.redis_url, socket_timeout=1, socket_connect_timeout=1
+        )
+        faults.instrument_redis(_redis_client)
+    _redis_client.ping()
+
+
+def check_sqs():
+    if not sqs_service.sqs:
+        raise Exception("SQS not initialised")
+    sqs_service.sqs.get_queue_attributes(
+        QueueUrl=sqs_service.queue_url, AttributeNames=["ApproximateNumberOfMessages"]
+    )
+
+
+def check_dynamodb():
+    if not audit_service.table:
+        raise Exception("Audit table not initialised")
+    audit_service.table.meta.client.describe_table(TableName=TABLE_NAME)
+
+
+health_service = HealthService(
+    interval=settings.health_check_interval,
+    timeout=settings.health_check_timeout,
+    max_staleness=settings.health_check_max_staleness,
+)
+health_service.register("database", check_database)
+# the rest degrade gracefully (in-memory rate limits, disk spool), so they
+# are reported but don't take the pod out of rotation
+health_service.register("redis", check_redis, critical=False)
+health_service.register("sqs", check_sqs, critical=False)
+health_service.register("dynamodb", check_dynamodb, critical=False)
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+import redis
+
+from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.metrics import idempotency_requests_total
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# only the claim's owner may finish or release it
+_COMPLETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return nil
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body"""
+
+
+class IdempotencyInProgress(Exception):
+    """A request with this key is still running after the wait timeout"""
+
+
+@dataclass
+class Claim:
+    """Outcome of `claim`: either a stored response to replay, or the right
+    (and duty) to run the request and `complete` or `release` the claim"""
+
+    key: str
+    fingerprint: str
+    marker: str | None = None
+    response: dict | None = None
+
+    @property
+    def replay(self) -> bool:
+        return self.response is not None
+
+
+class IdempotencyService:
+    """Idempotency-Key handling backed by Redis
+
+    The first request with a key claims it with SET NX (expiring after
+    `lock_ttl` in case its worker dies) and later stores its response for
+    `ttl`. Duplicates arriving meanwhile poll until that response appears
+    and replay it; duplicates arriving later replay it straight away.
+    Responses are only stored below 500, so a request that failed on a
+    dependency can be retried for real. If Redis is unreachable requests
+    run without protection rather than failing.
+    """
+
+    def __init__(
+        self,
+        ttl: int = 86400,
+        lock_ttl: int = 30,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.05,
+        redis_url: str = "redis://redis:6379",
+    ):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.redis_url = redis_url
+        self.redis_client: redis.Redis | None = None
+        self._complete = None
+        self._release = None
+
+    def initialise(self):
+        """Connect to Redis - call on app startup"""
+        try:
+            self.redis_client = redis.Redis(
+                connection_pool=redis.ConnectionPool.from_url(
+                    self.redis_url,
+                    decode_responses=True,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+            )
+            faults.instrument_redis(self.redis_client)
+            self._complete = self.redis_client.register_script(_COMPLETE)
+            self._release = self.redis_client.register_script(_RELEASE)
+            logger.info("Idempotency service initialised")
+        except Exception as e:
+            logger.warning("Idempotency service Redis init failed: %s", e)
+
+    async def claim(
+        self, scope: str, key: str, payload: Any, client: str = ""
+    ) -> Claim:
+        """Claim `key` for a request with `payload`, or get its stored response
+
+        Keys are per `client`, so two callers who happen to pick the same key
+        don't see each other's requests. Raises IdempotencyKeyReused if the
+        key was used with another payload and IdempotencyInProgress if the
+        first request is still running after `wait_timeout`.
+        """
+        fingerprint = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        claim = Claim(f"idempotency:{scope}:{client}:{key}", fingerprint)
+        if self.redis_client is None:
+            idempotency_requests_total.labels(result="unavailable").inc()
+            return claim
+
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            try:
+                stored = await asyncio.to_thread(self._try_claim, claim)
+            except redis.RedisError as e:
+                logger.warning("Idempotency check failed: %s", e)
+                idempotency_requests_total.labels(result="unavailable").inc()
+                return claim
+
+            if stored is None:
+                idempotency_requests_total.labels(result="new").inc()
+                return claim
+            if stored["fingerprint"] != fingerprint:
+                idempotency_requests_total.labels(result="mismatch").inc()
+                raise IdempotencyKeyReused(key)
+            if "response" in stored:
+                result = "waited" if waited else "replayed"
+                idempotency_requests_total.labels(result=result).inc()
+                claim.response = stored["response"]
+                return claim
+
+            if time.monotonic() >= deadline:
+                idempotency_requests_total.labels(result="in_progress").inc()
+                raise IdempotencyInProgress(key)
+            waited = True
+            await asyncio.sleep(self.poll_interval)
+
+    async def complete(self, claim: Claim, status_code: int, body: Any):
+        """Store the response for replays (or release the claim on a 5xx)"""
+        if claim.marker is None:
+            return
+        if status_code >= 500:
+            await self.release(claim)
+            return
+
+        record = json.dumps(
+            {
+                "fingerprint": claim.fingerprint,
+                "response": {"status_code": status_code, "body": body},
+            }
+        )
+        try:
+            await asyncio.to_thread(
+                self._complete,
+                keys=[claim.key],
+                args=[claim.marker, record, self.ttl],
+            )
+        except redis.RedisError as e:
+            logger.warning("Failed to store idempotent response: %s", e)
+
+    async def release(self, claim: Claim):
+        """Give the key up so a retry runs the request again"""
+        if claim.marker is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self._release, keys=[claim.key], args=[claim.marker]
+            )
+        except redis.RedisError as e:
+            logger.warning("Failed to release idempotency key: %s", e)
+
+    def _try_claim(self, claim: Claim) -> dict | None:
+        """Take the key (returns None) or return what is stored under it"""
+        marker = json.dumps(
+            {"fingerprint": claim.fingerprint, "owner": uuid.uuid4().hex}
+        )
+        if self.redis_client.set(claim.key, marker, nx=True, ex=self.lock_ttl):
+            claim.marker = marker
+            return None
+
+        raw = self.redis_client.get(claim.key)
+        if raw is None:  # finished or released between SET and GET; go again
+            return self._try_claim(claim)
+        return json.loads(raw)
+
+
+idempotency_service = IdempotencyService(
+    ttl=settings.idempotency_ttl,
+    lock_ttl=settings.idempotency_lock_ttl,
+    wait_timeout=settings.idempotency_wait_timeout,
+    redis_url=settings.redis_url,
+)
@@ -0,0 +1,168 @@
+"""Finding what keeps a worker's memory growing
+
+Allocation tracing (tracemalloc) is off by default: it slows every
+allocation down and snapshots hold on to memory, so the admin API only
+offers it with MEMORY_PROFILING_ENABLED=true. Switch it on, take a
+snapshot, let traffic run, take another and diff them; the lines whose
+allocations only ever grow are the leak. `register_metrics` exports the size of the
+in-process structures most likely to grow without bound, so a suspicion
+can be checked against a dashboard first.
+"""
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import session as orm_session
+
+from app.core.config import get_settings
+from app.core.metrics import http_requests_total, memory_live_objects
+from app.core.rate_limits import RateLimits
+from app.middleware.rate_limiter import RateLimiter
+from app.services.cache_service import cache_service
+from app.services.external_service import external_grade_service
+from app.services.metering_service import metering_service
+
+settings = get_settings()
+
+# allocations made by the profiler itself or by importing modules are noise
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class NotTracingError(Exception):
+    """A snapshot was requested while allocation tracing is off"""
+
+
+class MemoryService:
+    """Allocation snapshots on demand, and live counts of growable structures"""
+
+    def __init__(self, max_snapshots: int = 10, enabled: bool = False):
+        self.max_snapshots = max_snapshots
+        self.enabled = enabled
+        self._snapshots: OrderedDict[int, tuple[str, tracemalloc.Snapshot]] = (
+            OrderedDict()
+        )
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "enabled": self.enabled,
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "snapshots": [
+                {"id": snapshot_id, "taken_at": taken_at}
+                for snapshot_id, (taken_at, _) in list(self._snapshots.items())
+            ],
+        }
+
+    def start_tracing(self, frames: int = 1):
+        """Trace allocations from now on, keeping `frames` frames of each"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_tracing(self):
+        """Stop tracing; snapshots already taken are kept"""
+        tracemalloc.stop()
+
+    def take_snapshot(self) -> dict:
+        """Capture what is allocated now; the oldest snapshot makes room"""
+        if not tracemalloc.is_tracing():
+            raise NotTracingError("Allocation tracing is off")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        traced_bytes, _ = tracemalloc.get_traced_memory()
+        taken_at = datetime.now(timezone.utc).isoformat()
+
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = (taken_at, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+
+        return {
+            "id": snapshot_id,
+            "taken_at": taken_at,
+            "traced_bytes": traced_bytes,
+        }
+
+    def top(self, snapshot_id: int, group_by: str = "lineno", limit: int = 20):
+        """Largest allocators in a snapshot, by file or by line
+
+        Raises KeyError for unknown (or evicted) snapshots.
+        """
+        _, snapshot = self._snapshots[snapshot_id]
+        return [
+            {
+                "location": _location(stat.traceback, group_by),
+                "size_bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def diff(
+        self, snapshot_id: int, base_id: int, group_by: str = "lineno", limit: int = 20
+    ):
+        """Allocators that changed most from `base_id` to `snapshot_id`"""
+        _, base = self._snapshots[base_id]
+        _, snapshot = self._snapshots[snapshot_id]
+        return [
+            {
+                "location": _location(stat.traceback, group_by),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in snapshot.compare_to(base, group_by)[:limit]
+        ]
+
+    def register_metrics(self):
+        """Export sizes of structures that grow with traffic; read at scrape time"""
+        counts = {
+            # in-memory token buckets (only used while Redis is down), one
+            # per client and endpoint, never expired
+            "rate_limiter_buckets": lambda: sum(
+                len(limiter._memory_store)
+                for limiter in vars(RateLimits).values()
+                if isinstance(limiter, RateLimiter)
+            ),
+            # labelled by raw path, so every student ID adds series
+            "http_request_series": lambda: len(http_requests_total._metrics),
+            "db_sessions": lambda: len(_live_sessions()),
+            "db_identity_map_objects": lambda: sum(
+                len(session.identity_map) for session in _live_sessions()
+            ),
+            "local_cache_entries": lambda: len(cache_service.local),
+            "grades_cache_entries": lambda: len(external_grade_service.cache),
+            "metering_counters": lambda: len(metering_service._counters)
+            + sum(len(day) for day in list(metering_service._unsent.values())),
+        }
+        for structure, count in counts.items():
+            memory_live_objects.labels(structure=structure).set_function(count)
+
+
+def _live_sessions() -> list:
+    # SQLAlchemy's weak registry of every Session not yet garbage collected;
+    # copying the refs first keeps other threads from changing it under us
+    refs = list(orm_session._sessions.data.values())
+    return [session for session in (ref() for ref in refs) if session is not None]
+
+
+def _location(traceback: tracemalloc.Traceback, group_by: str) -> str:
+    frame = traceback[0]
+    if group_by == "filename":
+        return frame.filename
+    return f"{frame.filename}:{frame.lineno}"
+
+
+memory_service = MemoryService(enabled=settings.memory_profiling_enabled)
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import redis
+
+from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.metrics import metering_flushes_total, metering_overflow_total
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# usage from clients beyond `max_keys` is pooled under this identifier
+OVERFLOW_CLIENT = "_other"
+
+
+class MeteringService:
+    """Per-client, per-route usage counters flushed to Redis in batches.
+
+    `record` only bumps in-process counters: a dict lookup and four adds,
+    with no lock because the counters belong to the event loop. Every
+    `flush_interval` a loop task swaps them out and a worker thread sends
+    them as one MULTI/EXEC round trip:
+    per-client usage hashes, a sorted set of request counts for top
+    talkers and a HyperLogLog of distinct clients, all bucketed by UTC day
+    and expired after `retention_days`. Counters are bucketed by the day
+    they were recorded on, not flushed on, so usage just before midnight
+    isn't credited to the next day. Usage is up to one interval behind; a
+    failed flush applies nothing and its counters are kept for the next
+    attempt.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 5.0,
+        retention_days: int = 8,
+        max_keys: int = 10000,
+        redis_url: str = "redis://redis:6379",
+    ):
+        self.flush_interval = flush_interval
+        self.retention = retention_days * 86400
+        self.max_keys = max_keys
+        self.redis_url = redis_url
+        self.redis_client: redis.Redis | None = None
+        # (client, route) -> [requests, bytes_in, bytes_out, latency_seconds]
+        # for the UTC day `_day`, which ends at `_day_ends` (epoch seconds)
+        self._counters: dict[tuple[str, str], list] = {}
+        self._day, self._day_ends = _day_bounds()
+        # counters of days that ended before they were flushed
+        self._unsent: dict[str, dict[tuple[str, str], list]] = {}
+        self._task: asyncio.Task | None = None
+
+    def initialise(self):
+        """Connect to Redis - call on app startup, then `start`"""
+        try:
+            self.redis_client = redis.Redis(
+                connection_pool=redis.ConnectionPool.from_url(
+                    self.redis_url,
+                    decode_responses=True,
+                    socket_timeout=1,
+                    socket_connect_timeout=1,
+                )
+            )
+            faults.instrument_redis(self.redis_client)
+            logger.info("Metering service initialised")
+        except Exception as e:
+            logger.warning("Metering Redis init failed: %s", e)
+
+    def start(self):
+        """Start flushing periodically on the running event loop"""
+        if self.redis_client is not None and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task after a final flush"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def record(
+        self,
+        client: str,
+        route: str,
+        bytes_in: int,
+        bytes_out: int,
+        duration: float,
+    ):
+        """Count one request - call from the event loop thread only"""
+        if time.time() >= self._day_ends:
+            self._roll_day()
+        counters = self._counters.get((client, route))
+        if counters is None:
+            key = (client, route)
+            if len(self._counters) >= self.max_keys:
+                metering_overflow_total.inc()
+                key = (OVERFLOW_CLIENT, route)
+            counters = self._counters.get(key)
+            if counters is None:
+                counters = self._counters[key] = [0, 0, 0, 0.0]
+        counters[0] += 1
+        counters[1] += bytes_in
+        counters[2] += bytes_out
+        counters[3] += duration
+
+    async def flush(self):
+        """Send everything recorded since the last flush to Redis"""
+        days = self._unsent
+        if self._counters:
+            days[self._day] = self._counters
+        self._counters, self._unsent = {}, {}
+        if not days or self.redis_client is None:
+            return
+
+        try:
+            await asyncio.to_thread(self._send, days)
+            metering_flushes_total.labels(status="success").inc()
+        except Exception as e:
+            metering_flushes_total.labels(status="error").inc()
+            logger.warning("Metering flush failed: %s", e)
+            self._restore(days)
+
+    def top_talkers(self, limit: int = 10, day: str | None = None) -> list[dict]:
+        """Clients with the most requests on `day` (UTC, default today)"""
+        day = day or _today()
+        top = self.redis_client.zrevrange(
+            f"metering:{day}:top", 0, limit - 1, withscores=True
+        )
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for client, _ in top:
+            pipe.hgetall(f"metering:{day}:usage:{client}")
+        usages = pipe.execute()
+
+        talkers = []
+        for (client, requests), usage in zip(top, usages):
+            routes: dict[str, dict] = {}
+            for field, value in usage.items():
+                route, _, counter = field.rpartition("|")
+                routes.setdefault(route, {})[counter] = float(value)
+            talkers.append(
+                {
+                    "client": client,
+                    "requests": int(requests),
+                    "bytes_in": int(sum(r["bytes_in"] for r in routes.values())),
+                    "bytes_out": int(sum(r["bytes_out"] for r in routes.values())),
+                    "routes": routes,
+                }
+            )
+        return talkers
+
+    def distinct_clients(self, day: str | None = None) -> int:
+        """Approximate number of distinct clients seen on `day` (HyperLogLog)"""
+        return self.redis_client.pfcount(f"metering:{day or _today()}:clients")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _send(self, days: dict[str, dict[tuple[str, str], list]]):
+        # MULTI/EXEC: a flush that fails part way applies nothing, so
+        # restoring its counters for the next attempt can't double count
+        pipe = self.redis_client.pipeline(transaction=True)
+        for day, counters in days.items():
+            top, clients = f"metering:{day}:top", f"metering:{day}:clients"
+            for (client, route), values in counters.items():
+                requests, bytes_in, bytes_out, latency = values
+                usage = f"metering:{day}:usage:{client}"
+                pipe.hincrby(usage, f"{route}|requests", requests)
+                pipe.hincrby(usage, f"{route}|bytes_in", bytes_in)
+                pipe.hincrby(usage, f"{route}|bytes_out", bytes_out)
+                pipe.hincrbyfloat(usage, f"{route}|latency_seconds", latency)
+                pipe.expire(usage, self.retention)
+                pipe.zincrby(top, requests, client)
+            pipe.pfadd(clients, *{client for client, _ in counters})
+            pipe.expire(top, self.retention)
+            pipe.expire(clients, self.retention)
+        pipe.execute()
+
+    def _roll_day(self):
+        """Set the ended day's counters aside, stamped with that day"""
+        if self._counters:
+            self._merge(self._unsent.setdefault(self._day, {}), self._counters)
+            self._counters = {}
+        self._day, self._day_ends = _day_bounds()
+
+    def _restore(self, days: dict[str, dict[tuple[str, str], list]]):
+        """Fold unsent counters back in so the next flush retries them"""
+        for day, counters in days.items():
+            if day == self._day:
+                self._merge(self._counters, counters)
+            else:
+                self._merge(self._unsent.setdefault(day, {}), counters)
+
+    @staticmethod
+    def _merge(into: dict[tuple[str, str], list], counters: dict):
+        for key, values in counters.items():
+            current = into.get(key)
+            if current is None:
+                into[key] = values
+            else:
+                for i, value in enumerate(values):
+                    current[i] += value
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _day_bounds() -> tuple[str, float]:
+    """Today's UTC day and the epoch second it ends at"""
+    now = datetime.now(timezone.utc)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return now.strftime("%Y-%m-%d"), (midnight + timedelta(days=1)).timestamp()
+
+
+metering_service = MeteringService(
+    flush_interval=settings.metering_flush_interval,
+    retention_days=settings.metering_retention_days,
+    max_keys=settings.metering_max_keys,
+    redis_url=settings.redis_url,
+)
@@ -0,0 +1,180 @@
+import time
+import uuid
+
+import redis
+
+from app.core.config import get_settings
+from app.core.faults import faults
+from app.core.metrics import circuit_breaker_sync_errors_total
+from app.services.circuit_breaker import CircuitBreaker, CircuitState
+
+settings = get_settings()
+
+# All scripts use the Redis server clock so pods with skewed clocks agree on
+# when a circuit opened and when its probe lease runs out.
+
+# -> {state, opened_at, server_now}
+READ_SCRIPT = """
+local t = redis.call('TIME')
+local state = redis.call('HMGET', KEYS[1], 'state', 'opened_at')
+local now = string.format('%d.%06d', tonumber(t[1]), tonumber(t[2]))
+return {state[1] or 'closed', state[2] or '0', now}
+"""
+
+# ARGV: ttl -> opened_at
+TRIP_SCRIPT = """
+local t = redis.call('TIME')
+local opened_at = string.format('%d.%06d', tonumber(t[1]), tonumber(t[2]))
+redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', opened_at)
+redis.call('HDEL', KEYS[1], 'probe_owner', 'probe_until')
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return opened_at
+"""
+
+# ARGV: timeout, owner, lease -> 1 if this worker may probe
+CLAIM_PROBE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state or state == 'closed' then
+    return 1
+end
+if state == 'open' then
+    local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at') or '0')
+    if now - opened_at < tonumber(ARGV[1]) then
+        return 0
+    end
+elseif state == 'half_open' then
+    local probe_until = tonumber(redis.call('HGET', KEYS[1], 'probe_until') or '0')
+    if now < probe_until then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'probe_owner', ARGV[2],
+           'probe_until', tostring(now + tonumber(ARGV[3])))
+return 1
+"""
+
+# ARGV: owner -> 1 if closed; a circuit re-tripped by someone else stays open
+CLOSE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if state == 'half_open' and redis.call('HGET', KEYS[1], 'probe_owner') ~= ARGV[1] then
+    return 0
+end
+if state == 'open' then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+
+class SharedCircuitBreaker(CircuitBreaker):
+    """Circuit breaker whose OPEN state is shared through Redis.
+
+    Failures are still counted per process, but as soon as one worker trips
+    the circuit every other worker sees it on its next refresh (at most
+    `refresh_interval` seconds later) and stops calling the dependency too.
+    When the timeout passes, a single worker fleet-wide claims the probe
+    lease and the rest keep rejecting until it closes or re-trips the
+    circuit. Redis is only read once per refresh interval, not per call; if
+    it is unreachable the breaker carries on with its local state. Redis is
+    never called while holding the breaker's lock, and `call_async` makes
+    its Redis calls from a thread, so a slow Redis can't stall the loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_client: redis.Redis | None = None,
+        redis_url: str = "redis://redis:6379",
+        refresh_interval: float = 1.0,
+        probe_lease: float | None = None,
+        **kwargs,
+    ):
+        super().__init__(name, **kwargs)
+        self.key = f"circuit_breaker:{name}"
+        self.refresh_interval = refresh_interval
+        # how long other workers wait on a probe before assuming it died
+        self.probe_lease = probe_lease or self.call_timeout or 10.0
+        self.owner = uuid.uuid4().hex
+
+        self._redis = redis_client or redis.Redis.from_url(
+            redis_url, socket_timeout=0.2, socket_connect_timeout=0.2
+        )
+        faults.instrument_redis(self._redis)
+        self._read = self._redis.register_script(READ_SCRIPT)
+        self._trip = self._redis.register_script(TRIP_SCRIPT)
+        self._claim_probe = self._redis.register_script(CLAIM_PROBE_SCRIPT)
+        self._close = self._redis.register_script(CLOSE_SCRIPT)
+        self._next_refresh = 0.0
+
+    def _sync_due(self) -> bool:
+        return time.monotonic() >= self._next_refresh or (
+            self.state == CircuitState.OPEN and self._timeout_elapsed()
+        )
+
+    def _sync_before_acquire(self) -> bool:
+        """Refresh if due, and claim the fleet-wide probe if one is due"""
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        if self.state != CircuitState.OPEN or not self._timeout_elapsed():
+            return True
+        try:
+            return bool(
+                self._claim_probe(
+                    keys=[self.key], args=[self.timeout, self.owner, self.probe_lease]
+                )
+            )
+        except redis.RedisError:
+            circuit_breaker_sync_errors_total.labels(name=self.name).inc()
+            return True
+
+    def refresh(self):
+        """Adopt the fleet-wide state from Redis"""
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        try:
+            state, opened_at, now = self._read(keys=[self.key])
+        except redis.RedisError:
+            circuit_breaker_sync_errors_total.labels(name=self.name).inc()
+            return
+
+        remote = CircuitState(state.decode() if isinstance(state, bytes) else state)
+        elapsed = float(now) - float(opened_at)
+
+        with self._lock:
+            if remote == CircuitState.CLOSED:
+                if self.state == CircuitState.OPEN:
+                    self._adopt(CircuitState.CLOSED)
+            elif self.state == CircuitState.CLOSED:
+                # OPEN or someone else's HALF_OPEN probe: either way, hold off
+                self._adopt(CircuitState.OPEN, elapsed)
+
+    def _publish(self, state: CircuitState | None):
+        """Write a local trip or close through to Redis"""
+        try:
+            if state == CircuitState.OPEN:
+                ttl = int(self.timeout * 10) + 60
+                self._trip(keys=[self.key], args=[ttl])
+            elif state == CircuitState.CLOSED:
+                self._close(keys=[self.key], args=[self.owner])
+        except redis.RedisError:
+            circuit_breaker_sync_errors_total.labels(name=self.name).inc()
+
+    def _adopt(self, state: CircuitState, elapsed: float = 0.0):
+        """Apply a state seen in Redis; caller holds the lock"""
+        self._transition(state)
+        if state == CircuitState.OPEN:
+            self._opened_at = time.monotonic() - max(elapsed, 0.0)
+
+
+def create_circuit_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Shared breaker when `circuit_breaker_shared` is on, local otherwise"""
+    if settings.circuit_breaker_shared:
+        return SharedCircuitBreaker(
+            name,
+            redis_url=settings.redis_url,
+            refresh_interval=settings.circuit_breaker_refresh_interval,
+            **kwargs,
+        )
+    return CircuitBreaker(name, **kwargs)
@@ -0,0 +1,288 @@
+import math
+import threading
+import time
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    slo_burn_rate,
+    slo_error_budget_remaining,
+    slo_latency_quantile_seconds,
+    slo_sli,
+)
+
+settings = get_settings()
+
+# (name, seconds) for the multi-window burn-rate alerts in the SRE workbook:
+# page on 1h+5m at 14.4x, ticket on 6h+30m at 6x
+WINDOWS = (("5m", 300), ("30m", 1800), ("1h", 3600), ("6h", 21600))
+FAST_BURN = ("1h", "5m", 14.4)
+SLOW_BURN = ("6h", "30m", 6.0)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class LatencySketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch style).
+
+    A value x lands in bucket ceil(log_gamma(x)), so any quantile is reported
+    within `relative_accuracy` of the true value. Merging is adding bucket
+    counts. When there are more than `max_buckets` buckets the lowest ones
+    are collapsed together, which only costs accuracy at the fast end.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 1e-9:
+            self.zero_count += 1
+            return
+
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def merge(self, other: "LatencySketch"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # midpoint of the bucket, in relative terms
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def clear(self):
+        self.buckets.clear()
+        self.zero_count = 0
+        self.count = 0
+
+    def _collapse(self):
+        indexes = sorted(self.buckets)
+        excess = len(indexes) - self.max_buckets
+        target = indexes[excess]
+        for index in indexes[:excess]:
+            self.buckets[target] += self.buckets.pop(index)
+
+
+class SLOService:
+    """Streaming availability and latency SLIs.
+
+    `record` is called once per request by the metrics middleware. Counts go
+    into a fixed ring of per-second buckets covering the longest window, and
+    each window keeps a running total that is adjusted as buckets enter and
+    leave it, so reading any SLI or burn rate is O(1) and memory never
+    grows. Latency quantiles come from one sketch per minute, merged on read.
+    """
+
+    def __init__(
+        self,
+        availability_target: float = 0.999,
+        latency_target: float = 0.99,
+        latency_threshold: float = 0.3,
+    ):
+        self.availability_target = availability_target
+        self.latency_target = latency_target
+        self.latency_threshold = latency_threshold
+
+        self._span = max(seconds for _, seconds in WINDOWS)
+        self._total = [0] * self._span
+        self._errors = [0] * self._span
+        self._slow = [0] * self._span
+        self._sums = {name: [0, 0, 0] for name, _ in WINDOWS}  # total, errors, slow
+
+        # one sketch per minute for the last hour
+        self._sketches = [LatencySketch() for _ in range(60)]
+        self._sketch_minutes = [-1] * 60
+
+        self._lock = threading.Lock()
+        self._now = int(time.monotonic())
+
+    def record(self, duration: float, status_code: int):
+        error = status_code >= 500
+        slow = duration > self.latency_threshold
+
+        with self._lock:
+            second = self._advance()
+            slot = second % self._span
+            self._total[slot] += 1
+            self._errors[slot] += error
+            self._slow[slot] += slow
+            for sums in self._sums.values():
+                sums[0] += 1
+                sums[1] += error
+                sums[2] += slow
+
+            minute = second // 60
+            sketch_slot = minute % 60
+            if self._sketch_minutes[sketch_slot] != minute:
+                self._sketches[sketch_slot].clear()
+                self._sketch_minutes[sketch_slot] = minute
+            self._sketches[sketch_slot].add(duration)
+
+    def sli(self, slo: str, window: str) -> float | None:
+        """Fraction of good requests in the window, None if there were none"""
+        with self._lock:
+            self._advance()
+            total, errors, slow = self._sums[window]
+
+        if not total:
+            return None
+        bad = errors if slo == "availability" else slow
+        return 1 - bad / total
+
+    def burn_rate(self, slo: str, window: str) -> float:
+        """How many times faster than sustainable the error budget is burning"""
+        sli = self.sli(slo, window)
+        if sli is None:
+            return 0.0
+        return (1 - sli) / (1 - self._target(slo))
+
+    def error_budget_remaining(self, slo: str) -> float:
+        """Share of the budget left over the longest window (negative if blown)"""
+        return 1 - self.burn_rate(slo, WINDOWS[-1][0])
+
+    def latency_quantile(self, q: float, minutes: int = 5) -> float | None:
+        with self._lock:
+            current = self._advance() // 60
+            merged = LatencySketch()
+            for offset in range(min(minutes, 60)):
+                minute = current - offset
+                slot = minute % 60
+                if self._sketch_minutes[slot] == minute:
+                    merged.merge(self._sketches[slot])
+        return merged.quantile(q)
+
+    def status(self) -> dict:
+        slos = {}
+        for slo in ("availability", "latency"):
+            burn = {name: self.burn_rate(slo, name) for name, _ in WINDOWS}
+            slos[slo] = {
+                "target": self._target(slo),
+                "sli": {name: self.sli(slo, name) for name, _ in WINDOWS},
+                "burn_rate": burn,
+                "error_budget_remaining": self.error_budget_remaining(slo),
+                "fast_burn": _burning(burn, FAST_BURN),
+                "slow_burn": _burning(burn, SLOW_BURN),
+            }
+
+        slos["latency"]["threshold_seconds"] = self.latency_threshold
+        slos["latency"]["quantiles_5m"] = {
+            f"p{int(q * 100)}": self.latency_quantile(q) for q in QUANTILES
+        }
+        return slos
+
+    def register_metrics(self):
+        """Export SLIs, burn rates and budgets; computed at scrape time"""
+        for slo in ("availability", "latency"):
+            for name, _ in WINDOWS:
+                slo_sli.labels(slo=slo, window=name).set_function(
+                    lambda slo=slo, name=name: _or_nan(self.sli(slo, name))
+                )
+                slo_burn_rate.labels(slo=slo, window=name).set_function(
+                    lambda slo=slo, name=name: self.burn_rate(slo, name)
+                )
+            slo_error_budget_remaining.labels(slo=slo).set_function(
+                lambda slo=slo: self.error_budget_remaining(slo)
+            )
+
+        for q in QUANTILES:
+            slo_latency_quantile_seconds.labels(quantile=str(q)).set_function(
+                lambda q=q: _or_nan(self.latency_quantile(q))
+            )
+
+    def _target(self, slo: str) -> float:
+        if slo == "availability":
+            return self.availability_target
+        return self.latency_target
+
+    def _advance(self) -> int:
+        """Move the ring forward to now; caller holds the lock
+
+        The buckets that fell out of each window during the elapsed seconds
+        are taken off its running total, then the elapsed seconds' buckets
+        are cleared for reuse. Both work on whole slices of the ring, so
+        catching up after an idle gap is never a second-by-second walk.
+        """
+        now = int(time.monotonic())
+        elapsed = now - self._now
+        if elapsed <= 0:
+            return now
+        if elapsed >= self._span:
+            self._reset(now)
+            return now
+
+        for name, seconds in WINDOWS:
+            sums = self._sums[name]
+            if elapsed >= seconds:
+                # everything that was in the window has left it
+                sums[:] = [0, 0, 0]
+                continue
+            expired = self._now + 1 - seconds
+            sums[0] -= self._ring_sum(self._total, expired, elapsed)
+            sums[1] -= self._ring_sum(self._errors, expired, elapsed)
+            sums[2] -= self._ring_sum(self._slow, expired, elapsed)
+
+        for ring in (self._total, self._errors, self._slow):
+            self._ring_clear(ring, self._now + 1, elapsed)
+        self._now = now
+        return now
+
+    def _ring_slices(self, second: int, count: int) -> list[slice]:
+        """Ring slices holding `count` seconds from `second` (count < span)"""
+        start = second % self._span
+        end = start + count
+        if end <= self._span:
+            return [slice(start, end)]
+        return [slice(start, self._span), slice(0, end - self._span)]
+
+    def _ring_sum(self, ring: list[int], second: int, count: int) -> int:
+        return sum(sum(ring[part]) for part in self._ring_slices(second, count))
+
+    def _ring_clear(self, ring: list[int], second: int, count: int):
+        for part in self._ring_slices(second, count):
+            ring[part] = [0] * (part.stop - part.start)
+
+    def _reset(self, now: int):
+        self._total = [0] * self._span
+        self._errors = [0] * self._span
+        self._slow = [0] * self._span
+        self._sums = {name: [0, 0, 0] for name, _ in WINDOWS}
+        self._now = now
+
+
+def _burning(burn: dict[str, float], rule: tuple[str, str, float]) -> bool:
+    long_window, short_window, threshold = rule
+    return burn[long_window] > threshold and burn[short_window] > threshold
+
+
+def _or_nan(value: float | None) -> float:
+    return math.nan if value is None else value
+
+
+slo_service = SLOService(
+    availability_target=settings.slo_availability_target,
+    latency_target=settings.slo_latency_target,
+    latency_threshold=settings.slo_latency_threshold,
+)
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable
+
+from app.core.metrics import (
+    spool_bytes,
+    spool_records_dropped_total,
+    spool_records_replayed_total,
+    spool_records_written_total,
+)
+
+logger = logging.getLogger(__name__)
+
+# length + crc32 of the payload, both big-endian uint32
+HEADER = struct.Struct(">II")
+
+
+class DiskSpool:
+    """Append-only local file for records a dependency couldn't take.
+
+    Records are JSON, each prefixed with its length and a CRC so a torn write
+    at the tail (crash mid-append) is detected and cut off rather than
+    replayed. fsync happens every `fsync_batch` records or `fsync_interval`
+    seconds, whichever comes first, so an outage doesn't turn every request
+    into a disk flush. The read position is persisted in a sidecar file.
+    `max_bytes` caps the records still waiting to be replayed; the replayed
+    prefix is reclaimed once the spool is fully drained, or compacted away
+    once it grows past half of `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        fsync_batch: int = 64,
+        fsync_interval: float = 0.5,
+    ):
+        self.name = name
+        self.path = Path(directory) / f"{name}.spool"
+        self.offset_path = Path(directory) / f"{name}.offset"
+        self.max_bytes = max_bytes
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._read_offset = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, record: dict) -> bool:
+        """Spool a record; returns False if it had to be dropped"""
+        payload = json.dumps(record, default=str).encode()
+        entry = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._lock:
+            try:
+                self._open()
+                if self._size - self._read_offset + len(entry) > self.max_bytes:
+                    spool_records_dropped_total.labels(
+                        spool=self.name, reason="full"
+                    ).inc()
+                    return False
+
+                self._file.write(entry)
+                self._size += len(entry)
+                self._unsynced += 1
+
+                if (
+                    self._unsynced >= self.fsync_batch
+                    or time.monotonic() - self._last_sync >= self.fsync_interval
+                ):
+                    self._sync()
+            except OSError as e:
+                logger.error("Failed to spool %s record: %s", self.name, e)
+                spool_records_dropped_total.labels(
+                    spool=self.name, reason="io_error"
+                ).inc()
+                return False
+
+        spool_records_written_total.labels(spool=self.name).inc()
+        spool_bytes.labels(spool=self.name).set(self._size)
+        return True
+
+    def read_batch(self, max_records: int) -> tuple[list[dict], int]:
+        """Read up to `max_records` unreplayed records
+
+        Returns the records and the offset to pass to `commit` once they have
+        been delivered.
+        """
+        with self._lock:
+            self._open()
+            self._file.flush()
+
+            records = []
+            offset = self._read_offset
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                while len(records) < max_records:
+                    header = f.read(HEADER.size)
+                    if not header:
+                        break
+
+                    payload = b""
+                    if len(header) == HEADER.size:
+                        length, crc = HEADER.unpack(header)
+                        payload = f.read(length)
+
+                    if (
+                        len(header) < HEADER.size
+                        or len(payload) < length
+                        or zlib.crc32(payload) != crc
+                    ):
+                        self._truncate_at(offset)
+                        break
+
+                    records.append(json.loads(payload))
+                    offset += HEADER.size + length
+
+            return records, offset
+
+    def commit(self, offset: int):
+        """Mark everything before `offset` as replayed"""
+        with self._lock:
+            self._read_offset = offset
+            if self._read_offset >= self._size:
+                # fully drained: reclaim the disk space
+                self._file.truncate(0)
+                self._file.seek(0)
+                self._size = 0
+                self._read_offset = 0
+                self._write_offset()
+            elif self._read_offset > self.max_bytes // 2:
+                self._compact()
+            else:
+                self._write_offset()
+
+        spool_bytes.labels(spool=self.name).set(self._size)
+
+    def pending_bytes(self) -> int:
+        with self._lock:
+            self._open()
+            return self._size - self._read_offset
+
+    def sync(self):
+        with self._lock:
+            if self._file and self._unsynced:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        if self._file:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        try:
+            self._read_offset = min(int(self.offset_path.read_text()), self._size)
+        except (OSError, ValueError):
+            self._read_offset = 0
+        spool_bytes.labels(spool=self.name).set(self._size)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _truncate_at(self, offset: int):
+        """Cut off a torn or corrupt tail"""
+        logger.warning(
+            "Truncating corrupt %s spool tail at byte %d", self.name, offset
+        )
+        spool_records_dropped_total.labels(spool=self.name, reason="corrupt").inc()
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        self._size = offset
+
+    def _compact(self):
+        """Copy the unreplayed tail to a fresh file, dropping the prefix
+
+        The offset is reset before the swap: a crash in between replays the
+        prefix again (at-least-once) rather than skipping records.
+        """
+        self._file.flush()
+        tmp = self.path.with_suffix(".compact")
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(self._read_offset)
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        self._read_offset = 0
+        self._write_offset()
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _write_offset(self):
+        tmp = self.offset_path.with_suffix(".tmp")
+        tmp.write_text(str(self._read_offset))
+        os.replace(tmp, self.offset_path)
+
+
+class SpoolReplayer:
+    """Background thread that drains a spool back into its dependency.
+
+    `send_batch` must raise unless every record was delivered; the batch then
+    stays in the spool and is retried on the next tick. Delivery is therefore
+    at-least-once, so sinks should be idempotent.
+    """
+
+    def __init__(
+        self,
+        spool: DiskSpool,
+        send_batch: Callable[[list[dict]], None],
+        batch_size: int = 100,
+        interval: float = 5.0,
+    ):
+        self.spool = spool
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.spool.name}-replayer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def replay_once(self) -> int:
+        """Drain as much of the spool as the dependency accepts"""
+        self.spool.sync()
+        replayed = 0
+
+        while not self._stop.is_set():
+            records, offset = self.spool.read_batch(self.batch_size)
+            if not records:
+                break
+
+            try:
+                self.send_batch(records)
+            except Exception as e:
+                logger.info("%s replay paused: %s", self.spool.name, e)
+                break
+
+            self.spool.commit(offset)
+            replayed += len(records)
+            spool_records_replayed_total.labels(spool=self.spool.name).inc(
+                len(records)
+            )
+
+        return replayed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.replay_once()
+            except Exception as e:
+                logger.error("%s replayer error: %s", self.spool.name, e)
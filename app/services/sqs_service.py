@@ -1,67 +1,139 @@
+import asyncio
 import json
 import time
 
-import boto3
+from botocore.config import Config
 
+from app.core import aws
+from app.core.config import get_settings
 from app.core.logging import logger
+from app.core.tracing import correlation_id_var, span
+from app.services.shared_circuit_breaker import create_circuit_breaker
+from app.services.spool import DiskSpool, SpoolReplayer
+
+settings = get_settings()
+
+# SQS caps SendMessageBatch at 10 entries
+BATCH_SIZE = 10
 
 
 class SQSService:
-    def __init__(self):
+    def __init__(
+        self,
+        spool: DiskSpool | None = None,
+        replay_interval: float = 5.0,
+        replay_batch_size: int = 100,
+    ):
         self.sqs = None
         self.queue_url = None
+        self.circuit_breaker = create_circuit_breaker(
+            "sqs", failure_threshold=3, timeout=30
+        )
+        self.spool = spool
+        self.replayer = (
+            SpoolReplayer(
+                spool,
+                self._replay_batch,
+                # one SendMessageBatch per spool commit: a failed call then
+                # can't make earlier, delivered calls be sent again
+                batch_size=min(replay_batch_size, BATCH_SIZE),
+                interval=replay_interval,
+            )
+            if spool
+            else None
+        )
 
     def initialise(self):
         """Initialise SQS client - call this on app startup"""
         try:
-            self.sqs = boto3.client(
+            self.sqs = aws.client(
                 "sqs",
-                endpoint_url="http://localstack:4566",
-                region_name="us-east-1",
-                aws_access_key_id="test",
-                aws_secret_access_key="test",
+                # fail fast on the request path; the spool covers outages
+                config=Config(
+                    connect_timeout=1, read_timeout=2, retries={"max_attempts": 1}
+                ),
             )
             # Get queue URL from Terraform output
             self.queue_url = "http://localstack:4566/000000000000/student-events"
-            print("SQS Service initialised")
+            if self.replayer:
+                self.replayer.start()
+            logger.info("SQS Service initialised")
         except Exception as e:
-            print(f"Failed to initialise SQS: {e}")
+            logger.error("Failed to initialise SQS: %s", e)
+
+    def shutdown(self):
+        if self.replayer:
+            self.replayer.stop()
+        if self.spool:
+            self.spool.close()
 
     def send_event(self, event_type: str, data: dict) -> bool:
-        """Send event to SQS - returns True if successful"""
+        """Send event to SQS - returns True if successful
+
+        Events that can't be sent (SQS error or open circuit) are spooled to
+        disk and replayed later.
+        """
         if not self.sqs:
-            print("SQS not initialised")
+            logger.warning("SQS not initialised")
             return False
 
+        correlation_id = correlation_id_var.get()
+        message = {
+            "correlation_id": correlation_id,
+            "event_type": event_type,
+            "data": data,
+            "timestamp": str(time.time()),
+        }
+
         try:
-            # correlation_id = correlation_id_var.get()
-
-            self.sqs.send_message(
-                QueueUrl=self.queue_url,
-                MessageBody=json.dumps(
-                    {
-                        # 'correlation_id': correlation_id,
-                        "event_type": event_type,
-                        "data": data,
-                        "timestamp": str(time.time()),
-                    }
-                ),
-            )
+            with span("sqs.send_message", event_type=event_type):
+                self.circuit_breaker.call(
+                    self.sqs.send_message,
+                    QueueUrl=self.queue_url,
+                    MessageBody=json.dumps(message),
+                )
 
             logger.info(
                 "Sent SQS message",
-                extra={
-                    "event_type": event_type,
-                    # "correlation_id": correlation_id
-                },
+                extra={"event_type": event_type, "correlation_id": correlation_id},
             )
-
-            print(f"Sent {event_type} event to SQS")
             return True
         except Exception as e:
-            print(f"Failed to send SQS message: {e}")
+            logger.warning("Failed to send SQS message: %s", e)
+            if self.spool:
+                self.spool.append(message)
             return False
 
+    async def send_event_async(self, event_type: str, data: dict) -> bool:
+        """`send_event` from async code
+
+        The send and, during an outage, the spool append (with its periodic
+        fsync) both block, so they run on a worker thread, not the event loop.
+        """
+        return await asyncio.to_thread(self.send_event, event_type, data)
+
+    def _replay_batch(self, messages: list[dict]):
+        """Spool replay sink; batches are at most BATCH_SIZE messages"""
+        entries = [
+            {"Id": str(n), "MessageBody": json.dumps(message)}
+            for n, message in enumerate(messages)
+        ]
+        response = self.circuit_breaker.call(
+            self.sqs.send_message_batch, QueueUrl=self.queue_url, Entries=entries
+        )
+        if response.get("Failed"):
+            raise Exception(f"{len(response['Failed'])} SQS messages rejected")
+
 
 # Global instance
-sqs_service = SQSService()
+sqs_service = SQSService(
+    spool=DiskSpool(
+        "sqs",
+        settings.spool_dir,
+        max_bytes=settings.spool_max_bytes,
+        fsync_batch=settings.spool_fsync_batch,
+        fsync_interval=settings.spool_fsync_interval,
+    ),
+    replay_interval=settings.spool_replay_interval,
+    replay_batch_size=settings.spool_replay_batch_size,
+)
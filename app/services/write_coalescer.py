@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any
+
+from sqlalchemy import Table, insert
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+from app.core.metrics import db_write_batch_size, db_write_batches_total
+from app.core.tracing import span
+from app.db.database import engine
+from app.models.student import Student
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class WriteCoalescer:
+    """Group commit for single-row inserts into one table.
+
+    Concurrent `insert` calls are collected for up to `max_wait` seconds
+    (or until `max_batch_size` are waiting) and written as one multi-row
+    INSERT ... RETURNING in a single transaction, so a burst of N creates
+    costs one commit instead of N. Each caller gets back its own row,
+    matched on `key`: a unique column whose value the caller supplies
+    (RETURNING order isn't guaranteed to follow the VALUES order).
+
+    If the batch fails (e.g. one row violates a constraint) the rows are
+    retried one transaction each, so only the offending callers see an
+    error. Call from a single event loop.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        table: Table,
+        key: str,
+        max_batch_size: int = 50,
+        max_wait: float = 0.005,
+    ):
+        self.engine = engine
+        self.table = table
+        self.key = key
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def insert(self, values: dict[str, Any]) -> dict[str, Any]:
+        """Insert one row as part of the next batch; returns the stored row"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((values, future))
+
+        # the batch is shared, so don't let it join this request's trace
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(
+                self.max_wait, self._flush, context=contextvars.Context()
+            )
+
+        with span("db.coalesced_insert"):
+            return await future
+
+    async def drain(self):
+        """Write anything still pending and wait for in-flight batches"""
+        if self._pending:
+            self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(
+            self._write(batch), context=contextvars.Context()
+        )
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]):
+        try:
+            results = await asyncio.to_thread(
+                self._insert_rows, [values for values, _ in batch]
+            )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():  # caller went away; the row is stored regardless
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _insert_rows(self, rows: list[dict]) -> list[dict | Exception]:
+        """Insert all rows in one statement, falling back to one at a time"""
+        db_write_batch_size.observe(len(rows))
+        statement = insert(self.table).returning(*self.table.c)
+        try:
+            with self.engine.begin() as conn:
+                result = conn.execute(statement, rows)
+                stored = {row._mapping[self.key]: dict(row._mapping) for row in result}
+            db_write_batches_total.labels(result="success").inc()
+            return [stored[row[self.key]] for row in rows]
+        except Exception as e:
+            if len(rows) == 1:
+                db_write_batches_total.labels(result="error").inc()
+                return [e]
+            logger.warning("Batch insert of %d rows failed: %s", len(rows), e)
+
+        db_write_batches_total.labels(result="split").inc()
+        results: list[dict | Exception] = []
+        for row in rows:
+            try:
+                with self.engine.begin() as conn:
+                    stored = conn.execute(statement, [row]).one()
+                results.append(dict(stored._mapping))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+student_writer = WriteCoalescer(
+    engine,
+    Student.__table__,
+    key="student_id",
+    max_batch_size=settings.student_write_batch_size,
+    max_wait=settings.student_write_max_wait,
+)
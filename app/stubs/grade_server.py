@@ -0,0 +1,56 @@
+"""Local stand-in for the external grade service.
+
+Serves `GET /grades/{student_id}` with configurable latency and error rate so
+the grades endpoints can be tested and benchmarked against something that
+behaves like a real network dependency:
+
+    python -m app.stubs.grade_server --port 8081 --latency-ms 50 --error-rate 0.3
+"""
+
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+GRADES = ["A", "B+", "A-"]
+
+
+def create_app(
+    latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0
+) -> web.Application:
+    async def grades(request: web.Request) -> web.Response:
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if random.random() < error_rate:
+            return web.json_response({"error": "External API error"}, status=503)
+
+        return web.json_response(
+            {"student_id": request.match_info["student_id"], "grades": GRADES}
+        )
+
+    app = web.Application()
+    app.router.add_get("/grades/{student_id}", grades)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub external grade service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Run the hot-path benchmarks and compare them with the stored baseline.
+
+    python -m benchmarks                     # run, fail on regression
+    python -m benchmarks --filter rate_limiter
+    python -m benchmarks --update-baseline   # after an intended change
+
+Raw ops/sec differ between machines, so every run also times a fixed
+pure-Python reference workload and the baseline's numbers are scaled by
+how fast this machine runs it compared with the one that recorded them.
+That absorbs CPU speed and load, not differences in Python or library
+versions: refresh the baseline with --update-baseline, on the runner that
+enforces the gate, whenever those change or an intended change moves a
+number, and commit benchmarks/baseline.json.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+from benchmarks import bench_hot_path  # noqa: F401 - registers benchmarks
+from benchmarks.harness import BENCHMARKS, compare, measure, reference_ops_per_sec
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def run(name: str, min_time: float):
+    # the code under test prints; keep that out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = measure(name, BENCHMARKS[name](), min_time=min_time)
+    print(
+        f"{name:<45}{result.ops_per_sec:>14,.0f}"
+        f"{result.peak_bytes_per_call:>13}{result.retained_bytes_per_call:>13}"
+    )
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--filter", default="", help="only names containing this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    print(f"{'benchmark':<45}{'ops/sec':>14}{'peak B/call':>13}{'kept B/call':>13}")
+    names = [name for name in BENCHMARKS if args.filter in name]
+    # timed before and after, keeping the slower: load during the run counts
+    reference = reference_ops_per_sec(args.min_time)
+    results = [run(name, args.min_time) for name in names]
+    reference = min(reference, reference_ops_per_sec(args.min_time))
+    print(f"{'(reference workload)':<45}{reference:>14,.0f}")
+
+    if args.update_baseline:
+        baseline = (
+            json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        )
+        baseline["python"] = platform.python_version()
+        baseline["reference_ops_per_sec"] = round(reference, 1)
+        baseline.setdefault("results", {}).update(
+            {r.name: r.as_dict() for r in results}
+        )
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("\nNo baseline; run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("python") != platform.python_version():
+        print(
+            f"\nWarning: baseline is from Python {baseline.get('python')}, "
+            f"running {platform.python_version()}"
+        )
+    if "reference_ops_per_sec" in baseline:
+        speed = reference / baseline["reference_ops_per_sec"]
+        print(f"\nThis machine runs the reference at {speed:.2f}x the baseline's")
+    else:
+        speed = 1.0
+        print("\nWarning: baseline has no reference speed; comparing raw ops/sec")
+
+    regressions = compare(results, baseline["results"], args.tolerance, speed)
+    if regressions:
+        # a burst of load can still hit one benchmark and not the reference;
+        # measure the regressed benchmarks again before failing
+        print("\nRe-measuring regressed benchmarks...")
+        rerun = {r.split(":")[0] for r in regressions}
+        for i, result in enumerate(results):
+            if result.name in rerun:
+                again = run(result.name, args.min_time)
+                if again.ops_per_sec > result.ops_per_sec:
+                    results[i] = again
+        regressions = compare(results, baseline["results"], args.tolerance, speed)
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Benchmarks for code that runs on every request"""
+from datetime import datetime
+
+import fakeredis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.middleware import rate_limiter
+from app.middleware.rate_limiter import RateLimiter, RateLimitMiddleware
+from app.services.circuit_breaker import CircuitBreaker
+
+from benchmarks.harness import benchmark
+
+
+def _request(path: str = "/api/v1/students", token: str | None = None) -> Request:
+    headers = [(b"host", b"localhost")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": headers,
+            "client": ("10.0.0.1", 50000),
+            "server": ("localhost", 8000),
+            "scheme": "http",
+        }
+    )
+
+
+def _limiter(redis_client=None) -> RateLimiter:
+    limiter = RateLimiter(rate=10**9, per=60, burst=10**9)
+    limiter.redis_client = redis_client
+    limiter._initialised = True
+    if redis_client is None:
+        # time the in-memory fallback, not its attempts to reach Redis again
+        rate_limiter._next_attempt = float("inf")
+    return limiter
+
+
+def _middleware() -> RateLimitMiddleware:
+    # same endpoint layout as app.main
+    middleware = RateLimitMiddleware(None, RateLimiter(rate=100, per=60, burst=110))
+    middleware.add_endpoint_limit("/api/v1/students", RateLimiter(rate=10, per=60))
+    middleware.add_endpoint_limit("/auth/token", RateLimiter(rate=5, per=60))
+    return middleware
+
+
+def _run(coro):
+    """Drive a coroutine that never really suspends, without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("coroutine suspended")
+
+
+@benchmark("rate_limiter.check_rate_limit[redis]")
+def check_rate_limit_redis():
+    limiter = _limiter(fakeredis.FakeRedis(decode_responses=True))
+    return lambda: limiter.check_rate_limit("10.0.0.1", "/api/v1/students")
+
+
+@benchmark("rate_limiter.check_rate_limit[memory]")
+def check_rate_limit_memory():
+    limiter = _limiter()
+    return lambda: limiter.check_rate_limit("10.0.0.1", "/api/v1/students")
+
+
+@benchmark("middleware.get_identifier[anonymous]")
+def get_identifier_anonymous():
+    middleware, request = _middleware(), _request()
+    return lambda: middleware._get_identifier(request)
+
+
+@benchmark("middleware.get_identifier[bearer]")
+def get_identifier_bearer():
+    middleware, request = _middleware(), _request(token="a" * 200)
+    return lambda: middleware._get_identifier(request)
+
+
+@benchmark("middleware.get_limiter_for_path[exact]")
+def get_limiter_exact():
+    middleware = _middleware()
+    return lambda: middleware._get_limiter_for_path("/api/v1/students")
+
+
+@benchmark("middleware.get_limiter_for_path[default]")
+def get_limiter_default():
+    middleware = _middleware()
+    return lambda: middleware._get_limiter_for_path("/health/ready")
+
+
+@benchmark("circuit_breaker.call[closed]")
+def circuit_breaker_call():
+    breaker = CircuitBreaker("bench")
+    return lambda: breaker.call(len, "student")
+
+
+@benchmark("ids.new_student_id")
+def new_student_id():
+    from app.core.ids import new_student_id
+
+    return new_student_id
+
+
+@benchmark("metering.record")
+def metering_record():
+    from app.services.metering_service import MeteringService
+
+    metering = MeteringService()
+    return lambda: metering.record("10.0.0.1", "/api/v1/students", 64, 256, 0.01)
+
+
+@benchmark("main.add_metrics")
+def add_metrics():
+    from app.main import add_metrics
+
+    request, response = _request("/api/v1/students"), Response(status_code=200)
+
+    async def call_next(request):
+        return response
+
+    return lambda: _run(add_metrics(request, call_next))
+
+
+def _students(count: int) -> list:
+    from app.db.database import Base
+    from app.models.student import Student
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        Student(
+            student_id=f"STU-{i:08X}",
+            first_name="Ada",
+            last_name="Lovelace",
+            grade=i % 12 + 1,
+            created_at=datetime(2024, 1, 1),
+        )
+        for i in range(count)
+    )
+    db.commit()
+    return db.query(Student).all()
+
+
+@benchmark("student_response.serialize[1]")
+def serialize_one():
+    from app.api.students import StudentResponse
+
+    (student,) = _students(1)
+    return lambda: StudentResponse.model_validate(
+        student, from_attributes=True
+    ).model_dump_json()
+
+
+@benchmark("student_response.serialize[100]")
+def serialize_page():
+    from pydantic import TypeAdapter
+
+    from app.api.students import StudentResponse
+
+    students = _students(100)
+    adapter = TypeAdapter(list[StudentResponse])
+    return lambda: adapter.dump_json(
+        adapter.validate_python(students, from_attributes=True)
+    )
@@ -0,0 +1,143 @@
+import gc
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+# name -> setup function returning the zero-argument callable to measure
+BENCHMARKS: dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark; setup runs once, outside the timed region"""
+
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+@dataclass
+class Result:
+    name: str
+    ops_per_sec: float
+    peak_bytes_per_call: int  # transient high-water mark of one call
+    retained_bytes_per_call: float  # memory still held afterwards (leaks)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def reference_ops_per_sec(min_time: float = 0.2) -> float:
+    """Throughput of a fixed pure-Python workload: this machine's speed
+
+    Benchmarks are compared relative to it, so a baseline recorded on a
+    faster or slower machine (or a busier moment) still applies.
+    """
+    return measure_throughput(_reference_workload, min_time)
+
+
+def measure_throughput(
+    fn: Callable[[], object], min_time: float = 0.2, repeats: int = 5
+) -> float:
+    """Best-of-`repeats` calls per second"""
+    number = _calibrate(fn, min_time)
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return number / min(timings)
+
+
+def measure(name: str, fn: Callable[[], object], min_time: float = 0.2, repeats: int = 5):
+    """Best-of-`repeats` throughput, then allocations under tracemalloc
+
+    Allocations are measured separately because tracemalloc slows every
+    allocation down several times over.
+    """
+    ops_per_sec = measure_throughput(fn, min_time, repeats)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()  # let caches and lazily created objects settle first
+        peaks = []
+        for _ in range(50):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+
+        calls = 1000
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(calls):
+            fn()
+        gc.collect()
+        retained = (tracemalloc.get_traced_memory()[0] - before) / calls
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        name=name,
+        ops_per_sec=round(ops_per_sec, 1),
+        peak_bytes_per_call=int(statistics.median(peaks)),
+        retained_bytes_per_call=round(max(retained, 0.0), 1),
+    )
+
+
+def compare(
+    results: list[Result], baseline: dict, tolerance: float, speed: float = 1.0
+) -> list[str]:
+    """Regressions against the stored baseline
+
+    `speed` is this run's reference throughput over the baseline's; expected
+    throughput is scaled by it first. Throughput may then drop by
+    `tolerance` and peak allocation may grow by it (plus 64 bytes, so tiny
+    numbers aren't flaky) before a benchmark fails.
+    """
+    regressions = []
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+        expected = before["ops_per_sec"] * speed
+        if result.ops_per_sec < expected * (1 - tolerance):
+            regressions.append(
+                f"{result.name}: {expected:,.0f} -> "
+                f"{result.ops_per_sec:,.0f} ops/sec (baseline scaled by {speed:.2f})"
+            )
+        limit = before["peak_bytes_per_call"] * (1 + tolerance) + 64
+        if result.peak_bytes_per_call > limit:
+            regressions.append(
+                f"{result.name}: {before['peak_bytes_per_call']} -> "
+                f"{result.peak_bytes_per_call} bytes/call"
+            )
+    return regressions
+
+
+def _calibrate(fn: Callable[[], object], min_time: float) -> int:
+    """Number of calls that takes about `min_time` seconds"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or number >= 10_000_000:
+            return max(1, int(number * min_time / max(elapsed, 1e-9)))
+        number *= 4
+
+
+def _reference_workload():
+    # dict, string and list churn, like the request path without I/O
+    counts = {}
+    for i in range(100):
+        key = f"client:{i % 16}"
+        counts[key] = counts.get(key, 0) + i
+    return sorted(counts.items())
@@ -43,6 +43,31 @@ resource "aws_dynamodb_table" "audit_logs" {
     name = "timestamp"
     type = "S"
   }
+
+  attribute {
+    name = "action"
+    type = "S"
+  }
+
+  # YYYY-MM-DD bucket so time-range queries don't need a full scan
+  attribute {
+    name = "day"
+    type = "S"
+  }
+
+  global_secondary_index {
+    name            = "action-timestamp-index"
+    hash_key        = "action"
+    range_key       = "timestamp"
+    projection_type = "ALL"
+  }
+
+  global_secondary_index {
+    name            = "day-timestamp-index"
+    hash_key        = "day"
+    range_key       = "timestamp"
+    projection_type = "ALL"
+  }
   
   tags = {
     Environment = "development"
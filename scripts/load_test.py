@@ -1,44 +1,491 @@
 #!/usr/bin/env python3
+"""Open-loop load generator for the SRE playground API.
+
+Requests are started on a fixed schedule (constant arrival rate, or a linear
+ramp) whether or not earlier ones have finished, so a slow server can't
+throttle the load it is measured under. Latency is reported both from each
+request's *intended* start (what a user would see, corrected for
+coordinated omission) and from when it was actually sent.
+
+Examples:
+    ./scripts/load_test.py --rate 50 --duration 60
+    ./scripts/load_test.py --mode ramp --rate 10 --ramp-to 200 --duration 120
+    ./scripts/load_test.py --rate 50 --output results.json --baseline baseline.json
+    ./scripts/load_test.py --rate 50 --fault redis:latency_ms=20,p99_latency_ms=400
+
+--fault applies a dependency fault for the whole run (warmup included) through
+the admin API and lifts it afterwards; the server needs
+FAULT_INJECTION_ENABLED=true.
+"""
+import argparse
 import asyncio
-import statistics
+import json
+import random
+import sys
 import time
+import uuid
+from collections import Counter, defaultdict
 
 import aiohttp
 
+PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99)
+DEFAULT_SCENARIOS = "create=1,list=2,get=4,grades=3,search=1"
+
+
+class LatencyHistogram:
+    """HDR-style histogram of latencies in microseconds.
+
+    Values below 2^sub_bucket_bits are recorded exactly; above that each
+    power of two is split into 2^(sub_bucket_bits - 1) linear buckets, so
+    every recorded value is within 1 / 2^(sub_bucket_bits - 1) of the truth
+    (0.1% by default) however long the tail. Histograms merge by adding
+    counts.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 11):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: Counter[int] = Counter()
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds: float):
+        value = max(1, int(seconds * 1_000_000))
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        # bucket key: the value with its low `shift` bits dropped
+        self.counts[(value >> shift) << shift] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """Latency in ms at percentile p (0-100)"""
+        if not self.total:
+            return 0.0
+        rank = max(1, round(p / 100 * self.total))
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= rank:
+                return value / 1000
+        return self.max / 1000
+
+    def summary(self) -> dict:
+        return {
+            **{f"p{p:g}": round(self.percentile(p), 3) for p in PERCENTILES},
+            "max": round(self.max / 1000, 3),
+        }
+
+
+class ScenarioStats:
+    def __init__(self):
+        self.response_time = LatencyHistogram()  # from intended start
+        self.service_time = LatencyHistogram()  # from actual send
+        self.statuses: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+
+    def merge(self, other: "ScenarioStats"):
+        self.response_time.merge(other.response_time)
+        self.service_time.merge(other.service_time)
+        self.statuses.update(other.statuses)
+        self.errors.update(other.errors)
+
+    def summary(self, elapsed: float) -> dict:
+        count = self.response_time.total
+        classes = Counter()
+        for status, n in self.statuses.items():
+            classes[_status_class(status)] += n
+        failed = count - classes["2xx"] - classes["404"]
+        return {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(failed / count, 4) if count else 0.0,
+            "status_classes": dict(classes),
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+            "response_time_ms": self.response_time.summary(),
+            "service_time_ms": self.service_time.summary(),
+        }
+
+
+def _status_class(status: str) -> str:
+    if status == "429":
+        return "rate_limited"
+    if status == "503":
+        return "shed"
+    if status == "404":
+        return "404"
+    if status.isdigit():
+        return f"{status[0]}xx"
+    return "client_error"
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.api = f"{args.base_url.rstrip('/')}/api/v1"
+        self.scenarios = _parse_scenarios(args.scenarios)
+        self.faults = dict(_parse_fault(spec) for spec in args.fault)
+        self.stats: dict[str, ScenarioStats] = defaultdict(ScenarioStats)
+        self.student_ids: list[str] = []
+        self.in_flight = 0
+        self.skipped = 0  # arrivals dropped at the --max-in-flight cap
+        self.late = 0  # arrivals the scheduler started more than 10ms late
+        self.random = random.Random(args.seed)
+
+    async def run(self) -> dict:
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=self.args.max_in_flight)
+        async with aiohttp.ClientSession(
+            timeout=timeout, connector=connector
+        ) as session:
+            await self._seed_students(session)
+            await self._set_faults(session)
+            try:
+                if self.args.warmup:
+                    print(f"Warming up for {self.args.warmup}s...")
+                    await self._drive(session, self.args.warmup, record=False)
+
+                print(
+                    f"Running {self.args.mode} load for {self.args.duration}s "
+                    f"({self._describe_rate()})"
+                )
+                started = time.perf_counter()
+                await self._drive(session, self.args.duration, record=True)
+                elapsed = time.perf_counter() - started
+            finally:
+                await self._clear_faults(session)
+
+        return self._results(elapsed)
+
+    async def _drive(self, session, duration: float, record: bool):
+        """Start requests on schedule for `duration` seconds, then drain"""
+        tasks = set()
+        start = time.perf_counter()
+        intended = start
+
+        while intended - start < duration:
+            now = time.perf_counter()
+            if intended > now:
+                await asyncio.sleep(intended - now)
+            elif now - intended > 0.01:
+                self.late += record
+
+            if self.in_flight >= self.args.max_in_flight:
+                self.skipped += record
+            else:
+                name = self.random.choices(*zip(*self.scenarios.items()))[0]
+                task = asyncio.create_task(
+                    self._request(session, name, intended, record)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            intended += self._next_interval(intended - start, duration)
+
+        if tasks:
+            await asyncio.gather(*tasks)
 
-async def test_endpoint(session, url):
-    start = time.time()
+    def _next_interval(self, elapsed: float, duration: float) -> float:
+        rate = self.args.rate
+        if self.args.mode == "ramp":
+            rate += (self.args.ramp_to - self.args.rate) * elapsed / duration
+        rate = max(rate, 0.1)
+        if self.args.arrivals == "poisson":
+            return self.random.expovariate(rate)
+        return 1 / rate
+
+    async def _request(self, session, name: str, intended: float, record: bool):
+        method, url, body = self._build(name)
+        headers = {}
+        if self.args.virtual_clients:
+            # the rate limiter keys on IP + token, so spread load over clients
+            client = self.random.randrange(self.args.virtual_clients)
+            headers["Authorization"] = f"Bearer loadgen-{client}"
+
+        self.in_flight += 1
+        sent = time.perf_counter()
+        status, error = None, None
+        try:
+            async with session.request(
+                method, url, json=body, headers=headers
+            ) as response:
+                payload = await response.read()
+                status = str(response.status)
+                if name == "create" and response.status in (200, 201):
+                    self._remember(payload)
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except aiohttp.ClientError as e:
+            error = type(e).__name__
+        finally:
+            self.in_flight -= 1
+
+        if not record:
+            return
+        done = time.perf_counter()
+        stats = self.stats[name]
+        stats.response_time.record(done - intended)
+        stats.service_time.record(done - sent)
+        if error:
+            stats.statuses["error"] += 1
+            stats.errors[error] += 1
+        else:
+            stats.statuses[status] += 1
+
+    def _build(self, name: str) -> tuple[str, str, dict | None]:
+        if name == "create":
+            return (
+                "POST",
+                f"{self.api}/students",
+                {
+                    "first_name": f"Load{self.random.randrange(10**6)}",
+                    "last_name": "Test",
+                    "grade": self.random.randint(1, 12),
+                },
+            )
+        if name == "list":
+            return "GET", f"{self.api}/students?limit=20", None
+        if name == "search":
+            # no search endpoint yet; page deep into the list instead
+            skip = self.random.randrange(0, 1000, 50)
+            return "GET", f"{self.api}/students?skip={skip}&limit=50", None
+
+        student_id = (
+            self.random.choice(self.student_ids)
+            if self.student_ids
+            else f"STU-{uuid.uuid4().hex[:8].upper()}"
+        )
+        if name == "get":
+            return "GET", f"{self.api}/students/{student_id}", None
+        if name == "grades":
+            return "GET", f"{self.api}/students/{student_id}/grades", None
+        raise ValueError(f"Unknown scenario {name}")
+
+    def _remember(self, payload: bytes):
+        try:
+            student_id = json.loads(payload)["student_id"]
+        except (ValueError, KeyError, TypeError):
+            return
+        if len(self.student_ids) < 10000:
+            self.student_ids.append(student_id)
+        else:
+            self.student_ids[self.random.randrange(10000)] = student_id
+
+    async def _seed_students(self, session):
+        """Pick up existing students so get/grades hit real records"""
+        try:
+            async with session.get(f"{self.api}/students?limit=500") as response:
+                if response.status == 200:
+                    students = await response.json()
+                    self.student_ids = [s["student_id"] for s in students]
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        print(f"Seeded {len(self.student_ids)} existing student IDs")
+
+    async def _set_faults(self, session):
+        for target, rule in self.faults.items():
+            url = f"{self.api}/admin/faults/{target}"
+            try:
+                async with session.put(url, json=rule) as response:
+                    status, detail = response.status, await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, detail = "no response", str(e)
+            if status != 200:
+                await self._clear_faults(session)
+                raise SystemExit(f"Could not inject {target} fault: {status} {detail}")
+            print(f"Injecting {target} fault: {rule}")
+
+    async def _clear_faults(self, session):
+        for target in self.faults:
+            try:
+                async with session.delete(f"{self.api}/admin/faults/{target}"):
+                    pass
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                print(f"Could not lift {target} fault; DELETE /admin/faults by hand")
+
+    def _describe_rate(self) -> str:
+        if self.args.mode == "ramp":
+            return f"{self.args.rate} -> {self.args.ramp_to} req/s"
+        return f"{self.args.rate} req/s"
+
+    def _results(self, elapsed: float) -> dict:
+        overall = ScenarioStats()
+        for stats in self.stats.values():
+            overall.merge(stats)
+
+        return {
+            "timestamp": time.time(),
+            "config": {
+                "base_url": self.args.base_url,
+                "mode": self.args.mode,
+                "arrivals": self.args.arrivals,
+                "rate": self.args.rate,
+                "ramp_to": self.args.ramp_to if self.args.mode == "ramp" else None,
+                "duration": self.args.duration,
+                "warmup": self.args.warmup,
+                "scenarios": self.scenarios,
+                "virtual_clients": self.args.virtual_clients,
+                "faults": self.faults,
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "skipped_at_in_flight_cap": self.skipped,
+            "late_arrivals": self.late,
+            "overall": overall.summary(elapsed),
+            "scenarios": {
+                name: stats.summary(elapsed)
+                for name, stats in sorted(self.stats.items())
+            },
+        }
+
+
+def _parse_scenarios(spec: str) -> dict[str, float]:
+    scenarios = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        scenarios[name.strip()] = float(weight or 1)
+    unknown = set(scenarios) - {"create", "list", "get", "grades", "search"}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return scenarios
+
+
+def _parse_fault(spec: str) -> tuple[str, dict[str, float]]:
+    """"redis:latency_ms=20,error_rate=0.01" -> ("redis", {...})"""
+    target, _, params = spec.partition(":")
     try:
-        async with session.get(url) as response:
-            await response.text()
-            return time.time() - start, response.status
-    except Exception:
-        return time.time() - start, 0
+        rule = {
+            key.strip(): float(value)
+            for key, _, value in (part.partition("=") for part in params.split(","))
+        }
+    except ValueError:
+        raise SystemExit(f"Bad --fault {spec!r}, expected TARGET:key=value,...")
+    return target.strip(), rule
+
+
+def print_report(results: dict):
+    print(
+        f"\nResults ({results['elapsed_seconds']}s, "
+        f"{results['skipped_at_in_flight_cap']} skipped at in-flight cap, "
+        f"{results['late_arrivals']} late arrivals)"
+    )
+    header = f"{'scenario':<10}{'reqs':>8}{'rps':>9}{'err%':>7}"
+    header += "".join(f"{'p' + format(p, 'g'):>10}" for p in PERCENTILES)
+    print(header + f"{'max':>10}")
+
+    rows = [*results["scenarios"].items(), ("overall", results["overall"])]
+    for name, summary in rows:
+        latency = summary["response_time_ms"]
+        line = (
+            f"{name:<10}{summary['requests']:>8}{summary['throughput_rps']:>9}"
+            f"{summary['error_rate'] * 100:>7.2f}"
+        )
+        line += "".join(f"{latency[f'p{p:g}']:>10.1f}" for p in PERCENTILES)
+        print(line + f"{latency['max']:>10.1f}")
+
+    print("\nResponse codes:")
+    for name, summary in rows:
+        classes = ", ".join(f"{k}={v}" for k, v in sorted(summary["status_classes"].items()))
+        errors = ", ".join(f"{k}={v}" for k, v in sorted(summary["errors"].items()))
+        print(f"  {name:<10}{classes}" + (f"  [{errors}]" if errors else ""))
+    print("\nLatencies in ms, measured from each request's scheduled start")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of p50/p99/p99.9 or error rate beyond `tolerance`"""
+    regressions = []
+    names = ["overall", *results["scenarios"]]
+    for name in names:
+        current = results["overall"] if name == "overall" else results["scenarios"][name]
+        before = (
+            baseline["overall"]
+            if name == "overall"
+            else baseline["scenarios"].get(name)
+        )
+        if before is None:
+            continue
+
+        print(f"  {name}:")
+        for key in ("p50", "p99", "p99.9"):
+            old = before["response_time_ms"][key]
+            new = current["response_time_ms"][key]
+            change = (new - old) / old if old else 0.0
+            print(f"    {key:<6}{old:>10.1f} -> {new:>10.1f} ms ({change:+.1%})")
+            if change > tolerance:
+                regressions.append(f"{name} {key} {change:+.1%}")
+
+        old, new = before["error_rate"], current["error_rate"]
+        print(f"    {'errors':<6}{old:>10.2%} -> {new:>10.2%}")
+        if new > old + tolerance / 10:
+            regressions.append(f"{name} error rate {old:.2%} -> {new:.2%}")
+
+    return regressions
+
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=["constant", "ramp"], default="constant")
+    parser.add_argument("--rate", type=float, default=20, help="requests per second")
+    parser.add_argument("--ramp-to", type=float, default=100, help="final rate in ramp mode")
+    parser.add_argument(
+        "--arrivals", choices=["uniform", "poisson"], default="poisson"
+    )
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unrecorded seconds")
+    parser.add_argument(
+        "--scenarios", default=DEFAULT_SCENARIOS, help="weighted mix, name=weight,..."
+    )
+    parser.add_argument(
+        "--virtual-clients",
+        type=int,
+        default=0,
+        help="spread requests over N bearer tokens (rate limits are per client)",
+    )
+    parser.add_argument(
+        "--fault",
+        action="append",
+        default=[],
+        metavar="TARGET:key=value,...",
+        help="dependency fault to inject for the run (repeatable)",
+    )
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="allowed latency regression"
+    )
+    return parser.parse_args(argv)
 
-async def run_load_test(base_url="http://localhost:8000", num_requests=100):
-    print(f"Running load test: {num_requests} requests")
 
-    async with aiohttp.ClientSession() as session:
-        # Test health endpoint
-        tasks = [
-            test_endpoint(session, f"{base_url}/health") for _ in range(num_requests)
-        ]
-        results = await asyncio.gather(*tasks)
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(LoadTest(args).run())
+    print_report(results)
 
-        # Analyze results
-        durations = [r[0] for r in results if r[1] == 200]
-        failures = [r for r in results if r[1] != 200]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
 
-        print("\nResults:")
-        print(f"Successful: {len(durations)}")
-        print(f"Failed: {len(failures)}")
-        if durations:
-            print(f"Avg response time: {statistics.mean(durations):.3f}s")
-            print(f"Min: {min(durations):.3f}s")
-            print(f"Max: {max(durations):.3f}s")
-            print(f"P95: {sorted(durations)[int(len(durations) * 0.95)]:.3f}s")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions: " + "; ".join(regressions))
+            return 1
+        print("\nNo regressions")
+    return 0
 
 
 if __name__ == "__main__":
-    asyncio.run(run_load_test())
+    sys.exit(main())
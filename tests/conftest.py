@@ -1,5 +1,7 @@
 import sys
+from contextlib import ExitStack
 from pathlib import Path
+from unittest.mock import patch
 
 # Add the project root to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -14,6 +16,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.db.database import Base, get_db
 from app.main import app
+from app.services.health_service import health_service
 
 # Test database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -41,10 +44,20 @@ def test_db():
 
 @pytest.fixture(scope="function")
 def client(test_db):
-    """Create test client with test database"""
+    """Create test client with test database
+
+    The database health probe runs against the test database too. Probes of
+    optional dependencies (Redis, SQS, DynamoDB) pass without dialling them,
+    or shutdown would wait on their connect timeouts and retries.
+    """
     app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as test_client:
-        yield test_client
+    with ExitStack() as stack:
+        stack.enter_context(patch("app.db.database.SessionLocal", TestingSessionLocal))
+        for check in health_service.checks.values():
+            if not check.critical:
+                stack.enter_context(patch.object(check, "probe", lambda: None))
+        with TestClient(app) as test_client:
+            yield test_client
     app.dependency_overrides.clear()
 
 
@@ -71,3 +84,11 @@ def mock_dynamodb():
             BillingMode="PAY_PER_REQUEST",
         )
         yield client
+
+
+@pytest.fixture(scope="function")
+def offline_client(test_db):
+    """Test client without the app lifespan: SQS, audit and Redis stay offline"""
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -1,6 +1,8 @@
 import json
 from unittest.mock import Mock, patch
 
+from app.services.audit_service import audit_service
+
 
 class TestMessagingIntegration:
     """Test SQS messaging integration"""
@@ -35,12 +37,16 @@ class TestMessagingIntegration:
     def test_student_creation_logs_audit(self, mock_boto_resource, client):
         """Creating a student should log to audit table"""
         # Mock DynamoDB
+        mock_dynamo_client = Mock()
+        mock_dynamo_client.batch_write_item.return_value = {"UnprocessedItems": {}}
+
         mock_table = Mock()
-        mock_table.put_item.return_value = {}
+        mock_table.meta.client = mock_dynamo_client
 
         mock_dynamodb = Mock()
         mock_dynamodb.Table.return_value = mock_table
         mock_boto_resource.return_value = mock_dynamodb
+        audit_service.initialise()
 
         # Create student
         response = client.post(
@@ -50,11 +56,15 @@ class TestMessagingIntegration:
 
         assert response.status_code == 201
 
+        # Audit records are written in the background
+        audit_service.flush()
+
         # Verify audit log was created
-        mock_table.put_item.assert_called()
-        call_args = mock_table.put_item.call_args
+        mock_dynamo_client.batch_write_item.assert_called()
+        call_args = mock_dynamo_client.batch_write_item.call_args
 
-        audit_item = call_args[1]["Item"]
+        requests = call_args[1]["RequestItems"]["sre-playground-audit"]
+        audit_item = requests[0]["PutRequest"]["Item"]
         assert audit_item["action"] == "student_created"
         assert "timestamp" in audit_item
         assert "id" in audit_item
@@ -1,8 +1,17 @@
+import asyncio
+import threading
 import time
 
+import fakeredis
 import pytest
 
-from app.services.circuit_breaker import CircuitBreaker, CircuitState
+from app.services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerOpenError,
+    CircuitBreakerTimeout,
+    CircuitState,
+)
+from app.services.shared_circuit_breaker import SharedCircuitBreaker
 
 
 class TestCircuitBreaker:
@@ -66,3 +75,225 @@ class TestCircuitBreaker:
         result = breaker.call(intermittent_func)
         assert result == "recovered"
         assert breaker.state == CircuitState.CLOSED
+
+    def test_circuit_breaker_opens_on_failure_rate(self):
+        """Interleaved failures should trip the breaker by rate, not streak"""
+        breaker = CircuitBreaker(
+            "test",
+            failure_threshold=100,
+            failure_rate_threshold=0.5,
+            window_size=10,
+            minimum_calls=10,
+        )
+
+        def flaky(fail):
+            if fail:
+                raise Exception("Service unavailable")
+            return "ok"
+
+        for i in range(10):
+            try:
+                breaker.call(flaky, i % 2 == 1)
+            except Exception:
+                pass
+
+        assert breaker.state == CircuitState.OPEN
+
+    def test_circuit_breaker_rate_needs_minimum_calls(self):
+        """A couple of early failures shouldn't trip a rate-based breaker"""
+        breaker = CircuitBreaker(
+            "test",
+            failure_threshold=100,
+            failure_rate_threshold=0.5,
+            window_type="time",
+            window_size=10,
+            minimum_calls=5,
+        )
+
+        def failing_func():
+            raise Exception("Service unavailable")
+
+        for _ in range(4):
+            with pytest.raises(Exception):
+                breaker.call(failing_func)
+
+        assert breaker.state == CircuitState.CLOSED
+
+        with pytest.raises(Exception):
+            breaker.call(failing_func)
+        assert breaker.state == CircuitState.OPEN
+
+    def test_circuit_breaker_times_out_hanging_calls(self):
+        """Calls past call_timeout should fail fast and count as failures"""
+        breaker = CircuitBreaker("test", failure_threshold=1, call_timeout=0.05)
+
+        with pytest.raises(CircuitBreakerTimeout):
+            breaker.call(time.sleep, 1)
+
+        assert breaker.state == CircuitState.OPEN
+
+    def test_circuit_breaker_async_calls(self):
+        """Coroutines should be protected the same way as sync calls"""
+        breaker = CircuitBreaker("test", failure_threshold=1, call_timeout=0.05)
+
+        async def fetch():
+            return "success"
+
+        async def hang():
+            await asyncio.sleep(1)
+
+        assert asyncio.run(breaker.call_async(fetch)) == "success"
+
+        with pytest.raises(CircuitBreakerTimeout):
+            asyncio.run(breaker.call_async(hang))
+
+        with pytest.raises(CircuitBreakerOpenError):
+            asyncio.run(breaker.call_async(fetch))
+
+    def test_circuit_breaker_limits_half_open_probes(self):
+        """Only half_open_max_calls probes should reach the dependency"""
+        breaker = CircuitBreaker("test", failure_threshold=1, timeout=0)
+        release = threading.Event()
+
+        def failing_func():
+            raise Exception("Service unavailable")
+
+        with pytest.raises(Exception):
+            breaker.call(failing_func)
+
+        probe = threading.Thread(target=breaker.call, args=(release.wait, 5))
+        probe.start()
+        time.sleep(0.05)
+
+        # the probe is still in flight, so this call is rejected
+        try:
+            with pytest.raises(CircuitBreakerOpenError):
+                breaker.call(lambda: "success")
+        finally:
+            release.set()
+            probe.join()
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_circuit_breaker_is_thread_safe(self):
+        """Concurrent failures should all be counted"""
+        breaker = CircuitBreaker("test", failure_threshold=10_000)
+
+        def failing_func():
+            raise Exception("Service unavailable")
+
+        def hammer():
+            for _ in range(500):
+                try:
+                    breaker.call(failing_func)
+                except Exception:
+                    pass
+
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert breaker.failure_count == 4000
+
+
+class TestSharedCircuitBreaker:
+    """Test circuit state shared between workers through Redis"""
+
+    def _workers(self, count=2, **kwargs):
+        server = fakeredis.FakeServer()
+        return [
+            SharedCircuitBreaker(
+                "shared",
+                redis_client=fakeredis.FakeRedis(server=server),
+                failure_threshold=1,
+                refresh_interval=0,
+                **kwargs,
+            )
+            for _ in range(count)
+        ]
+
+    def test_one_worker_tripping_protects_the_others(self):
+        """Workers should reject calls once any of them opens the circuit"""
+        a, b = self._workers()
+
+        def failing_func():
+            raise Exception("Service unavailable")
+
+        with pytest.raises(Exception):
+            a.call(failing_func)
+
+        calls = []
+        with pytest.raises(CircuitBreakerOpenError):
+            b.call(calls.append, "never")
+
+        assert calls == []
+        assert b.state == CircuitState.OPEN
+
+    def test_only_one_worker_probes_after_timeout(self):
+        """A single HALF_OPEN probe should be admitted fleet-wide"""
+        a, b = self._workers(timeout=0)
+
+        def failing_func():
+            raise Exception("Service unavailable")
+
+        with pytest.raises(Exception):
+            a.call(failing_func)
+        b.refresh()
+
+        release = threading.Event()
+        probe = threading.Thread(target=a.call, args=(release.wait, 5))
+        probe.start()
+        time.sleep(0.05)
+
+        try:
+            with pytest.raises(CircuitBreakerOpenError):
+                b.call(lambda: "success")
+        finally:
+            release.set()
+            probe.join()
+
+        # the probe succeeded, so the circuit is closed for everyone
+        assert a.state == CircuitState.CLOSED
+        assert b.call(lambda: "success") == "success"
+        assert b.state == CircuitState.CLOSED
+
+    def test_redis_outage_falls_back_to_local_state(self):
+        """The breaker should keep working if Redis is unreachable"""
+        (breaker,) = self._workers(count=1)
+        breaker._redis.connection_pool.connection_kwargs["server"].connected = False
+
+        assert breaker.call(lambda: "success") == "success"
+
+        with pytest.raises(Exception):
+            breaker.call(lambda: 1 / 0)
+        assert breaker.state == CircuitState.OPEN
+
+    def test_redis_is_called_off_the_loop_and_unlocked(self):
+        """Async calls shouldn't sync with Redis on the loop or under the lock"""
+        (breaker,) = self._workers(count=1)
+        calls = []
+
+        def recorded(script):
+            def run(**kwargs):
+                calls.append((threading.get_ident(), breaker._lock.locked()))
+                return script(**kwargs)
+
+            return run
+
+        breaker._read = recorded(breaker._read)
+        breaker._trip = recorded(breaker._trip)
+
+        async def failing_func():
+            raise Exception("Service unavailable")
+
+        async def scenario():
+            with pytest.raises(Exception):
+                await breaker.call_async(failing_func)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+
+        assert len(calls) == 2  # the refresh and the trip
+        assert all(thread != loop_thread and not locked for thread, locked in calls)
+        assert breaker.state == CircuitState.OPEN
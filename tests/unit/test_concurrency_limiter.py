@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.concurrency_limiter import ConcurrencyLimitMiddleware, GradientLimit
+
+
+def make_app(limit: GradientLimit) -> tuple[FastAPI, asyncio.Event]:
+    release = asyncio.Event()
+    app = FastAPI()
+    app.add_middleware(ConcurrencyLimitMiddleware, limit=limit)
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/metrics")
+    def metrics():
+        return {"ok": True}
+
+    return app, release
+
+
+class TestGradientLimit:
+    """Test the latency-driven limit"""
+
+    def test_grows_while_latency_is_steady(self):
+        """A fully used limit should grow while latency doesn't rise"""
+        limit = GradientLimit(initial_limit=10)
+        for _ in range(50):
+            limit.on_sample(0.01, in_flight=int(limit.limit))
+
+        assert limit.limit > 10
+
+    def test_shrinks_when_latency_rises(self):
+        """Latency well above the baseline should pull the limit down"""
+        limit = GradientLimit(initial_limit=100)
+        for _ in range(100):
+            limit.on_sample(0.01, in_flight=100)
+        grown = limit.limit
+
+        for _ in range(50):
+            limit.on_sample(0.2, in_flight=int(limit.limit))
+
+        assert limit.limit < grown / 2
+
+    def test_idle_limit_does_not_grow(self):
+        """An underused limit should not drift upwards"""
+        limit = GradientLimit(initial_limit=20)
+        for _ in range(100):
+            limit.on_sample(0.01, in_flight=1)
+
+        assert limit.limit == 20
+
+    def test_failures_back_off_within_bounds(self):
+        """Dropped requests should cut the limit, never below min_limit"""
+        limit = GradientLimit(initial_limit=20, min_limit=5)
+        for _ in range(100):
+            limit.on_sample(0.01, in_flight=20, dropped=True)
+
+        assert limit.limit == 5
+
+
+class TestConcurrencyLimitMiddleware:
+    """Test load shedding"""
+
+    def test_sheds_over_limit_and_exempts_metrics(self):
+        """Requests over the limit should get a fast 503; /metrics never"""
+        limit = GradientLimit(initial_limit=2, min_limit=2)
+        app, release = make_app(limit)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                held = [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+                await asyncio.sleep(0.1)
+
+                shed = await client.get("/slow")
+                scrape = await client.get("/metrics")
+                release.set()
+                done = await asyncio.gather(*held)
+            return shed, scrape, done
+
+        shed, scrape, done = asyncio.run(scenario())
+
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        assert scrape.status_code == 200
+        assert [r.status_code for r in done] == [200, 200]
+
+    def test_under_limit_passes_through(self):
+        """Requests within the limit should be served normally"""
+        app, release = make_app(GradientLimit(initial_limit=5))
+        release.set()
+
+        with TestClient(app) as client:
+            response = client.get("/slow")
+
+        assert response.status_code == 200
@@ -0,0 +1,250 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+from aiohttp.test_utils import TestServer
+
+from app.services.circuit_breaker import CircuitState
+from app.services.external_service import ExternalGradeService, GradesCache
+from app.stubs.grade_server import GRADES, create_app
+
+
+async def _fetch_ok(student_id):
+    return GRADES
+
+
+def _service(fresh_ttl=30, stale_ttl=300, **kwargs):
+    return ExternalGradeService(GradesCache(fresh_ttl, stale_ttl), **kwargs)
+
+
+class TestGradesCache:
+    """Test stale-while-revalidate grades lookups"""
+
+    def test_fresh_entries_skip_the_upstream_call(self):
+        """A second lookup within fresh_ttl should be served from cache"""
+        service = _service()
+
+        async def run():
+            with patch.object(
+                service, "_fetch_from_external_api", side_effect=_fetch_ok
+            ) as fetch:
+                first = await service.get_grades("STU-1")
+                second = await service.get_grades("STU-1")
+            return first, second, fetch.call_count
+
+        first, second, calls = asyncio.run(run())
+
+        assert first == {"grades": GRADES, "cached": False, "stale": False}
+        assert second == {"grades": GRADES, "cached": True, "stale": False}
+        assert calls == 1
+
+    def test_stale_entries_are_served_while_refreshing(self):
+        """Stale data should be returned immediately and refreshed behind"""
+        service = _service(fresh_ttl=0)
+
+        async def run():
+            with patch.object(
+                service, "_fetch_from_external_api", side_effect=_fetch_ok
+            ) as fetch:
+                await service.get_grades("STU-1")
+                result = await service.get_grades("STU-1")
+                await asyncio.gather(*service._refreshes)
+            return result, fetch.call_count
+
+        result, calls = asyncio.run(run())
+
+        assert result["stale"] is True
+        assert result["grades"] == GRADES
+        assert calls == 2
+
+    def test_open_breaker_serves_last_known_grades(self):
+        """Expired entries are still better than nothing when upstream is down"""
+        service = _service(fresh_ttl=0, stale_ttl=0)
+        service.cache.set("STU-1", GRADES)
+        service.circuit_breaker.state = CircuitState.OPEN
+        service.circuit_breaker._opened_at = time.monotonic()
+
+        result = asyncio.run(service.get_grades("STU-1"))
+
+        assert result == {"grades": GRADES, "cached": True, "stale": True}
+
+    def test_failure_without_cache_reports_unavailable(self):
+        """With nothing cached, the fallback should be explicit about it"""
+        service = _service(max_retries=0)
+
+        with patch.object(
+            service, "_fetch_from_external_api", side_effect=Exception("down")
+        ):
+            result = asyncio.run(service.get_grades("STU-1"))
+
+        assert result["grades"] == []
+        assert result["cached"] is False
+        assert "error" in result
+
+    def test_one_failing_request_counts_once(self):
+        """Retries of a single request shouldn't trip the breaker on their own"""
+        service = _service(max_retries=2, backoff_base=0.001)
+        service.circuit_breaker.failure_threshold = 3
+
+        with patch.object(
+            service, "_fetch_from_external_api", side_effect=Exception("down")
+        ) as fetch:
+            asyncio.run(service.get_grades("STU-1"))
+
+        assert fetch.call_count == 3
+        assert service.circuit_breaker.failure_count == 1
+        assert service.circuit_breaker.state == CircuitState.CLOSED
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Concurrent misses for one student should make one upstream call"""
+        service = _service()
+        calls = []
+
+        async def slow_fetch(student_id):
+            calls.append(student_id)
+            await asyncio.sleep(0.05)
+            return GRADES
+
+        async def run():
+            with patch.object(service, "_fetch_from_external_api", slow_fetch):
+                return await asyncio.gather(
+                    *(service.get_grades("STU-1") for _ in range(10))
+                )
+
+        results = asyncio.run(run())
+
+        assert calls == ["STU-1"]
+        assert all(r["grades"] == GRADES for r in results)
+
+
+class TestGradeServiceClient:
+    """Test the HTTP client against the local stub grade server"""
+
+    def _run_against_stub(self, scenario, service_options=None, **stub_options):
+        async def run():
+            server = TestServer(create_app(**stub_options))
+            await server.start_server()
+            service = _service(
+                base_url=str(server.make_url("")),
+                backoff_base=0.001,
+                **(service_options or {}),
+            )
+            try:
+                return await scenario(service)
+            finally:
+                await service.close()
+                await server.close()
+
+        return asyncio.run(run())
+
+    def test_fetches_grades_over_http(self):
+        """Grades should come back from the stub server"""
+
+        async def scenario(service):
+            return await service.get_grades("STU-1")
+
+        result = self._run_against_stub(scenario)
+        assert result == {"grades": GRADES, "cached": False, "stale": False}
+
+    def test_upstream_errors_are_retried_then_fall_back(self):
+        """Server errors should be retried and then reported as unavailable"""
+
+        async def scenario(service):
+            with patch.object(
+                service,
+                "_fetch_from_external_api",
+                wraps=service._fetch_from_external_api,
+            ) as fetch:
+                result = await service.get_grades("STU-1")
+            return result, fetch.call_count
+
+        result, calls = self._run_against_stub(scenario, error_rate=1.0)
+
+        assert calls == 3  # first attempt + 2 retries
+        assert "error" in result
+
+    def test_slow_upstream_hits_read_timeout(self):
+        """A hanging upstream should be cut off by the read timeout"""
+
+        async def scenario(service):
+            start = time.monotonic()
+            result = await service.get_grades("STU-1")
+            return result, time.monotonic() - start
+
+        result, elapsed = self._run_against_stub(
+            scenario,
+            service_options={"read_timeout": 0.05, "max_retries": 0},
+            latency_ms=1000,
+        )
+
+        assert "error" in result
+        assert elapsed < 0.5
+
+
+class TestGradesBatch:
+    """Test batch grades lookups"""
+
+    def test_batch_runs_lookups_concurrently(self):
+        """Total time should track the slowest call, not the sum"""
+        service = _service()
+
+        async def slow_fetch(student_id):
+            await asyncio.sleep(0.1)
+            return GRADES
+
+        ids = [f"STU-{i}" for i in range(10)]
+
+        async def run():
+            with patch.object(service, "_fetch_from_external_api", slow_fetch):
+                return await service.get_grades_batch(ids, max_concurrency=10)
+
+        start = time.monotonic()
+        results = asyncio.run(run())
+        elapsed = time.monotonic() - start
+
+        assert [r["student_id"] for r in results] == ids
+        assert all(r["status"] == "ok" for r in results)
+        assert elapsed < 0.5
+
+    def test_batch_reports_per_item_status(self):
+        """Cached, fetched and failed items should be distinguishable"""
+        service = _service(max_retries=0)
+        service.cache.set("STU-cached", ["B"])
+
+        async def fetch(student_id):
+            if student_id == "STU-bad":
+                raise Exception("External API error")
+            return GRADES
+
+        async def run():
+            with patch.object(service, "_fetch_from_external_api", fetch):
+                return await service.get_grades_batch(
+                    ["STU-cached", "STU-new", "STU-bad"]
+                )
+
+        statuses = {r["student_id"]: r["status"] for r in asyncio.run(run())}
+        assert statuses == {
+            "STU-cached": "cached",
+            "STU-new": "ok",
+            "STU-bad": "unavailable",
+        }
+
+    def test_open_breaker_fails_whole_batch_fast(self):
+        """No item should reach upstream once the breaker has opened"""
+        service = _service(max_retries=0)
+        service.circuit_breaker.failure_threshold = 2
+
+        async def run():
+            with patch.object(
+                service, "_fetch_from_external_api", side_effect=Exception("down")
+            ) as fetch:
+                await service.get_grades_batch(["STU-1", "STU-2"], max_concurrency=1)
+                results = await service.get_grades_batch(
+                    [f"STU-{i}" for i in range(3, 50)], max_concurrency=1
+                )
+            return results, fetch.call_count
+
+        results, calls = asyncio.run(run())
+
+        assert calls == 2
+        assert all(r["status"] == "unavailable" for r in results)
@@ -0,0 +1,158 @@
+import random
+import statistics
+import time
+from unittest.mock import patch
+
+import boto3
+import fakeredis
+import pytest
+import redis
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+from pydantic import ValidationError
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.faults import FaultInjector, FaultRule, FaultTarget, faults
+
+
+class TestFaultRule:
+    """Test rule validation and latency sampling"""
+
+    def test_rates_must_leave_room_for_success(self):
+        """Errors and timeouts together can't exceed every call"""
+        with pytest.raises(ValidationError):
+            FaultRule(error_rate=0.6, timeout_rate=0.5)
+
+    def test_latency_follows_median_and_p99(self):
+        """A p99 should give a log-normal tail around the median"""
+        rule = FaultRule(latency_ms=20, p99_latency_ms=200, timeout_seconds=10)
+        random.seed(1)
+        samples = sorted(rule.sample_latency() for _ in range(20000))
+
+        assert statistics.median(samples) == pytest.approx(0.020, rel=0.1)
+        assert samples[int(len(samples) * 0.99)] == pytest.approx(0.200, rel=0.2)
+
+    def test_rule_lifts_after_its_duration(self):
+        """Temporary rules should remove themselves"""
+        injector = FaultInjector(enabled=True)
+        with patch("time.monotonic", return_value=100.0):
+            injector.set(FaultTarget.db, FaultRule(error_rate=1, duration_seconds=5))
+        with patch("time.monotonic", return_value=104.0):
+            assert injector.check(FaultTarget.db) == "error"
+        with patch("time.monotonic", return_value=106.0):
+            assert injector.check(FaultTarget.db) is None
+            assert injector.active() == {}
+
+
+class TestFaultHooks:
+    """Test that faults surface as each client library's own errors"""
+
+    def test_database_errors(self):
+        """SQL statements should fail with an OperationalError"""
+        injector = FaultInjector(enabled=True)
+        engine = injector.instrument_engine(create_engine("sqlite://"))
+        injector.set(FaultTarget.db, FaultRule(error_rate=1))
+
+        with engine.connect() as conn, pytest.raises(OperationalError):
+            conn.execute(text("SELECT 1"))
+
+        injector.clear()
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    def test_disabled_injector_installs_nothing(self):
+        """Without the setting, rules can't reach the engine"""
+        injector = FaultInjector(enabled=False)
+        engine = injector.instrument_engine(create_engine("sqlite://"))
+        injector.set(FaultTarget.db, FaultRule(error_rate=1))
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    def test_redis_timeouts_cover_pipelines(self):
+        """Commands and pipelines should time out like a slow server"""
+        injector = FaultInjector(enabled=True)
+        client = injector.instrument_redis(fakeredis.FakeRedis())
+        injector.set(
+            FaultTarget.redis, FaultRule(timeout_rate=1, timeout_seconds=0.01)
+        )
+
+        with pytest.raises(redis.TimeoutError):
+            client.get("key")
+        with pytest.raises(redis.TimeoutError):
+            client.pipeline().incr("key").execute()
+
+        injector.clear(FaultTarget.redis)
+        assert client.incr("key") == 1
+
+    def test_timeouts_hang_no_longer_than_the_client_would(self):
+        """An injected timeout should last the client's socket timeout"""
+        injector = FaultInjector(enabled=True)
+        client = injector.instrument_redis(fakeredis.FakeRedis(socket_timeout=0.05))
+        injector.set(FaultTarget.redis, FaultRule(timeout_rate=1))
+
+        start = time.monotonic()
+        with pytest.raises(redis.TimeoutError):
+            client.get("key")
+        elapsed = time.monotonic() - start
+
+        assert 0.05 <= elapsed < 1
+        assert FaultRule(timeout_seconds=10).hang_seconds(0.2) == 0.2
+        assert FaultRule(timeout_seconds=0.1).hang_seconds(0.2) == 0.1
+        assert FaultRule().hang_seconds(None) == 5.0
+
+    def test_boto_errors_before_sending(self):
+        """AWS calls should fail as if the endpoint were unreachable"""
+        injector = FaultInjector(enabled=True)
+        sqs = injector.instrument_boto(
+            boto3.client(
+                "sqs",
+                endpoint_url="http://localhost:4566",
+                region_name="us-east-1",
+                aws_access_key_id="test",
+                aws_secret_access_key="test",
+                config=Config(retries={"max_attempts": 1}),
+            )
+        )
+        injector.set(FaultTarget.sqs, FaultRule(error_rate=1))
+
+        with pytest.raises(EndpointConnectionError):
+            sqs.list_queues()
+
+
+class TestAdminFaults:
+    """Test the fault injection admin API"""
+
+    def test_rules_need_the_setting(self, offline_client):
+        """Faults can't be switched on unless the deployment allows it"""
+        with patch.object(faults, "enabled", False):
+            response = offline_client.put(
+                "/api/v1/admin/faults/redis", json={"error_rate": 0.5}
+            )
+
+        assert response.status_code == 403
+
+    def test_set_list_and_clear(self, offline_client):
+        """Rules should be visible until cleared"""
+        with patch.object(faults, "enabled", True):
+            response = offline_client.put(
+                "/api/v1/admin/faults/dynamodb",
+                json={"latency_ms": 50, "p99_latency_ms": 500, "timeout_rate": 0.1},
+            )
+            assert response.status_code == 200
+
+            listed = offline_client.get("/api/v1/admin/faults").json()
+            assert listed["faults"]["dynamodb"]["p99_latency_ms"] == 500
+
+            assert offline_client.delete("/api/v1/admin/faults").status_code == 204
+            assert offline_client.get("/api/v1/admin/faults").json()["faults"] == {}
+
+    def test_unknown_target_is_rejected(self, offline_client):
+        """Only known dependencies can be targeted"""
+        with patch.object(faults, "enabled", True):
+            response = offline_client.put(
+                "/api/v1/admin/faults/kafka", json={"error_rate": 1}
+            )
+
+        assert response.status_code == 422
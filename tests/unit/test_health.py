@@ -1,5 +1,9 @@
+import asyncio
+import time
 from unittest.mock import patch
 
+from app.services.health_service import HealthService, health_service
+
 
 class TestHealthEndpoints:
     """Test health check endpoints - critical for SRE"""
@@ -21,6 +25,7 @@ class TestHealthEndpoints:
         """Readiness should return 503 when database is down"""
         # Mock database connection failure
         mock_session.side_effect = Exception("Database connection failed")
+        asyncio.run(health_service.refresh())
 
         response = client.get("/health/ready")
         assert response.status_code == 503
@@ -45,3 +50,80 @@ class TestHealthEndpoints:
         assert response.headers["content-type"] == "text/plain; charset=utf-8"
         assert "http_requests_total" in response.text
         assert "http_request_duration_seconds" in response.text
+
+
+class TestHealthService:
+    """Test background dependency probing"""
+
+    def test_checks_run_concurrently_with_timeouts(self):
+        """A hanging dependency should time out without delaying the others"""
+        service = HealthService(timeout=0.1)
+        service.register("fast", lambda: None)
+        service.register("hung", lambda: time.sleep(1), critical=False)
+
+        async def timed_refresh():
+            start = time.monotonic()
+            await service.refresh()
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(timed_refresh())
+
+        checks = service.snapshot()["checks"]
+        assert elapsed < 0.5
+        assert checks["fast"]["status"] == "healthy"
+        assert checks["hung"]["status"] == "unhealthy"
+        assert "timed out" in checks["hung"]["error"]
+
+    def test_startup_waits_only_for_critical_checks(self):
+        """A slow optional dependency should not hold up startup"""
+        service = HealthService(timeout=5)
+        service.register("database", lambda: None)
+        service.register("dynamodb", lambda: time.sleep(1), critical=False)
+
+        async def timed_start():
+            start = time.monotonic()
+            await service.start()
+            elapsed = time.monotonic() - start
+            ready = service.is_ready()
+            await service.stop()
+            return elapsed, ready
+
+        elapsed, ready = asyncio.run(timed_start())
+
+        assert elapsed < 0.5
+        assert ready
+
+    def test_results_are_served_from_cache(self):
+        """Reading the snapshot should not run the probes"""
+        calls = []
+        service = HealthService()
+        service.register("database", lambda: calls.append(1))
+
+        asyncio.run(service.refresh())
+        for _ in range(5):
+            service.snapshot()
+            service.is_ready()
+
+        assert calls == [1]
+
+    def test_non_critical_failures_degrade_but_stay_ready(self):
+        """Readiness should only depend on critical checks"""
+        service = HealthService()
+        service.register("database", lambda: None)
+        service.register("redis", lambda: 1 / 0, critical=False)
+
+        asyncio.run(service.refresh())
+
+        assert service.is_ready()
+        assert service.snapshot()["status"] == "degraded"
+
+    def test_stale_results_fail_readiness(self):
+        """Results older than max_staleness shouldn't keep a pod in rotation"""
+        service = HealthService(max_staleness=0.05)
+        service.register("database", lambda: None)
+
+        asyncio.run(service.refresh())
+        assert service.is_ready()
+
+        time.sleep(0.1)
+        assert not service.is_ready()
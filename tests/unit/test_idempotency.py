@@ -0,0 +1,151 @@
+import asyncio
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+from app.services.idempotency_service import (
+    IdempotencyInProgress,
+    IdempotencyKeyReused,
+    IdempotencyService,
+)
+
+
+@pytest.fixture
+def service():
+    """Idempotency service on a fake Redis"""
+    server = fakeredis.FakeServer()
+    with patch(
+        "redis.Redis",
+        lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True),
+    ):
+        service = IdempotencyService(wait_timeout=1, poll_interval=0.01)
+        service.initialise()
+    return service
+
+
+class TestIdempotencyService:
+    """Test claiming keys and replaying stored responses"""
+
+    def test_stored_response_is_replayed(self, service):
+        """A retry should get the first response instead of running again"""
+
+        async def first_then_retry():
+            claim = await service.claim("create", "key-1", {"name": "Ada"})
+            assert not claim.replay
+            await service.complete(claim, 200, {"id": 1})
+            return await service.claim("create", "key-1", {"name": "Ada"})
+
+        retry = asyncio.run(first_then_retry())
+
+        assert retry.replay
+        assert retry.response == {"status_code": 200, "body": {"id": 1}}
+
+    def test_key_reused_with_different_payload_is_rejected(self, service):
+        """The same key must not be used for a different request"""
+
+        async def reuse():
+            claim = await service.claim("create", "key-1", {"name": "Ada"})
+            await service.complete(claim, 200, {"id": 1})
+            await service.claim("create", "key-1", {"name": "Grace"})
+
+        with pytest.raises(IdempotencyKeyReused):
+            asyncio.run(reuse())
+
+    def test_concurrent_duplicate_waits_for_the_first_response(self, service):
+        """A duplicate arriving mid-request should replay, not re-execute"""
+        executions = []
+
+        async def request():
+            claim = await service.claim("create", "key-1", {})
+            if claim.replay:
+                return claim.response["body"]
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            await service.complete(claim, 200, {"id": 1})
+            return {"id": 1}
+
+        async def both():
+            return await asyncio.gather(request(), request())
+
+        assert asyncio.run(both()) == [{"id": 1}, {"id": 1}]
+        assert executions == [1]
+
+    def test_server_errors_release_the_key(self, service):
+        """A 5xx should not be replayed; the retry runs the request again"""
+
+        async def fail_then_retry():
+            claim = await service.claim("create", "key-1", {})
+            await service.complete(claim, 503, {"error": "down"})
+            return await service.claim("create", "key-1", {})
+
+        retry = asyncio.run(fail_then_retry())
+
+        assert not retry.replay
+        assert retry.marker is not None
+
+    def test_duplicate_gives_up_after_wait_timeout(self, service):
+        """A duplicate should not wait forever on a stuck first request"""
+        service.wait_timeout = 0.05
+
+        async def stuck():
+            await service.claim("create", "key-1", {})
+            await service.claim("create", "key-1", {})
+
+        with pytest.raises(IdempotencyInProgress):
+            asyncio.run(stuck())
+
+    def test_requests_run_unprotected_without_redis(self):
+        """A Redis outage should not fail requests"""
+        service = IdempotencyService()
+
+        claim = asyncio.run(service.claim("create", "key-1", {}))
+
+        assert not claim.replay
+        assert claim.marker is None
+
+
+class TestIdempotentCreate:
+    """Test Idempotency-Key on POST /api/v1/students"""
+
+    def test_retry_returns_first_student_without_creating_another(
+        self, offline_client, service
+    ):
+        """Replays should come from Redis, not a second insert"""
+        client = offline_client
+        payload = {"first_name": "Ada", "last_name": "Lovelace", "grade": 10}
+        headers = {"Idempotency-Key": "signup-1"}
+
+        with patch("app.api.students.idempotency_service", service):
+            first = client.post("/api/v1/students", json=payload, headers=headers)
+            retry = client.post("/api/v1/students", json=payload, headers=headers)
+            reused = client.post(
+                "/api/v1/students", json={**payload, "grade": 11}, headers=headers
+            )
+
+        assert first.status_code == 200
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert reused.status_code == 422
+        assert len(client.get("/api/v1/students").json()) == 1
+
+    def test_same_key_from_another_client_is_a_new_request(
+        self, offline_client, service
+    ):
+        """Keys are per client, so another caller's key can't collide"""
+        client = offline_client
+        payload = {"first_name": "Ada", "last_name": "Lovelace", "grade": 10}
+
+        with patch("app.api.students.idempotency_service", service):
+            first = client.post(
+                "/api/v1/students", json=payload, headers={"Idempotency-Key": "k"}
+            )
+            other = client.post(
+                "/api/v1/students",
+                json={**payload, "grade": 11},
+                headers={"Idempotency-Key": "k", "Authorization": "Bearer other"},
+            )
+
+        assert first.status_code == other.status_code == 200
+        assert "Idempotent-Replayed" not in other.headers
+        assert other.json()["student_id"] != first.json()["student_id"]
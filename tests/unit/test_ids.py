@@ -0,0 +1,55 @@
+import time
+from unittest.mock import patch
+
+from app.core.ids import (
+    CROCKFORD,
+    ULIDGenerator,
+    decode,
+    encode,
+    new_student_id,
+    timestamp_ms,
+)
+
+
+class TestStudentIds:
+    """Test time-ordered student ID generation"""
+
+    def test_format_keeps_prefix(self):
+        """IDs should be STU- plus 26 Crockford base32 characters"""
+        student_id = new_student_id()
+
+        assert student_id.startswith("STU-")
+        assert len(student_id) == 30
+        assert set(student_id[4:]) <= set(CROCKFORD)
+
+    def test_ids_sort_in_creation_order(self):
+        """Later IDs should sort after earlier ones, as plain text"""
+        ids = [new_student_id() for _ in range(10000)]
+
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+
+    def test_timestamp_is_embedded(self):
+        """The leading characters should encode the creation time"""
+        before = time.time_ns() // 1_000_000
+        student_id = new_student_id()
+        after = time.time_ns() // 1_000_000
+
+        assert before <= timestamp_ms(student_id[4:]) <= after
+
+    def test_order_holds_when_clock_goes_back(self):
+        """A clock step backwards should not produce a smaller ID"""
+        generator = ULIDGenerator()
+        with patch("time.time_ns", return_value=2_000_000_000_000_000):
+            first = generator.new()
+        with patch("time.time_ns", return_value=1_000_000_000_000_000):
+            second = generator.new()
+
+        assert second > first
+        assert timestamp_ms(second) == timestamp_ms(first)
+
+    def test_encoding_round_trips(self):
+        """Encoding should cover the full 128-bit range losslessly"""
+        for value in (0, 1, 2**80 - 1, 2**128 - 1):
+            assert decode(encode(value)) == value
+        assert encode(2**128 - 1) == "7" + "Z" * 25
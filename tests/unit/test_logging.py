@@ -0,0 +1,82 @@
+import logging
+import queue
+import time
+
+from prometheus_client import REGISTRY
+
+from app.core.logging import (
+    DroppingQueueHandler,
+    RateLimitFilter,
+    SamplingFilter,
+)
+
+
+def record(name: str, level: int = logging.DEBUG) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "message", None, None)
+
+
+def dropped(logger: str, reason: str) -> float:
+    labels = {"logger": logger, "reason": reason}
+    return REGISTRY.get_sample_value("log_records_dropped_total", labels) or 0
+
+
+class TestSamplingFilter:
+    """Test per-logger sampling"""
+
+    def test_keeps_one_in_n_for_configured_loggers(self):
+        """Only the configured share of records should pass"""
+        sampler = SamplingFilter({"app.middleware": 0.1})
+        before = dropped("app.middleware", "sampled")
+
+        records = [record("app.middleware.rate_limiter") for _ in range(100)]
+        kept = sum(sampler.filter(r) for r in records)
+
+        assert kept == 10
+        assert dropped("app.middleware", "sampled") - before == 90
+
+    def test_other_loggers_and_warnings_pass(self):
+        """Unconfigured loggers and warnings should never be sampled"""
+        sampler = SamplingFilter({"app.middleware": 0.0})
+
+        assert sampler.filter(record("app.services.audit_service"))
+        assert sampler.filter(record("app.middleware.rate_limiter", logging.WARNING))
+        assert not sampler.filter(record("app.middleware.rate_limiter"))
+
+
+class TestRateLimitFilter:
+    """Test per-logger rate caps"""
+
+    def test_caps_records_per_second(self):
+        """A burst beyond the rate should be cut off"""
+        limiter = RateLimitFilter({"noisy": 5})
+
+        kept = sum(limiter.filter(record("noisy")) for _ in range(50))
+
+        assert kept == 5
+
+    def test_refills_over_time(self):
+        """Records should pass again once tokens have refilled"""
+        limiter = RateLimitFilter({"noisy": 100})
+        while limiter.filter(record("noisy")):
+            pass
+
+        time.sleep(0.05)
+
+        assert limiter.filter(record("noisy"))
+
+
+class TestDroppingQueueHandler:
+    """Test the non-blocking handoff to the writer thread"""
+
+    def test_full_queue_drops_without_blocking(self):
+        """Logging should never wait for the writer"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        before = dropped("app.test", "queue_full")
+
+        start = time.monotonic()
+        for _ in range(10):
+            handler.handle(record("app.test", logging.INFO))
+
+        assert time.monotonic() - start < 0.1
+        assert handler.queue.qsize() == 1
+        assert dropped("app.test", "queue_full") - before == 9
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from app.core.loop_monitor import UNKNOWN_ROUTE, LoopMonitor, loop_monitor
+
+
+async def blocking_handler():
+    time.sleep(0.15)
+
+
+def _blocks(route: str) -> float:
+    return REGISTRY.get_sample_value("event_loop_blocks_total", {"route": route}) or 0
+
+
+def _run(monitor: LoopMonitor, routes, *stalls):
+    async def run():
+        monitor.start(routes)
+        for stall in stalls:
+            await asyncio.sleep(0.05)
+            await stall()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(run())
+
+
+class TestLoopMonitor:
+    """Test lag sampling and blocked-loop stack capture"""
+
+    def test_blocking_call_is_attributed_to_its_route(self):
+        """A stall inside a handler should capture that handler's stack"""
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        routes = [SimpleNamespace(endpoint=blocking_handler, path="/test/slow")]
+        lag_before = REGISTRY.get_sample_value("event_loop_lag_seconds_count")
+
+        _run(monitor, routes, blocking_handler)
+
+        [stall] = monitor.captures
+        assert stall["route"] == "/test/slow"
+        assert stall["blocked_seconds"] >= 0.05
+        assert "time.sleep(0.15)" in "".join(stall["stack"])
+        assert _blocks("/test/slow") == 1
+        assert REGISTRY.get_sample_value("event_loop_lag_seconds_count") > lag_before
+
+    def test_stacks_are_rate_limited_per_route(self):
+        """Repeat stalls should be counted but captured once per interval"""
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        routes = [SimpleNamespace(endpoint=blocking_handler, path="/test/repeat")]
+
+        _run(monitor, routes, blocking_handler, blocking_handler)
+
+        assert len(monitor.captures) == 1
+        assert _blocks("/test/repeat") == 2
+
+    def test_stall_outside_handlers(self):
+        """Stalls with no known handler on the stack go to `unknown`"""
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        before = _blocks(UNKNOWN_ROUTE)
+
+        _run(monitor, [], blocking_handler)
+
+        assert monitor.captures[0]["route"] == UNKNOWN_ROUTE
+        assert _blocks(UNKNOWN_ROUTE) == before + 1
+
+
+class TestAdminLoopStalls:
+    """Test serving captured stacks over the admin API"""
+
+    def test_stacks_are_not_served_by_default(self, offline_client):
+        """Stacks expose code paths, so serving them has to be switched on"""
+        response = offline_client.get("/api/v1/admin/loop/stalls")
+
+        assert response.status_code == 403
+
+    def test_stacks_are_served_when_enabled(self, offline_client):
+        """With the setting on, captured stacks should be listed"""
+        with patch.object(loop_monitor, "serve_stacks", True):
+            response = offline_client.get("/api/v1/admin/loop/stalls")
+
+        assert response.status_code == 200
+        assert response.json()["stalls"] == list(loop_monitor.captures)
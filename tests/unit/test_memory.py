@@ -0,0 +1,110 @@
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.rate_limits import RateLimits
+from app.services.memory_service import MemoryService, NotTracingError, memory_service
+
+
+@pytest.fixture
+def memory():
+    """Memory service whose allocation tracing is always stopped afterwards"""
+    service = MemoryService(max_snapshots=2)
+    yield service
+    tracemalloc.stop()
+
+
+@pytest.fixture
+def profiling():
+    """Memory profiling switched on for the admin API"""
+    with patch.object(memory_service, "enabled", True):
+        yield
+
+
+def _live(structure: str) -> float:
+    return REGISTRY.get_sample_value(
+        "memory_live_objects", {"structure": structure}
+    )
+
+
+class TestMemoryService:
+    """Test allocation snapshots and live object counts"""
+
+    def test_snapshots_need_tracing(self, memory):
+        """Snapshots can't be taken while tracing is off"""
+        with pytest.raises(NotTracingError):
+            memory.take_snapshot()
+
+    def test_diff_points_at_the_growing_line(self, memory):
+        """The line that allocated between snapshots should top the diff"""
+        memory.start_tracing()
+        base = memory.take_snapshot()["id"]
+        leak = [bytearray(1024) for _ in range(1000)]
+        current = memory.take_snapshot()["id"]
+
+        [top] = memory.diff(current, base, limit=1)
+
+        assert len(leak) == 1000
+        assert top["location"].startswith(__file__)
+        assert top["size_diff_bytes"] >= 1024 * 1000
+        assert top["count_diff"] >= 1000
+
+    def test_oldest_snapshot_is_evicted(self, memory):
+        """Only `max_snapshots` snapshots should be held"""
+        memory.start_tracing()
+        first = memory.take_snapshot()["id"]
+        memory.take_snapshot()
+        memory.take_snapshot()
+
+        with pytest.raises(KeyError):
+            memory.top(first)
+        assert len(memory.status()["snapshots"]) == 2
+
+    def test_live_object_counts(self, memory):
+        """Gauges should follow the structures they watch"""
+        memory.register_metrics()
+        before = _live("rate_limiter_buckets")
+
+        with patch.dict(RateLimits.SEARCH._memory_store, {"k": {}}):
+            assert _live("rate_limiter_buckets") == before + 1
+
+
+class TestAdminMemory:
+    """Test the memory profiling admin API"""
+
+    def test_profiling_needs_the_setting(self, offline_client):
+        """Tracing and snapshots can't be used unless the deployment allows it"""
+        tracing = offline_client.post("/api/v1/admin/memory/tracing")
+        snapshot = offline_client.post("/api/v1/admin/memory/snapshots")
+
+        assert tracing.status_code == snapshot.status_code == 403
+        assert not tracemalloc.is_tracing()
+
+    def test_snapshot_and_diff(self, offline_client, profiling):
+        """Tracing, two snapshots and a diff should work end to end"""
+        try:
+            offline_client.post("/api/v1/admin/memory/tracing?frames=2")
+            base = offline_client.post("/api/v1/admin/memory/snapshots").json()
+            current = offline_client.post("/api/v1/admin/memory/snapshots").json()
+
+            top = offline_client.get(
+                f"/api/v1/admin/memory/snapshots/{current['id']}?group_by=filename"
+            )
+            diff = offline_client.get(
+                f"/api/v1/admin/memory/snapshots/{current['id']}/diff/{base['id']}"
+            )
+            missing = offline_client.get("/api/v1/admin/memory/snapshots/0")
+        finally:
+            offline_client.delete("/api/v1/admin/memory/tracing")
+
+        assert top.status_code == 200 and top.json()
+        assert diff.status_code == 200
+        assert missing.status_code == 404
+
+    def test_snapshot_without_tracing_conflicts(self, offline_client, profiling):
+        """Asking for a snapshot with tracing off is a 409"""
+        response = offline_client.post("/api/v1/admin/memory/snapshots")
+
+        assert response.status_code == 409
@@ -0,0 +1,95 @@
+import asyncio
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+import redis
+
+from app.services.metering_service import OVERFLOW_CLIENT, MeteringService
+
+
+@pytest.fixture
+def metering():
+    """Metering service on a fake Redis"""
+    server = fakeredis.FakeServer()
+    with patch(
+        "redis.Redis",
+        lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True),
+    ):
+        service = MeteringService()
+        service.initialise()
+    return service
+
+
+class TestMeteringService:
+    """Test local counting and batched flushes"""
+
+    def test_requests_are_aggregated_per_client_and_route(self, metering):
+        """Repeat requests should bump one set of counters"""
+        metering.record("10.0.0.1", "/api/v1/students", 100, 200, 0.5)
+        metering.record("10.0.0.1", "/api/v1/students", 50, 300, 0.25)
+        metering.record("10.0.0.2", "/api/v1/students", 0, 10, 0.1)
+
+        assert metering._counters[("10.0.0.1", "/api/v1/students")] == [
+            2,
+            150,
+            500,
+            0.75,
+        ]
+        assert len(metering._counters) == 2
+
+    def test_flush_feeds_top_talkers_and_distinct_clients(self, metering):
+        """Flushed usage should be queryable from Redis"""
+        for _ in range(3):
+            metering.record("10.0.0.1", "/api/v1/students", 10, 100, 0.1)
+        metering.record("10.0.0.1", "/api/v1/students/{student_id}", 0, 50, 0.1)
+        metering.record("10.0.0.2", "/api/v1/students", 10, 100, 0.1)
+
+        asyncio.run(metering.flush())
+
+        assert metering._counters == {}
+        assert metering.distinct_clients() == 2
+        first, second = metering.top_talkers()
+        assert (first["client"], first["requests"]) == ("10.0.0.1", 4)
+        assert (first["bytes_in"], first["bytes_out"]) == (30, 350)
+        assert first["routes"]["/api/v1/students"]["requests"] == 3
+        assert (second["client"], second["requests"]) == ("10.0.0.2", 1)
+
+    def test_failed_flush_keeps_counters_for_the_next_one(self, metering):
+        """A Redis outage should delay usage, not lose it"""
+        metering.record("10.0.0.1", "/api/v1/students", 10, 100, 0.1)
+
+        with patch.object(
+            metering, "_send", side_effect=redis.ConnectionError("down")
+        ):
+            asyncio.run(metering.flush())
+        metering.record("10.0.0.1", "/api/v1/students", 10, 100, 0.1)
+        asyncio.run(metering.flush())
+
+        [talker] = metering.top_talkers()
+        assert talker["requests"] == 2
+
+    def test_usage_is_credited_to_the_day_it_was_recorded(self, metering):
+        """Requests just before midnight shouldn't count for the next day"""
+        metering._day = "2000-01-01"
+        metering.record("10.0.0.1", "/api/v1/students", 10, 100, 0.1)
+        metering._day_ends = 0  # midnight passes before the flush
+
+        metering.record("10.0.0.1", "/api/v1/students", 10, 100, 0.1)
+        metering.record("10.0.0.1", "/api/v1/students", 10, 100, 0.1)
+        asyncio.run(metering.flush())
+
+        [yesterday] = metering.top_talkers(day="2000-01-01")
+        [today] = metering.top_talkers()
+        assert yesterday["requests"] == 1
+        assert today["requests"] == 2
+
+    def test_client_keys_are_bounded(self):
+        """Clients beyond max_keys should be pooled, not grow memory"""
+        metering = MeteringService(max_keys=2)
+
+        for n in range(5):
+            metering.record(f"10.0.0.{n}", "/api/v1/students", 0, 0, 0.1)
+
+        assert len(metering._counters) == 3
+        assert metering._counters[(OVERFLOW_CLIENT, "/api/v1/students")][0] == 3
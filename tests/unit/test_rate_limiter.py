@@ -0,0 +1,95 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from app.middleware import rate_limiter
+from app.middleware.rate_limiter import RateLimiter, RateLimitMiddleware
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_redis(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_shared_redis", None)
+    monkeypatch.setattr(rate_limiter, "_next_attempt", 0.0)
+    monkeypatch.setattr(rate_limiter, "_retry_delay", rate_limiter.RETRY_MIN)
+
+
+def wait_for_connect():
+    """Wait for a background connection attempt to finish"""
+    deadline = time.monotonic() + 5
+    while rate_limiter._connecting and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestSharedRedis:
+    """Test that limiters share one Redis connection"""
+
+    @patch("redis.Redis")
+    def test_limiters_share_one_client(self, mock_redis):
+        """Every limiter should reuse one client, pinged once"""
+        limiters = [RateLimiter(), RateLimiter(rate=5), RateLimiter(rate=2)]
+        for limiter in limiters:
+            limiter.initialise()
+
+        mock_redis.assert_called_once()
+        mock_redis.return_value.ping.assert_called_once()
+        client = mock_redis.return_value
+        assert all(limiter.redis_client is client for limiter in limiters)
+
+    @patch("redis.Redis")
+    def test_middleware_connects_lazily(self, mock_redis):
+        """Building the middleware stack should not touch Redis"""
+        middleware = RateLimitMiddleware(None, RateLimiter())
+        middleware.add_endpoint_limit("/api/v1/students", RateLimiter(rate=10))
+
+        mock_redis.assert_not_called()
+
+    @patch("redis.Redis")
+    def test_redis_down_falls_back_to_memory(self, mock_redis):
+        """Limits should still apply in memory when Redis is unreachable"""
+        mock_redis.return_value.ping.side_effect = ConnectionError("down")
+        limiter = RateLimiter(rate=2, per=60, burst=2)
+
+        results = [limiter.check_rate_limit("10.0.0.1", "/x")[0] for _ in range(3)]
+
+        assert limiter.redis_client is None
+        assert results == [True, True, False]
+
+    @patch("redis.Redis")
+    def test_requests_never_wait_on_a_connect(self, mock_redis):
+        """A limiter's first request should connect in the background"""
+        callers = []
+        mock_redis.return_value.ping.side_effect = lambda: callers.append(
+            threading.current_thread()
+        )
+        mock_redis.return_value.get.return_value = None
+        limiter = RateLimiter()
+
+        limiter.check_rate_limit("10.0.0.1", "/x")
+        wait_for_connect()
+
+        assert callers and threading.current_thread() not in callers
+
+    @patch("redis.Redis")
+    def test_redis_starting_late_is_picked_up(self, mock_redis, monkeypatch):
+        """Limiters should retry, with a backoff, until Redis comes up"""
+        mock_redis.return_value.ping.side_effect = ConnectionError("down")
+        mock_redis.return_value.get.return_value = None
+        limiter = RateLimiter()
+        limiter.check_rate_limit("10.0.0.1", "/x")
+        wait_for_connect()
+
+        # still backing off: no new attempt
+        limiter.check_rate_limit("10.0.0.1", "/x")
+        assert mock_redis.return_value.ping.call_count == 1
+        assert rate_limiter._retry_delay == 2 * rate_limiter.RETRY_MIN
+
+        mock_redis.return_value.ping.side_effect = None
+        monkeypatch.setattr(rate_limiter, "_next_attempt", 0.0)
+        limiter.check_rate_limit("10.0.0.1", "/x")  # retries in the background
+        wait_for_connect()
+        limiter.check_rate_limit("10.0.0.1", "/x")
+
+        assert limiter.redis_client is mock_redis.return_value
+        assert rate_limiter._retry_delay == rate_limiter.RETRY_MIN
@@ -1,6 +1,20 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
 from unittest.mock import Mock, patch
 
+import boto3
+import fakeredis
+import pytest
+import redis
+from moto import mock_dynamodb
+
+from app.core.tracing import correlation_id_var
+from app.services.audit_service import AuditService, _encode_cursor
 from app.services.cache_service import CacheService
+from app.services.spool import DiskSpool
 from app.services.sqs_service import SQSService
 
 
@@ -39,6 +53,145 @@ class TestCacheService:
         assert '"data": "value"' in call_args[0][2]
 
 
+@pytest.fixture
+def cache_pair():
+    """Two workers' cache services sharing one (fake) Redis"""
+    server = fakeredis.FakeServer()
+    with patch(
+        "redis.Redis",
+        lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True),
+    ):
+        caches = [CacheService(), CacheService()]
+        for cache in caches:
+            cache.initialise()
+    yield caches
+    for cache in caches:
+        cache.shutdown()
+
+
+class TestTwoTierCache:
+    """Test the local tier, invalidation and the decorator"""
+
+    def test_local_tier_serves_repeat_reads(self, cache_pair):
+        """Hot keys should be served without a Redis round trip"""
+        cache, _ = cache_pair
+        cache.set("key", {"n": 1})
+
+        with patch.object(cache.redis_client, "get") as redis_get:
+            assert cache.get("key") == {"n": 1}
+            redis_get.assert_not_called()
+
+    def test_redis_hits_fill_the_local_tier(self, cache_pair):
+        """A value written by another worker should be fetched once"""
+        writer, reader = cache_pair
+        writer.set("key", [1, 2])
+
+        assert reader.get("key") == [1, 2]
+        assert reader.local.get("key") == [1, 2]
+
+    def test_writes_invalidate_other_workers(self, cache_pair):
+        """Other workers should drop their local copy on a write"""
+        writer, reader = cache_pair
+        writer.set("key", "old")
+        assert reader.get("key") == "old"
+
+        writer.set("key", "new")
+        deadline = time.monotonic() + 5
+        while reader.local.get("key") == "old" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert reader.get("key") == "new"
+
+    def test_local_tier_is_bounded(self):
+        """The in-process tier should evict least recently used keys"""
+        cache = CacheService(local_max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+
+        assert len(cache.local) == 2
+        assert cache.get("a") is None
+
+    def test_default_ttl_is_jittered(self):
+        """Default TTLs should be spread so keys don't expire together"""
+        cache = CacheService(default_ttl=300, ttl_jitter=0.1)
+        cache.redis_client = Mock()
+
+        for i in range(20):
+            cache.set(f"key-{i}", i)
+
+        ttls = {call.args[1] for call in cache.redis_client.setex.call_args_list}
+        assert len(ttls) > 1
+        assert all(270 <= ttl <= 330 for ttl in ttls)
+
+    def test_missing_records_are_negatively_cached(self, cache_pair):
+        """A loader returning None should not be called again straight away"""
+        cache, _ = cache_pair
+        loader = Mock(return_value=None)
+
+        assert cache.get_or_load("student:404", loader) is None
+        assert cache.get_or_load("student:404", loader) is None
+        loader.assert_called_once()
+        assert 0 < cache.redis_client.ttl("student:404") <= 33
+
+    def test_decorator_caches_and_invalidates(self, cache_pair):
+        """Decorated functions should be cached per arguments"""
+        cache, _ = cache_pair
+        calls = []
+
+        @cache.cached(ttl=60)
+        def lookup(student_id):
+            calls.append(student_id)
+            return {"id": student_id}
+
+        assert lookup("s1") == {"id": "s1"}
+        assert lookup("s1") == {"id": "s1"}
+        assert lookup("s2") == {"id": "s2"}
+        assert calls == ["s1", "s2"]
+
+        lookup.invalidate("s1")
+        lookup("s1")
+        assert calls == ["s1", "s2", "s1"]
+
+    def test_decorator_supports_async_functions(self, cache_pair):
+        """Async service functions should be cached too"""
+        cache, _ = cache_pair
+        calls = []
+
+        @cache.cached()
+        async def lookup(student_id):
+            calls.append(student_id)
+            return [student_id]
+
+        async def scenario():
+            return [await lookup("s1"), await lookup("s1")]
+
+        assert asyncio.run(scenario()) == [["s1"], ["s1"]]
+        assert calls == ["s1"]
+
+    def test_redis_outage_is_a_miss(self):
+        """Redis errors should never reach the caller"""
+        cache = CacheService()
+        cache.redis_client = Mock()
+        cache.redis_client.get.side_effect = redis.ConnectionError("down")
+        cache.redis_client.setex.side_effect = redis.ConnectionError("down")
+
+        cache.set("key", 1)
+        assert cache.get("key") == 1  # still served locally
+        assert cache.get("other") is None
+
+    def test_values_that_dont_round_trip_are_misses(self, cache_pair):
+        """Unserialisable values and corrupt payloads should never raise"""
+        cache, other = cache_pair
+        cache.set("key", 1)
+
+        cache.set("key", {1, 2})  # a set isn't JSON
+        cache.redis_client.set("corrupt", "{not json")
+
+        assert cache.get("key") is None
+        assert other.get("key") is None
+        assert other.get("corrupt") is None
+
+
 class TestSQSService:
     """Test message queue functionality"""
 
@@ -70,3 +223,290 @@ class TestSQSService:
         result = sqs_service.send_event("test_event", {"key": "value"})
 
         assert not result  # Should return False, not raise
+
+    @patch("boto3.client")
+    def test_sqs_failed_event_is_spooled(self, mock_boto_client, tmp_path):
+        """Events SQS rejects should be kept on disk for replay"""
+        mock_sqs = Mock()
+        mock_sqs.send_message.side_effect = Exception("SQS Error")
+        mock_boto_client.return_value = mock_sqs
+
+        spool = DiskSpool("sqs", str(tmp_path))
+        sqs_service = SQSService(spool=spool)
+        sqs_service.initialise()
+
+        assert not sqs_service.send_event("test_event", {"key": "value"})
+        sqs_service.shutdown()
+
+        records, _ = spool.read_batch(10)
+        assert records[0]["event_type"] == "test_event"
+        assert records[0]["data"] == {"key": "value"}
+
+    @patch("boto3.client")
+    def test_sqs_replay_commits_each_delivered_batch(self, mock_boto_client, tmp_path):
+        """A failed SendMessageBatch shouldn't resend batches already delivered"""
+        mock_sqs = Mock()
+        mock_sqs.send_message_batch.side_effect = [{}, Exception("SQS Error"), {}]
+        mock_boto_client.return_value = mock_sqs
+        spool = DiskSpool("sqs", str(tmp_path))
+        for n in range(20):
+            spool.append({"n": n})
+        sqs_service = SQSService(spool=spool, replay_interval=3600)
+        sqs_service.initialise()
+
+        assert sqs_service.replayer.replay_once() == 10
+        assert sqs_service.replayer.replay_once() == 10
+        sqs_service.shutdown()
+
+        sent = [
+            json.loads(entry["MessageBody"])["n"]
+            for call in mock_sqs.send_message_batch.call_args_list
+            for entry in call[1]["Entries"]
+        ]
+        assert sent == list(range(10)) + list(range(10, 20)) * 2
+
+    @patch("boto3.client")
+    def test_sqs_message_carries_correlation_id(self, mock_boto_client):
+        """Events should carry the correlation ID of the current request"""
+        mock_sqs = Mock()
+        mock_boto_client.return_value = mock_sqs
+        sqs_service = SQSService()
+        sqs_service.initialise()
+
+        token = correlation_id_var.set("req-42")
+        try:
+            sqs_service.send_event("test_event", {"key": "value"})
+        finally:
+            correlation_id_var.reset(token)
+
+        body = json.loads(mock_sqs.send_message.call_args[1]["MessageBody"])
+        assert body["correlation_id"] == "req-42"
+
+    @patch("boto3.client")
+    def test_sqs_async_send_spools_off_the_loop(self, mock_boto_client, tmp_path):
+        """Async callers shouldn't pay for the spool's disk writes on the loop"""
+        mock_sqs = Mock()
+        mock_sqs.send_message.side_effect = Exception("SQS Error")
+        mock_boto_client.return_value = mock_sqs
+        spool = DiskSpool("sqs", str(tmp_path))
+        sqs_service = SQSService(spool=spool)
+        sqs_service.initialise()
+        append = spool.append
+        threads = []
+
+        def recording_append(record):
+            threads.append(threading.get_ident())
+            return append(record)
+
+        async def send():
+            correlation_id_var.set("req-43")
+            return await sqs_service.send_event_async("test_event", {})
+
+        with patch.object(spool, "append", recording_append):
+            assert not asyncio.run(send())
+        sqs_service.shutdown()
+
+        records, _ = spool.read_batch(10)
+        assert threads and threads[0] != threading.get_ident()
+        assert records[0]["correlation_id"] == "req-43"
+
+
+class TestAuditService:
+    """Test buffered audit writes"""
+
+    def _service(self, **kwargs):
+        service = AuditService(flush_interval=0.01, **kwargs)
+        service.table = Mock()
+        service.table.meta.client.batch_write_item.return_value = {
+            "UnprocessedItems": {}
+        }
+        return service
+
+    def test_log_action_writes_in_batches_of_25(self):
+        """Queued records should be flushed with BatchWriteItem, 25 at a time"""
+        service = self._service()
+        for i in range(30):
+            service.log_action("student_created", {"n": i})
+
+        service._start_worker()
+        service.flush()
+        service.shutdown()
+
+        calls = service.table.meta.client.batch_write_item.call_args_list
+        sizes = [len(c[1]["RequestItems"]["sre-playground-audit"]) for c in calls]
+        assert sizes == [25, 5]
+
+    def test_unprocessed_items_are_retried(self):
+        """UnprocessedItems should be resubmitted until DynamoDB accepts them"""
+        service = self._service()
+        batch_write = service.table.meta.client.batch_write_item
+        leftover = {"PutRequest": {"Item": {"id": "1"}}}
+        batch_write.side_effect = [
+            {"UnprocessedItems": {"sre-playground-audit": [leftover]}},
+            {"UnprocessedItems": {}},
+        ]
+
+        service.log_action("student_created", {})
+        service.log_action("student_created", {})
+        service._start_worker()
+        service.flush()
+        service.shutdown()
+
+        assert batch_write.call_count == 2
+        retried = batch_write.call_args[1]["RequestItems"]["sre-playground-audit"]
+        assert retried == [leftover]
+
+    def test_failed_batches_are_spooled(self, tmp_path):
+        """Batches DynamoDB rejects should be spooled rather than lost"""
+        spool = DiskSpool("audit", str(tmp_path))
+        service = self._service(spool=spool)
+        service.table.meta.client.batch_write_item.side_effect = Exception("down")
+
+        service.log_action("student_created", {"student_id": "STU-1"})
+        service._start_worker()
+        service.flush()
+
+        records, _ = spool.read_batch(10)
+        assert records[0]["details"] == {"student_id": "STU-1"}
+        service.shutdown()
+
+    def test_full_queue_drops_records(self):
+        """The drop policy should never block the caller"""
+        service = self._service(max_queue_size=1, full_policy="drop")
+
+        service.log_action("student_created", {})
+        service.log_action("student_created", {})
+
+        assert service._queue.qsize() == 1
+
+    def test_records_carry_correlation_id(self):
+        """Records logged during a request should carry its correlation ID"""
+        service = self._service()
+
+        token = correlation_id_var.set("req-42")
+        try:
+            service.log_action("student_created", {})
+        finally:
+            correlation_id_var.reset(token)
+        service.log_action("student_created", {})
+
+        first, second = service._queue.get(), service._queue.get()
+        assert first["correlation_id"] == "req-42"
+        assert "correlation_id" not in second
+
+
+class TestAuditQuery:
+    """Test audit trail queries against moto's DynamoDB"""
+
+    @pytest.fixture
+    def audit(self):
+        with mock_dynamodb():
+            service = AuditService()
+            service.dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+            service.create_table()
+
+            records = [
+                ("2025-01-01T10:00:00", "student_created"),
+                ("2025-01-01T11:00:00", "student_deleted"),
+                ("2025-01-01T12:00:00", "student_created"),
+                ("2025-01-02T09:00:00", "student_created"),
+                ("2025-01-03T09:00:00", "student_created"),
+            ]
+            for i, (timestamp, action) in enumerate(records):
+                service.table.put_item(
+                    Item={
+                        "id": str(i),
+                        "timestamp": timestamp,
+                        "day": timestamp[:10],
+                        "action": action,
+                        "details": {},
+                    }
+                )
+            yield service
+
+    def test_query_by_action_and_time_range(self, audit):
+        """Action queries should only return matching records in range"""
+        result = audit.query(
+            action="student_created",
+            start=datetime(2025, 1, 1),
+            end=datetime(2025, 1, 2, 23),
+        )
+
+        assert [i["timestamp"] for i in result["items"]] == [
+            "2025-01-01T10:00:00",
+            "2025-01-01T12:00:00",
+            "2025-01-02T09:00:00",
+        ]
+        assert result["next_cursor"] is None
+
+    def test_query_time_range_pages_across_days(self, audit):
+        """Cursor should resume where the previous page stopped"""
+        start, end = datetime(2025, 1, 1, 10, 30), datetime(2025, 1, 3, 23)
+
+        seen = []
+        cursor = None
+        while True:
+            page = audit.query(start=start, end=end, limit=2, cursor=cursor)
+            seen.extend(i["id"] for i in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        assert seen == ["1", "2", "3", "4"]
+
+    def test_query_rejects_bad_cursor(self, audit):
+        """Garbage cursors should surface as ValueError"""
+        with pytest.raises(ValueError):
+            audit.query(cursor="not-a-cursor")
+
+    @pytest.mark.parametrize(
+        "state",
+        [
+            5,
+            [],
+            {"partition": "0"},
+            {"partition": -1},
+            {"partition": 0, "key": "id"},
+            {"partition": 0, "key": {"bogus": "x"}},
+            {"partition": 0, "key": {"id": "1", "timestamp": 5, "day": "x"}},
+            {
+                "partition": 0,
+                "key": {"id": "1", "timestamp": "2025-01-01T10:00:00", "day": "x"},
+            },
+        ],
+    )
+    def test_query_rejects_malformed_cursor_state(self, audit, state):
+        """Decodable cursors of the wrong shape shouldn't reach DynamoDB"""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            audit.query(
+                start=datetime(2025, 1, 1),
+                end=datetime(2025, 1, 2),
+                cursor=_encode_cursor(state),
+            )
+
+    def test_export_streams_every_record(self, audit):
+        """Export should yield every record in the table"""
+        ids = {item["id"] for item in audit.export(total_segments=1)}
+        assert ids == {"0", "1", "2", "3", "4"}
+
+    def test_export_scans_segments_in_parallel(self):
+        """Each segment should be scanned and paged independently"""
+        service = AuditService()
+        service.table = Mock()
+
+        def scan(**params):
+            segment = params["Segment"]
+            if "ExclusiveStartKey" not in params:
+                return {
+                    "Items": [{"id": f"{segment}-a"}],
+                    "LastEvaluatedKey": {"id": f"{segment}-a"},
+                }
+            return {"Items": [{"id": f"{segment}-b"}]}
+
+        service.table.scan.side_effect = scan
+
+        ids = sorted(item["id"] for item in service.export(total_segments=3))
+
+        assert ids == ["0-a", "0-b", "1-a", "1-b", "2-a", "2-b"]
+        segments = {c[1]["TotalSegments"] for c in service.table.scan.call_args_list}
+        assert segments == {3}
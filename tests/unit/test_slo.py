@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.services.slo_service import LatencySketch, SLOService
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch("app.services.slo_service.time.monotonic", clock):
+        yield clock
+
+
+class TestLatencySketch:
+    """Test the mergeable quantile sketch"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Quantiles should be within the configured relative error"""
+        sketch = LatencySketch(relative_accuracy=0.01)
+        values = [i / 1000 for i in range(1, 1001)]  # 1ms..1s
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.99):
+            expected = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(expected, rel=0.02)
+
+    def test_merge_equals_single_sketch(self):
+        """Merging sketches should give the same answer as one big sketch"""
+        whole, left, right = LatencySketch(), LatencySketch(), LatencySketch()
+        for i in range(1, 501):
+            whole.add(i / 100)
+            (left if i % 2 else right).add(i / 100)
+
+        left.merge(right)
+
+        assert left.count == whole.count
+        assert left.quantile(0.99) == whole.quantile(0.99)
+
+    def test_bucket_count_is_bounded(self):
+        """Memory should stay fixed however wide the value range"""
+        sketch = LatencySketch(max_buckets=64)
+        for i in range(1, 10000):
+            sketch.add(i / 1000)
+
+        assert len(sketch.buckets) <= 64
+        assert sketch.count == 9999
+
+
+class TestSLOService:
+    """Test the streaming SLI engine"""
+
+    def test_availability_counts_server_errors(self, clock):
+        """Only 5xx responses should burn the availability budget"""
+        slo = SLOService(availability_target=0.99)
+        for i in range(100):
+            slo.record(0.01, 500 if i < 2 else 404 if i < 10 else 200)
+
+        assert slo.sli("availability", "5m") == pytest.approx(0.98)
+        assert slo.burn_rate("availability", "5m") == pytest.approx(2.0)
+
+    def test_latency_sli_uses_threshold(self, clock):
+        """Requests over the threshold should count against the latency SLO"""
+        slo = SLOService(latency_target=0.9, latency_threshold=0.3)
+        for i in range(10):
+            slo.record(0.5 if i == 0 else 0.1, 200)
+
+        assert slo.sli("latency", "5m") == pytest.approx(0.9)
+        assert slo.burn_rate("latency", "5m") == pytest.approx(1.0)
+
+    def test_old_requests_leave_short_windows(self, clock):
+        """Buckets should expire from each window as time moves on"""
+        slo = SLOService()
+        slo.record(0.01, 500)
+        clock.now += 301
+        slo.record(0.01, 200)
+
+        assert slo.sli("availability", "5m") == 1.0
+        assert slo.sli("availability", "30m") == pytest.approx(0.5)
+
+    def test_long_idle_resets_everything(self, clock):
+        """An idle gap longer than every window should clear all state"""
+        slo = SLOService()
+        slo.record(0.01, 500)
+        clock.now += 6 * 3600 + 1
+
+        assert slo.sli("availability", "6h") is None
+        assert slo.burn_rate("availability", "6h") == 0.0
+        assert slo.error_budget_remaining("availability") == 1.0
+
+    def test_fast_burn_needs_both_windows(self, clock):
+        """A fast burn should page only when the 1h and 5m windows agree"""
+        slo = SLOService(availability_target=0.999)
+        for _ in range(50):
+            slo.record(0.01, 500)
+        for _ in range(50):
+            slo.record(0.01, 200)
+
+        assert slo.status()["availability"]["fast_burn"] is True
+
+        # the errors age out of the 5m window but stay in the 1h one
+        clock.now += 301
+        slo.record(0.01, 200)
+        assert slo.status()["availability"]["fast_burn"] is False
+
+    def test_latency_quantiles_over_recent_minutes(self, clock):
+        """Quantiles should merge only the requested minutes"""
+        slo = SLOService()
+        for _ in range(100):
+            slo.record(2.0, 200)
+        clock.now += 600
+        for _ in range(100):
+            slo.record(0.1, 200)
+
+        assert slo.latency_quantile(0.99, minutes=5) == pytest.approx(0.1, rel=0.02)
+        assert slo.latency_quantile(0.99, minutes=15) == pytest.approx(2.0, rel=0.02)
+
+    def test_window_totals_survive_gaps_of_any_length(self, clock):
+        """Running totals should match a recount after short and long gaps"""
+        slo = SLOService()
+        events = []
+        for gap in (0, 1, 7, 299, 300, 1799, 3601, 5, 21599, 2, 21000):
+            clock.now += gap
+            status = 500 if gap % 2 else 200
+            slo.record(0.01, status)
+            events.append((clock.now, status))
+
+            for name, seconds in (("5m", 300), ("1h", 3600), ("6h", 21600)):
+                recent = [s for t, s in events if clock.now - t < seconds]
+                good = sum(s == 200 for s in recent) / len(recent)
+                assert slo.sli("availability", name) == pytest.approx(good)
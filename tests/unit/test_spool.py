@@ -0,0 +1,115 @@
+import pytest
+
+from app.services.spool import DiskSpool, SpoolReplayer
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = DiskSpool("test", str(tmp_path), fsync_batch=1)
+    yield spool
+    spool.close()
+
+
+class TestDiskSpool:
+    """Test the local outage spool"""
+
+    def test_records_round_trip_in_order(self, spool):
+        """Records should be read back in the order they were appended"""
+        for i in range(5):
+            assert spool.append({"n": i})
+
+        records, offset = spool.read_batch(3)
+        assert records == [{"n": 0}, {"n": 1}, {"n": 2}]
+
+        spool.commit(offset)
+        records, _ = spool.read_batch(10)
+        assert records == [{"n": 3}, {"n": 4}]
+
+    def test_drained_spool_is_truncated(self, spool):
+        """Disk space should be reclaimed once everything is replayed"""
+        spool.append({"n": 1})
+        _, offset = spool.read_batch(10)
+        spool.commit(offset)
+
+        assert spool.path.stat().st_size == 0
+        assert spool.pending_bytes() == 0
+
+    def test_full_spool_drops_records(self, tmp_path):
+        """Disk usage should be bounded by max_bytes"""
+        spool = DiskSpool("small", str(tmp_path), max_bytes=64)
+
+        assert spool.append({"n": 1})
+        assert not spool.append({"padding": "x" * 64})
+        spool.close()
+
+    def test_replayed_records_dont_count_towards_the_cap(self, tmp_path):
+        """Steady inflow with partial replay should compact, not drop"""
+        spool = DiskSpool("steady", str(tmp_path), max_bytes=200)
+        spool.append({"n": 0})
+
+        # one record stays pending throughout, so the file never fully drains
+        for i in range(1, 50):
+            assert spool.append({"n": i})
+            _, offset = spool.read_batch(1)
+            spool.commit(offset)
+
+        assert spool.path.stat().st_size <= 200
+        spool.close()
+        reopened = DiskSpool("steady", str(tmp_path))
+        assert reopened.read_batch(10)[0] == [{"n": 49}]
+        reopened.close()
+
+    def test_read_position_survives_restart(self, spool, tmp_path):
+        """Replayed records should not be replayed again after a restart"""
+        spool.append({"n": 1})
+        spool.append({"n": 2})
+        _, offset = spool.read_batch(1)
+        spool.commit(offset)
+        spool.close()
+
+        reopened = DiskSpool("test", str(tmp_path))
+        records, _ = reopened.read_batch(10)
+        assert records == [{"n": 2}]
+        reopened.close()
+
+    def test_torn_tail_is_discarded(self, spool):
+        """A partially written record should be cut off, not replayed"""
+        spool.append({"n": 1})
+        spool.close()
+        with open(spool.path, "ab") as f:
+            f.write(b"\x00\x00\x00\x10garbage")
+
+        records, _ = spool.read_batch(10)
+        assert records == [{"n": 1}]
+        assert spool.append({"n": 2})
+        records, _ = spool.read_batch(10)
+        assert records == [{"n": 1}, {"n": 2}]
+
+
+class TestSpoolReplayer:
+    """Test draining the spool"""
+
+    def test_replay_sends_batches_and_commits(self, spool):
+        """Successful batches should be removed from the spool"""
+        for i in range(5):
+            spool.append({"n": i})
+        sent = []
+
+        replayer = SpoolReplayer(spool, sent.append, batch_size=2)
+
+        assert replayer.replay_once() == 5
+        assert [len(batch) for batch in sent] == [2, 2, 1]
+        assert spool.pending_bytes() == 0
+
+    def test_failed_batch_stays_spooled(self, spool):
+        """A failing dependency should pause replay without losing records"""
+        spool.append({"n": 1})
+
+        def unavailable(batch):
+            raise Exception("Circuit breaker sqs is OPEN")
+
+        replayer = SpoolReplayer(spool, unavailable)
+
+        assert replayer.replay_once() == 0
+        records, _ = spool.read_batch(10)
+        assert records == [{"n": 1}]
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+import anyio.to_thread
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.threadpool import ThreadPool
+
+
+def _sample(name: str, pool: str) -> float:
+    return REGISTRY.get_sample_value(name, {"pool": pool})
+
+
+class TestThreadPool:
+    """Test pool sizing, isolation and queue metrics"""
+
+    def test_default_pool_resizes_anyio_limiter(self):
+        """The worker pool size should apply to FastAPI's own thread calls"""
+
+        async def run():
+            pool = ThreadPool("test_default", 7, default=True)
+            pool.initialise()
+            return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+        assert asyncio.run(run()) == 7
+
+    def test_calls_queue_for_a_free_thread(self):
+        """Calls beyond the pool size should wait, and the wait be recorded"""
+        pool = ThreadPool("test_queue", 1)
+
+        async def run():
+            await asyncio.gather(
+                pool.run(time.sleep, 0.05), pool.run(time.sleep, 0.05)
+            )
+
+        started = time.perf_counter()
+        asyncio.run(run())
+
+        assert time.perf_counter() - started >= 0.1
+        assert _sample("threadpool_queue_wait_seconds_count", "test_queue") == 2
+        assert _sample("threadpool_queue_wait_seconds_sum", "test_queue") >= 0.04
+        assert _sample("threadpool_queued_calls", "test_queue") == 0
+
+    def test_ops_handlers_answer_while_workers_are_busy(self):
+        """A saturated worker pool shouldn't block handlers on another pool"""
+        workers = ThreadPool("test_workers", 1)
+        ops = ThreadPool("test_ops", 1)
+        release = threading.Event()
+        app = FastAPI()
+
+        @app.get("/slow")
+        @workers.handler
+        def slow():
+            release.wait(5)
+            return {"done": True}
+
+        @app.get("/ping")
+        @ops.handler
+        def ping(echo: int = 0):
+            return {"echo": echo}
+
+        with TestClient(app) as client:
+            blocked = threading.Thread(target=client.get, args=("/slow",))
+            blocked.start()
+            while _sample("threadpool_queue_wait_seconds_count", "test_workers") != 1:
+                time.sleep(0.01)
+
+            response = client.get("/ping?echo=3")
+            release.set()
+            blocked.join()
+
+            assert response.json() == {"echo": 3}
+            assert client.get("/ping?echo=x").status_code == 422
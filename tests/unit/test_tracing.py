@@ -0,0 +1,176 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.tracing import (
+    TraceExporter,
+    Tracer,
+    correlation_id_var,
+    current_trace,
+    instrument_engine,
+    span,
+)
+from app.middleware.tracing import CORRELATION_HEADER, TracingMiddleware
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.records = []
+
+    def export(self, record):
+        self.records.append(record)
+
+
+def make_app(tracer: Tracer) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        with span("outer"):
+            with span("inner", kind="test"):
+                pass
+        return {"correlation_id": correlation_id_var.get()}
+
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    return app
+
+
+class TestTracingMiddleware:
+    """Test correlation IDs and span recording per request"""
+
+    def test_assigns_and_returns_correlation_id(self):
+        """Requests without an ID should get a fresh one, visible to handlers"""
+        client = TestClient(make_app(Tracer(sample_rate=0)))
+
+        response = client.get("/work")
+
+        correlation_id = response.headers[CORRELATION_HEADER]
+        assert correlation_id
+        assert response.json()["correlation_id"] == correlation_id
+
+    def test_propagates_incoming_correlation_id(self):
+        """A well-formed incoming ID should be kept; a malformed one replaced"""
+        client = TestClient(make_app(Tracer(sample_rate=0)))
+
+        kept = client.get("/work", headers={CORRELATION_HEADER: "abc-123"})
+        replaced = client.get("/work", headers={CORRELATION_HEADER: "bad id\n"})
+
+        assert kept.headers[CORRELATION_HEADER] == "abc-123"
+        assert replaced.headers[CORRELATION_HEADER] != "bad id\n"
+
+    def test_head_sampled_trace_is_exported_with_nested_spans(self):
+        """Spans should nest under the span that was open when they started"""
+        exporter = RecordingExporter()
+        client = TestClient(make_app(Tracer(exporter=exporter, sample_rate=1)))
+
+        client.get("/work")
+
+        [record] = exporter.records
+        assert record["sampled"] == "head"
+        assert record["path"] == "/work"
+        spans = {s["name"]: s for s in record["spans"]}
+        assert spans["outer"]["parent_id"] == spans["request"]["span_id"]
+        assert spans["inner"]["parent_id"] == spans["outer"]["span_id"]
+        assert spans["inner"]["attributes"] == {"kind": "test"}
+
+    def test_tail_sampling_keeps_only_slow_requests(self):
+        """Unsampled requests should only be exported above the threshold"""
+        exporter = RecordingExporter()
+        fast = TestClient(
+            make_app(Tracer(exporter=exporter, sample_rate=0, slow_threshold=60))
+        )
+        slow = TestClient(
+            make_app(Tracer(exporter=exporter, sample_rate=0, slow_threshold=0))
+        )
+
+        fast.get("/work")
+        assert exporter.records == []
+
+        slow.get("/work")
+        assert [r["sampled"] for r in exporter.records] == ["tail"]
+
+
+class TestSpans:
+    """Test spans outside the middleware"""
+
+    def test_span_without_trace_is_a_no_op(self):
+        """Code running outside a request should not need a trace"""
+        with span("background") as recorded:
+            pass
+
+        assert recorded is None
+        assert current_trace() is None
+
+    def test_error_is_recorded_and_span_limit_applies(self):
+        """Exceptions should be noted on the span; excess spans are counted"""
+        tracer = Tracer(max_spans=2)
+        trace, tokens = tracer.start_trace()
+        try:
+            try:
+                with span("fails"):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+            with span("second"):
+                pass
+            with span("third"):
+                pass
+        finally:
+            tracer.end_trace(trace, tokens, 200)
+
+        assert [s.name for s in trace.spans] == ["fails", "second"]
+        assert trace.spans[0].attributes["error"] == "ValueError"
+        assert trace.spans_dropped == 1
+        assert correlation_id_var.get() is None
+
+    def test_spans_follow_into_worker_threads(self):
+        """Spans recorded via asyncio.to_thread should join the request trace"""
+
+        async def request():
+            tracer = Tracer()
+            trace, tokens = tracer.start_trace()
+            with span("request"):
+                await asyncio.to_thread(lambda: span("thread").__enter__())
+            tracer.end_trace(trace, tokens, 200)
+            return trace
+
+        trace = asyncio.run(request())
+
+        request_span, thread_span = trace.spans
+        assert thread_span.parent_id == request_span.span_id
+
+    def test_instrumented_engine_records_queries(self):
+        """Each SQL statement should become a db.query span"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        tracer = Tracer()
+
+        trace, tokens = tracer.start_trace()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        tracer.end_trace(trace, tokens, 200)
+
+        [query] = trace.spans
+        assert query.name == "db.query"
+        assert query.attributes == {"statement": "SELECT"}
+        assert query.duration is not None
+
+
+class TestTraceExporter:
+    """Test the batched JSON lines exporter"""
+
+    def test_writes_queued_traces_on_stop(self, tmp_path):
+        """Everything queued before stop should reach the file"""
+        path = tmp_path / "traces" / "traces.jsonl"
+        exporter = TraceExporter(str(path), batch_size=2, flush_interval=0.05)
+        exporter.start()
+
+        for n in range(5):
+            exporter.export({"n": n})
+        exporter.stop()
+
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["n"] for line in lines] == [0, 1, 2, 3, 4]
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import Base
+from app.models.student import Student
+from app.services.write_coalescer import WriteCoalescer
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'students.db'}")
+    Base.metadata.create_all(bind=engine)
+    engine.inserts = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            engine.inserts += 1
+
+    yield engine
+    engine.dispose()
+
+
+def values(n: int, student_id: str | None = None) -> dict:
+    return {
+        "student_id": student_id or f"STU-{n:08d}",
+        "first_name": f"First{n}",
+        "last_name": "Student",
+        "grade": n % 12 + 1,
+    }
+
+
+class TestWriteCoalescer:
+    """Test group-committed student inserts"""
+
+    def test_concurrent_inserts_share_one_statement(self, db_engine):
+        """A burst of creates should be written by a single INSERT"""
+        writer = WriteCoalescer(
+            db_engine, Student.__table__, "student_id", max_batch_size=10, max_wait=1
+        )
+
+        async def burst():
+            return await asyncio.gather(*(writer.insert(values(n)) for n in range(10)))
+
+        rows = asyncio.run(burst())
+
+        assert db_engine.inserts == 1
+        assert [row["student_id"] for row in rows] == [
+            f"STU-{n:08d}" for n in range(10)
+        ]
+        assert len({row["id"] for row in rows}) == 10
+        assert all(row["created_at"] is not None for row in rows)
+
+    def test_partial_batch_is_flushed_after_max_wait(self, db_engine):
+        """A lone request should not wait for the batch to fill"""
+        writer = WriteCoalescer(
+            db_engine, Student.__table__, "student_id", max_batch_size=50, max_wait=0.01
+        )
+
+        row = asyncio.run(writer.insert(values(1)))
+
+        assert row["student_id"] == "STU-00000001"
+        assert db_engine.inserts == 1
+
+    def test_failing_row_only_fails_its_own_caller(self, db_engine):
+        """A constraint violation should not fail the rest of the batch"""
+        writer = WriteCoalescer(
+            db_engine, Student.__table__, "student_id", max_batch_size=3, max_wait=1
+        )
+
+        async def burst():
+            return await asyncio.gather(
+                writer.insert(values(1, "STU-DUPLICATE")),
+                writer.insert(values(2, "STU-DUPLICATE")),
+                writer.insert(values(3)),
+                return_exceptions=True,
+            )
+
+        first, second, third = asyncio.run(burst())
+
+        assert first["student_id"] == "STU-DUPLICATE"
+        assert isinstance(second, IntegrityError)
+        assert third["student_id"] == "STU-00000003"
+        with db_engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM students").scalar() == 2
+
+    def test_drain_writes_pending_rows(self, db_engine):
+        """Shutdown should not lose rows still waiting for their batch"""
+        writer = WriteCoalescer(
+            db_engine, Student.__table__, "student_id", max_batch_size=50, max_wait=60
+        )
+
+        async def insert_then_drain():
+            pending = asyncio.ensure_future(writer.insert(values(1)))
+            await asyncio.sleep(0)
+            await writer.drain()
+            return await pending
+
+        row = asyncio.run(insert_then_drain())
+
+        assert row["student_id"] == "STU-00000001"